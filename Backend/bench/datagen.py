@@ -0,0 +1,198 @@
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List
+
+from bench import fake_db
+from bench.schema import INDEXES, TABLES, version_statements
+from passwords import hash_password
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+BENCH_PASSWORD = "BenchPassword123!"
+
+# Tenants are skewed like real ones: company i gets a share proportional to 1 / (i + 1)
+SCALES: Dict[str, Dict[str, int]] = {
+    "tiny": {"companies": 3, "employees": 60, "projects": 12, "tasks": 1_000, "logtimes": 10_000},
+    "small": {"companies": 4, "employees": 400, "projects": 80, "tasks": 10_000, "logtimes": 100_000},
+    "medium": {"companies": 10, "employees": 2_000, "projects": 500, "tasks": 50_000, "logtimes": 1_000_000},
+    "large": {"companies": 20, "employees": 5_000, "projects": 1_000, "tasks": 100_000, "logtimes": 2_500_000},
+}
+
+PRIORITIES = ["Low", "Medium", "High", "Critical"]
+STATUSES = ["Open", "In Progress", "Review", "Done", "Blocked"]
+WORDS = ["api", "billing", "login", "report", "export", "invoice", "sync", "search", "mobile", "dashboard",
+         "onboarding", "payroll", "audit", "import", "schema", "cache", "email", "upload", "profile", "alerts"]
+_BATCH = 50_000
+
+
+def dataset_path(scale: str, seed: int) -> str:
+    return os.path.join(DATA_DIR, f"{scale}-seed{seed}.sqlite")
+
+
+def _split(total: int, companies: int) -> List[int]:
+    weights = [1 / (i + 1) for i in range(companies)]
+    counts = [max(1, int(total * w / sum(weights))) for w in weights]
+    counts[0] += total - sum(counts)
+    return counts
+
+
+class _Stamper:
+    """Hands out RowVer values in load order, as rowversion would have."""
+
+    def __init__(self):
+        self.value = 0
+
+    def __call__(self) -> bytes:
+        self.value += 1
+        return fake_db.rowversion(self.value)
+
+
+def _insert(db: sqlite3.Connection, table: str, columns: List[str], rows: Iterator[tuple]):
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= _BATCH:
+            db.executemany(sql, batch)
+            batch = []
+    if batch:
+        db.executemany(sql, batch)
+
+
+def generate(scale: str, seed: int, path: str):
+    """Build a dataset file: companies, roles, employees (every fifth one also a login user),
+    projects, tasks and log time, with realistic nulls, soft deletes and tenant skew."""
+    spec = SCALES[scale]
+    rng = random.Random(seed)
+    stamp = _Stamper()
+    now = datetime(2025, 6, 1, 9, 0, 0)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    db = sqlite3.connect(path)
+    db.create_function("rowversion", 1, fake_db.rowversion, deterministic=True)
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    db.executescript(TABLES)
+
+    companies = spec["companies"]
+    company_ids = list(range(1, companies + 1))
+    _insert(db, "Company", ["CompanyId", "Name", "IsActive", "Email", "CreatedOn", "CreatedBy", "RowVer"],
+            ((c, f"Company {c}", 1, f"contact@company{c}.bench", now, 1, stamp()) for c in company_ids))
+    _insert(db, "Role", ["RoleId", "Role", "CompanyId", "IsActive", "CreatedOn", "CreatedBy"],
+            [(1, "Admin", 1, 1, now, 1), (2, "Manager", 1, 1, now, 1), (3, "Employee", 1, 1, now, 1)])
+
+    # Employees, by company; the first of each company is its admin
+    employees: Dict[int, List[int]] = {}
+    emp_rows, user_rows = [], []
+    # One scrypt hash shared by every bench user: verifying it costs the same as a unique one
+    password_hash = hash_password(BENCH_PASSWORD)
+    emp_id = 0
+    for company_id, count in zip(company_ids, _split(spec["employees"], companies)):
+        employees[company_id] = []
+        for n in range(count):
+            emp_id += 1
+            role = 1 if n == 0 else (2 if n % 10 == 1 else 3)
+            employees[company_id].append(emp_id)
+            email = f"emp{emp_id}@company{company_id}.bench"
+            emp_rows.append((emp_id, f"Employee {emp_id}", role, f"+1555{emp_id:07d}", f"{emp_id} Bench Street",
+                             email, "Synthetic employee", company_id, 1, now, 1, stamp()))
+            if n == 0 or n % 5 == 0:
+                user_rows.append((emp_id, email, password_hash, role, company_id, 1, now, 1))
+    _insert(db, "Employee", ["EmpId", "Name", "RoleID", "Phone", "Address", "Email", "Description", "CompanyId",
+                             "IsActive", "CreatedOn", "CreatedBy", "RowVer"], emp_rows)
+    _insert(db, "Users", ["UserId", "Email", "Password", "RoleId", "CompanyId", "IsActive", "CreatedOn", "CreatedBy"],
+            user_rows)
+
+    projects: Dict[int, List[int]] = {}
+    project_rows = []
+    project_id = 0
+    for company_id, count in zip(company_ids, _split(spec["projects"], companies)):
+        projects[company_id] = []
+        staff = employees[company_id]
+        for _ in range(count):
+            project_id += 1
+            projects[company_id].append(project_id)
+            start = now - timedelta(days=rng.randint(30, 720))
+            project_rows.append((project_id, f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {project_id}",
+                                 start, start + timedelta(days=rng.randint(60, 540)), rng.choice(staff),
+                                 rng.choice(PRIORITIES), rng.choice(STATUSES), company_id, "Synthetic project",
+                                 1 if rng.random() < 0.95 else 0, start, staff[0], stamp()))
+    _insert(db, "Projects", ["ProjectId", "Name", "StartDate", "EndDate", "ProjectManager", "Priority", "Status",
+                             "CompanyId", "Description", "IsActive", "CreatedOn", "CreatedBy", "RowVer"], project_rows)
+
+    task_counts = _split(spec["tasks"], companies)
+    tasks: Dict[int, List[tuple]] = {c: [] for c in company_ids}  # company -> [(TaskId, AssignedTo)]
+
+    def task_rows() -> Iterator[tuple]:
+        task_id = 0
+        for company_id, count in zip(company_ids, task_counts):
+            staff = employees[company_id]
+            for _ in range(count):
+                task_id += 1
+                assignee = rng.choice(staff) if rng.random() < 0.9 else None
+                tasks[company_id].append((task_id, assignee))
+                created = now - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1440))
+                deadline = created + timedelta(days=rng.randint(1, 120)) if rng.random() < 0.95 else None
+                hours = Decimal(rng.randint(1, 80)) / 2 if rng.random() < 0.7 else None
+                yield (task_id, f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} task {task_id}",
+                       rng.choice(projects[company_id]), assignee, deadline, rng.choice(PRIORITIES),
+                       rng.choice(STATUSES), created, staff[0], company_id, "Synthetic task description",
+                       1 if rng.random() < 0.95 else 0, str(hours) if hours is not None else None, stamp())
+
+    _insert(db, "Task", ["TaskId", "Name", "ProjectId", "AssignedTo", "Deadline", "Priority", "Status", "CreatedOn",
+                         "CreatedBy", "CompanyId", "Description", "IsActive", "ExptedHours", "RowVer"], task_rows())
+
+    logtime_counts = _split(spec["logtimes"], companies)
+
+    def logtime_rows() -> Iterator[tuple]:
+        for company_id, count in zip(company_ids, logtime_counts):
+            staff, company_tasks = employees[company_id], tasks[company_id]
+            for _ in range(count):
+                task_id, assignee = rng.choice(company_tasks)
+                emp = assignee or rng.choice(staff)
+                day = (now - timedelta(days=rng.randint(0, 365))).date()
+                yield (emp, task_id, day, datetime.combine(day, datetime.min.time()) + timedelta(hours=18), emp,
+                       1 if rng.random() < 0.98 else 0, company_id, "Worked on it",
+                       rng.choice((0, 15, 30, 45)), rng.randint(0, 8), stamp())
+
+    _insert(db, "LogTime", ["EmpId", "TaskId", "Date", "CreatedOn", "CreatedBy", "IsActive", "CompanyId",
+                            "Description", "MinutesSpent", "HoursSpent", "RowVer"], logtime_rows())
+
+    db.execute("INSERT INTO _RowVersion (v) VALUES (?)", (stamp.value,))
+    db.executescript(INDEXES)
+    db.executescript(version_statements())
+    db.commit()
+    db.execute("ANALYZE")
+    db.close()
+
+
+def ensure_dataset(scale: str, seed: int) -> str:
+    path = dataset_path(scale, seed)
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        print(f"Generating {scale} dataset (seed {seed}) into {path} ...", flush=True)
+        generate(scale, seed, path + ".partial")
+        os.replace(path + ".partial", path)
+        print(f"  done in {time.perf_counter() - started:.1f}s", flush=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic WorkNest dataset for the benchmarks.")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--force", action="store_true", help="regenerate even if the file exists")
+    args = parser.parse_args()
+    if args.force and os.path.exists(dataset_path(args.scale, args.seed)):
+        os.remove(dataset_path(args.scale, args.seed))
+    print(ensure_dataset(args.scale, args.seed))
+
+
+if __name__ == "__main__":
+    main()
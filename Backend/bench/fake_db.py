@@ -0,0 +1,273 @@
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Tuple
+
+import pymssql
+
+import db_connection
+
+# Declared column types (bench/schema.py) come back as the Python types pymssql returns
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter("DECIMAL", lambda raw: Decimal(raw.decode()))
+
+
+def rowversion(value: int) -> bytes:
+    return int(value).to_bytes(8, "big")
+
+
+# ---------------------------
+# T-SQL -> SQLITE
+# ---------------------------
+# Only the dialect the routers actually emit. Anything else fails loudly as a pymssql error,
+# exactly where the route would have hit a bad query against SQL Server.
+_SCHEMA_PREFIX = re.compile(r"\b(?:TaskManager\.)?dbo\.", re.I)
+_TOP = re.compile(r"^(\s*SELECT\s+)TOP\s*\(?\s*(\d+)\s*\)?", re.I)
+_OFFSET_FETCH = re.compile(r"\bOFFSET\s+(\?|\d+)\s+ROWS\s+FETCH\s+NEXT\s+(\?|\d+)\s+ROWS\s+ONLY\b", re.I)
+_OUTPUT = re.compile(r"\bOUTPUT\s+(.*?)(?=\s+(?:VALUES|WHERE|FROM|SELECT|DEFAULT\s+VALUES)\b|\s*$)", re.I | re.S)
+_FUNCTIONS = [
+    (re.compile(r"\bGETDATE\(\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bSYSDATETIME\(\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bISNULL\(", re.I), "IFNULL("),
+    (re.compile(r"\bLEN\(", re.I), "LENGTH("),
+    (re.compile(r"\bMIN_ACTIVE_ROWVERSION\(\)", re.I), "(SELECT rowversion(v + 1) FROM _RowVersion)"),
+]
+_MERGE_INSERT = re.compile(
+    r"^\s*MERGE\s+INTO\s+(?P<table>\w+)(?:\s+AS\s+\w+)?\s+USING\s+\(\s*VALUES\s+(?P<values>.*)\)\s+AS\s+src\s*"
+    r"\((?P<src>[^)]*)\)\s+ON\s+1\s*=\s*0\s+WHEN\s+NOT\s+MATCHED\s+THEN\s+INSERT\s*\((?P<columns>[^)]*)\)\s*"
+    r"VALUES\s*\((?P<exprs>[^)]*)\)\s+OUTPUT\s+(?P<output>.*?)\s*$", re.I | re.S)
+
+
+def _split(sql: str) -> List[str]:
+    """Statements of a batch, split on semicolons outside string literals and comments."""
+    statements, current, quoted, i = [], [], False, 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end < 0 else end
+            continue
+        elif ch == ";" and not quoted:
+            statements.append("".join(current))
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    statements.append("".join(current))
+    return [s for s in statements if s.strip()]
+
+
+def _names(text: str) -> List[str]:
+    return [name.strip() for name in text.split(",")]
+
+
+class MergeInsert:
+    """MERGE ... ON 1 = 0 WHEN NOT MATCHED THEN INSERT ... OUTPUT src.X, INSERTED.Y: a multi-row
+    INSERT ... RETURNING, with the src.* outputs taken from the matching parameter rows."""
+
+    def __init__(self, match):
+        self.table = match["table"]
+        self.src = _names(match["src"])
+        self.columns = _names(match["columns"])
+        exprs = _names(match["exprs"])
+        self.picks = [self.src.index(expr.split(".", 1)[1]) for expr in exprs]
+        self.output = []  # ("src", index) or ("inserted", index into RETURNING)
+        returning = []
+        for item in _names(match["output"]):
+            side, column = item.split(".", 1)
+            if side.lower() == "src":
+                self.output.append(("src", self.src.index(column)))
+            else:
+                self.output.append(("inserted", len(returning) + 1))
+                returning.append(column)
+        self.returning = ", ".join(["rowid"] + returning)
+
+    def run(self, db: sqlite3.Connection, params: Sequence[Any]) -> Tuple[list, list]:
+        width = len(self.src)
+        rows = [params[i:i + width] for i in range(0, len(params), width)]
+        placeholders = "(" + ", ".join("?" * len(self.columns)) + ")"
+        sql = (f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES "
+               f"{', '.join([placeholders] * len(rows))} RETURNING {self.returning}")
+        cursor = db.execute(sql, [row[pick] for row in rows for pick in self.picks])
+        # New rowids are handed out in insertion order, RETURNING order is not guaranteed
+        inserted = sorted(cursor.fetchall())
+        output = [tuple(row[index] if side == "src" else new[index] for side, index in self.output)
+                  for row, new in zip(rows, inserted)]
+        description = [(f"c{i}", None, None, None, None, None, None) for i in range(len(self.output))]
+        return description, output
+
+
+@lru_cache(maxsize=4096)
+def translate(sql: str) -> Tuple[Any, ...]:
+    """Each statement of a T-SQL batch as SQLite SQL (or a MergeInsert plan), with its %s count."""
+    plans = []
+    for statement in _split(_SCHEMA_PREFIX.sub("", sql)):
+        params = statement.count("%s")
+        merge = _MERGE_INSERT.match(statement)
+        if merge:
+            plans.append((MergeInsert(merge), params))
+            continue
+        statement = statement.replace("%s", "?")
+        for pattern, replacement in _FUNCTIONS:
+            statement = pattern.sub(replacement, statement)
+        top = _TOP.match(statement)
+        if top:
+            statement = top.group(1) + statement[top.end():] + f" LIMIT {top.group(2)}"
+        # SQLite's "LIMIT offset, count" takes the parameters in T-SQL's order
+        statement = _OFFSET_FETCH.sub(r"LIMIT \1, \2", statement)
+        output = _OUTPUT.search(statement)
+        if output:
+            columns = output.group(1)
+            if re.search(r"\bDELETED\.", columns, re.I):
+                raise pymssql.NotSupportedError("OUTPUT DELETED.* has no SQLite equivalent")
+            statement = (statement[:output.start()] + statement[output.end():]).rstrip()
+            statement += " RETURNING " + re.sub(r"\bINSERTED\.", "", columns, flags=re.I)
+        plans.append((statement, params))
+    return tuple(plans)
+
+
+# ---------------------------
+# DB-API SURFACE
+# ---------------------------
+def _database_error(e: sqlite3.Error) -> pymssql.Error:
+    if isinstance(e, sqlite3.IntegrityError):
+        return pymssql.IntegrityError(str(e))
+    if isinstance(e, sqlite3.OperationalError):
+        return pymssql.OperationalError(str(e))
+    return pymssql.DatabaseError(str(e))
+
+
+class Cursor:
+    """The pymssql cursor surface the routers use: execute, fetch*, nextset, description,
+    rowcount, as_dict rows and `with`. SELECTs stream; writes and earlier statements of a
+    batch are read eagerly so the transaction can commit."""
+
+    def __init__(self, db: sqlite3.Connection, as_dict: bool):
+        self._db = db
+        self._as_dict = as_dict
+        self._results: List[list] = []  # [description, rows (list) or live sqlite3 cursor]
+        self._current = 0
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, operation: str, params: Optional[Sequence[Any]] = None):
+        if params is not None and not isinstance(params, (tuple, list)):
+            params = (params,)
+        params = list(params or ())
+        self._results, self._current = [], 0
+        plans = translate(operation)
+        try:
+            for index, (plan, count) in enumerate(plans):
+                values, params = params[:count], params[count:]
+                if isinstance(plan, MergeInsert):
+                    self._results.append(list(plan.run(self._db, values)))
+                    self.rowcount = len(self._results[-1][1])
+                    continue
+                cursor = self._db.execute(plan, values)
+                self.rowcount, self.lastrowid = cursor.rowcount, cursor.lastrowid
+                if cursor.description is None:
+                    continue
+                if index < len(plans) - 1 or not plan.lstrip()[:6].upper() == "SELECT":
+                    self._results.append([cursor.description, cursor.fetchall()])
+                else:
+                    self._results.append([cursor.description, cursor])
+        except sqlite3.Error as e:
+            raise _database_error(e) from e
+
+    @property
+    def description(self):
+        if self._current >= len(self._results):
+            return None
+        return self._results[self._current][0]
+
+    def _shape(self, rows: list) -> list:
+        if not self._as_dict:
+            return rows
+        names = [column[0] for column in self.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def _take(self, size: Optional[int]) -> list:
+        if self._current >= len(self._results):
+            raise pymssql.OperationalError("Statement not executed or executed statement has no resultset")
+        result = self._results[self._current]
+        source = result[1]
+        try:
+            if isinstance(source, list):
+                if size is None:
+                    rows, result[1] = source, []
+                else:
+                    rows, result[1] = source[:size], source[size:]
+            else:
+                rows = source.fetchall() if size is None else source.fetchmany(size)
+        except sqlite3.Error as e:
+            raise _database_error(e) from e
+        return self._shape(rows)
+
+    def fetchone(self):
+        rows = self._take(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size: int = 1):
+        return self._take(size)
+
+    def fetchall(self):
+        return self._take(None)
+
+    def nextset(self):
+        if self._current + 1 < len(self._results):
+            self._current += 1
+            return True
+        return None
+
+    def close(self):
+        self._results = []
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Connection:
+    """A pymssql-compatible connection backed by one SQLite file."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.create_function("rowversion", 1, rowversion, deterministic=True)
+
+    def cursor(self, as_dict: bool = False) -> Cursor:
+        return Cursor(self._db, as_dict)
+
+    def commit(self):
+        try:
+            self._db.commit()
+        except sqlite3.Error as e:
+            raise _database_error(e) from e
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+
+def install(path: str):
+    """Point the app's connection pool at `path`. Call before the app starts (its lifespan warms
+    the pool); connections already pooled are dropped."""
+    db_connection.pool.close_all()
+    db_connection.pool._connect = lambda: Connection(path)
@@ -0,0 +1,334 @@
+"""Micro-benchmark the row mapping and serialization hot loops, per 10k rows of each entity.
+
+    cd Backend
+    python -m bench.mapping                       # every case, 10k rows, best of 7
+    python -m bench.mapping --case users,projects_by_manager --rows 50000 --rounds 11
+
+Each case times what a listing does after the fetch: map DB rows to the response shape and
+encode the body. "before" is the per-row code the routers used to run (keyword-by-keyword
+model construction, per-row strftime and re-validation, `.dict()`); "after" is the shared
+layer in row_mapping.py (mappers compiled once per column list). Both must produce the same
+JSON, and the run exits 1 if a case's "after" is not faster than its "before".
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from pydantic import TypeAdapter
+
+from fast_json import dumps as fast_dumps
+from row_mapping import (COMPANY_FIELDS, EMPLOYEE_FIELDS, LOGTIME_COLUMNS, PROJECT_COLUMNS, PROJECT_EMPLOYEE_COLUMNS,
+                         PROJECT_ROLE_COLUMNS, TASK_COLUMNS, USER_FIELDS)
+from routes.project_router import _truncated_project
+from tables.company import Company
+from tables.EmployeeProject import ProjectEmployeeOut
+from tables.employee import EmployeeOut
+from tables.logtime import LogTimeOut
+from tables.project import ProjectOut
+from tables.projectRole import ProjectRoleOut
+from tables.task import TaskOut
+from tables.users import User
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+# ---------------------------
+# ENCODERS
+# ---------------------------
+# How FastAPI writes a body: response_model lists are re-validated and dumped, Dict[str, Any]
+# payloads go through the Any serializer, FastJSONResponse bodies through fast_json.
+_ANY = TypeAdapter(Dict[str, Any])
+_LISTS: Dict[type, TypeAdapter] = {}
+
+
+def response_model_body(model: type, items: List[Any]) -> bytes:
+    adapter = _LISTS.get(model)
+    if adapter is None:
+        adapter = _LISTS[model] = TypeAdapter(List[model])
+    return adapter.dump_json(adapter.validate_python([item.model_dump() for item in items]))
+
+
+def dict_body(payload: Dict[str, Any]) -> bytes:
+    return _ANY.dump_json(payload)
+
+
+# ---------------------------
+# SYNTHETIC ROWS
+# ---------------------------
+_START = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def _when(rng: random.Random, nullable: bool = True) -> Optional[datetime]:
+    if nullable and rng.random() < 0.4:
+        return None
+    return _START + timedelta(days=rng.randint(0, 500), seconds=rng.randint(0, 86399),
+                              microseconds=rng.randint(0, 999) * 1000)
+
+
+def _maybe(rng: random.Random, value: Any, odds: float = 0.3) -> Any:
+    return None if rng.random() < odds else value
+
+
+_VALUES: Dict[str, Callable[[int, random.Random], Any]] = {
+    "Name": lambda i, r: f"Name {i}",
+    "Email": lambda i, r: f"person{i}@example.com",
+    "Role": lambda i, r: r.choice(["Developer", "Tester", "Lead"]),
+    "Phone": lambda i, r: f"+1555{i:07d}",
+    "ContactNo": lambda i, r: f"+1555{i:07d}",
+    "Address": lambda i, r: f"{i} Main Street",
+    "Description": lambda i, r: "Synthetic description",
+    "CompanyDescription": lambda i, r: _maybe(r, "Synthetic company"),
+    "Priority": lambda i, r: r.choice(["Low", "Medium", "High"]),
+    "Status": lambda i, r: r.choice(["Open", "In Progress", "Done"]),
+    "IsActive": lambda i, r: 1,
+    "Date": lambda i, r: (_START + timedelta(days=r.randint(0, 500))).date(),
+    "StartDate": lambda i, r: _when(r, nullable=False).replace(hour=0, minute=0, second=0, microsecond=0),
+    "EndDate": lambda i, r: _when(r, nullable=False).replace(hour=0, minute=0, second=0, microsecond=0),
+    "CreatedOn": lambda i, r: _when(r, nullable=False),
+    "ExptedHours": lambda i, r: _maybe(r, Decimal(r.randint(1, 80)) / 2),
+    "MinutesSpent": lambda i, r: r.choice([0, 15, 30, 45]),
+    "HoursSpent": lambda i, r: r.randint(0, 8),
+}
+
+
+def _value(column: str, i: int, rng: random.Random) -> Any:
+    make = _VALUES.get(column)
+    if make is not None:
+        return make(i, rng)
+    if column.endswith("On") or column == "Deadline":
+        return _when(rng)
+    if column.endswith(("Path", "Url", "Name", "Img")):
+        return _maybe(rng, f"/blobs/{i:08x}", 0.5)
+    if column.endswith(("UpdatedBy", "DeletedBy")):
+        return _maybe(rng, rng.randint(1, 500), 0.5)
+    return rng.randint(1, 500)  # ids and foreign keys
+
+
+def make_rows(columns: Sequence[str], count: int, seed: int = 1) -> List[tuple]:
+    rng = random.Random(seed)
+    return [tuple(_value(column, i + 1, rng) for column in columns) for i in range(count)]
+
+
+# ---------------------------
+# BEFORE: THE PER-ROW CODE THE ROUTERS USED TO RUN
+# ---------------------------
+def _format_datetime(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime) else None
+
+
+def before_user(row: Dict[str, Any]) -> User:
+    return User(user_id=row['UserId'], email=row['Email'], is_active=bool(row['IsActive']),
+                role_id=row['RoleId'], company_id=row['CompanyId'], created_on=_format_datetime(row['CreatedOn']),
+                created_by=row['CreatedBy'], updated_on=_format_datetime(row['UpdatedOn']),
+                updated_by=row['UpdatedBy'], deleted_on=_format_datetime(row['DeletedOn']),
+                deleted_by=row['DeletedBy'])
+
+
+def before_employee(row) -> EmployeeOut:
+    return EmployeeOut(emp_id=row[0], name=row[1], role_id=row[2], phone=row[3], address=row[4], email=row[5],
+                       description=row[6], company_id=row[7], created_by=row[8], updated_by=row[9],
+                       is_active=bool(row[10]), ImageUrl=row[11], EmployeeImage=row[12], ImagePath=row[13])
+
+
+_EMPLOYEE_PAGE_COLUMNS = ["EmpId", "Name", "RoleID", "Phone", "Address", "Email", "Description", "CompanyId",
+                          "CreatedBy", "UpdatedBy", "IsActive", "CreatedOn", "UpdatedOn", "DeletedOn", "DeletedBy"]
+
+
+def before_employee_page(row) -> EmployeeOut:
+    return EmployeeOut(
+        emp_id=row[0], name=row[1], role_id=row[2], phone=row[3], address=row[4], email=row[5],
+        description=row[6], company_id=row[7], created_by=row[8], updated_by=row[9], is_active=bool(row[10]),
+        created_on=row[11].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[11], datetime) else None,
+        updated_on=row[12].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[12], datetime) else None,
+        deleted_on=row[13].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[13], datetime) else None,
+        deleted_by=row[14])
+
+
+def before_company(row: Dict[str, Any]) -> Company:
+    return Company(
+        company_id=row['CompanyId'], name=row['Name'], is_active=bool(row['IsActive']),
+        company_description=row.get('CompanyDescription'), company_logo_name=row.get('CompanyLogoName'),
+        company_logo_url=row.get('CompanyLogoUrl'), company_logo_path=row.get('CompanyLogoPath'),
+        contact_no=row.get('ContactNo'), email=row.get('Email'), address=row.get('Address'),
+        created_on=row['CreatedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('CreatedOn') else None,
+        created_by=row.get('CreatedBy', 0),
+        updated_on=row['UpdatedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('UpdatedOn') else None,
+        updated_by=row.get('UpdatedBy'),
+        deleted_on=row['DeletedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('DeletedOn') else None,
+        deleted_by=row.get('DeletedBy'))
+
+
+def before_project(row) -> ProjectOut:
+    return ProjectOut(
+        ProjectId=row[0], Name=row[1],
+        StartDate=row[2].strftime("%Y-%m-%d") if isinstance(row[2], datetime) else None,
+        EndDate=row[3].strftime("%Y-%m-%d") if isinstance(row[3], datetime) else None,
+        ProjectManager=row[4], Priority=row[5], Status=row[6],
+        CreatedOn=row[7].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[7], datetime) else None,
+        CreatedBy=row[8],
+        UpdatedOn=row[9].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[9], datetime) else None,
+        UpdatedBy=row[10], IsActive=bool(row[11]),
+        DeletedOn=row[12].strftime("%Y-%m-%d %H:%M:%S") if row[12] and isinstance(row[12], datetime) else None,
+        DeletedBy=row[13], CompanyId=row[14], Description=row[15])
+
+
+def before_logtime(row) -> LogTimeOut:
+    return LogTimeOut(LogId=row[0], EmpId=row[1], TaskId=row[2], Date=row[3], CreatedOn=row[4], CreatedBy=row[5],
+                      UpdatedOn=row[6], UpdatedBy=row[7], IsActive=bool(row[8]), DeletedOn=row[9], DeletedBy=row[10],
+                      CompanyId=row[11], Description=row[12], MinutesSpent=row[13], HoursSpent=row[14])
+
+
+# ---------------------------
+# CASES
+# ---------------------------
+class Case:
+    """One listing: the rows it maps and its before/after body builders (rows -> JSON bytes)."""
+
+    def __init__(self, name: str, columns: Sequence[str], before: Callable[[list], bytes],
+                 after: Callable[[list], bytes], dict_rows: bool = False):
+        self.name = name
+        self.columns = list(columns)
+        self.before = before
+        self.after = after
+        self.dict_rows = dict_rows  # the old code read cursor(as_dict=True) rows
+
+    def inputs(self, count: int):
+        rows = make_rows(self.columns, count)
+        if self.dict_rows:
+            # Built outside the timed loop: pymssql builds these rows in C
+            return [dict(zip(self.columns, row)) for row in rows], rows
+        return rows, rows
+
+
+def _page(data: list) -> Dict[str, Any]:
+    return {"data": data, "total": len(data), "page": 1, "PageLimit": len(data), "total_pages": 1,
+            "next_cursor": None}
+
+
+_user_record = USER_FIELDS.record_mapper()
+_employee_record = EMPLOYEE_FIELDS.record_mapper()
+_employee_page = EMPLOYEE_FIELDS.record_mapper(_EMPLOYEE_PAGE_COLUMNS)
+_company_record = COMPANY_FIELDS.record_mapper()
+_project_employee_record = PROJECT_EMPLOYEE_COLUMNS.record_mapper()
+_project_role_record = PROJECT_ROLE_COLUMNS.record_mapper()
+_logtime_record = LOGTIME_COLUMNS.record_mapper()
+_task_record = TASK_COLUMNS.record_mapper()
+
+CASES = [
+    Case("users", USER_FIELDS.columns,
+         lambda rows: response_model_body(User, [before_user(r) for r in rows]),
+         lambda rows: fast_dumps([_user_record(r) for r in rows]), dict_rows=True),
+    # Before this suite the paginated users endpoint failed to map its rows at all; it now
+    # returns /allusers-shaped records, so "before" is the closest working code
+    Case("users_paginated", USER_FIELDS.columns,
+         lambda rows: dict_body(_page([before_user(r).model_dump() for r in rows])),
+         lambda rows: dict_body(_page([_user_record(r) for r in rows])), dict_rows=True),
+    Case("employees", EMPLOYEE_FIELDS.columns,
+         lambda rows: response_model_body(EmployeeOut, [before_employee(r) for r in rows]),
+         lambda rows: fast_dumps([_employee_record(r) for r in rows])),
+    Case("employees_paginated", _EMPLOYEE_PAGE_COLUMNS,
+         lambda rows: dict_body(_page([before_employee_page(r).dict() for r in rows])),
+         lambda rows: dict_body(_page([_employee_page(r) for r in rows]))),
+    Case("companies", COMPANY_FIELDS.columns,
+         lambda rows: response_model_body(Company, [before_company(r) for r in rows]),
+         lambda rows: fast_dumps([_company_record(r) for r in rows]), dict_rows=True),
+    Case("companies_paginated", COMPANY_FIELDS.columns,
+         lambda rows: dict_body(_page([before_company(r).dict() for r in rows])),
+         lambda rows: dict_body(_page([_company_record(r) for r in rows])), dict_rows=True),
+    Case("projects_by_manager", PROJECT_COLUMNS.columns,
+         lambda rows: response_model_body(ProjectOut, [before_project(r) for r in rows]),
+         lambda rows: fast_dumps([_truncated_project(r) for r in rows])),
+    Case("project_employees", PROJECT_EMPLOYEE_COLUMNS.columns,
+         lambda rows: response_model_body(ProjectEmployeeOut, [ProjectEmployeeOut(**r) for r in rows]),
+         lambda rows: fast_dumps([_project_employee_record(r) for r in rows]),
+         dict_rows=True),
+    Case("project_roles", PROJECT_ROLE_COLUMNS.columns,
+         lambda rows: response_model_body(ProjectRoleOut, [ProjectRoleOut(**dict(zip(PROJECT_ROLE_COLUMNS.columns, r)))
+                                                           for r in rows]),
+         lambda rows: fast_dumps([_project_role_record(r) for r in rows])),
+    Case("logtimes_paginated", LOGTIME_COLUMNS.columns,
+         lambda rows: dict_body(_page([before_logtime(r).dict() for r in rows])),
+         lambda rows: fast_dumps(_page([_logtime_record(r) for r in rows]))),
+    Case("tasks_paginated", TASK_COLUMNS.columns,
+         lambda rows: dict_body(_page([TaskOut(**dict(zip(TASK_COLUMNS.columns, r))).dict() for r in rows])),
+         lambda rows: fast_dumps(_page([_task_record(r) for r in rows]))),
+]
+
+
+# ---------------------------
+# TIMING
+# ---------------------------
+def _time(build: Callable[[list], bytes], rows: list, rounds: int) -> List[float]:
+    build(rows)  # warm-up: compiles mappers and serializers
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        build(rows)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_case(case: Case, count: int, rounds: int) -> Dict[str, Any]:
+    before_rows, after_rows = case.inputs(count)
+    if json.loads(case.before(before_rows)) != json.loads(case.after(after_rows)):
+        raise AssertionError(f"{case.name}: before and after bodies differ")
+    before = _time(case.before, before_rows, rounds)
+    after = _time(case.after, after_rows, rounds)
+    per_10k = 10_000 / count * 1000
+    return {
+        "rows": count,
+        "before_ms_per_10k": round(min(before) * per_10k, 2),
+        "before_median_ms": round(statistics.median(before) * per_10k, 2),
+        "after_ms_per_10k": round(min(after) * per_10k, 2),
+        "after_median_ms": round(statistics.median(after) * per_10k, 2),
+        "speedup": round(min(before) / min(after), 2),
+    }
+
+
+_HEADER = f"{'case':<22}{'before ms':>11}{'(median)':>10}{'after ms':>10}{'(median)':>10}{'speedup':>9}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--case", help=f"comma-separated, from: {', '.join(c.name for c in CASES)}")
+    parser.add_argument("--rows", type=int, default=10_000, help="rows per case (timings are scaled to 10k)")
+    parser.add_argument("--rounds", type=int, default=7, help="timed runs per side; the best one is reported")
+    parser.add_argument("--save", action="store_true", help="also write the results to bench/results/")
+    args = parser.parse_args(argv)
+
+    cases = CASES
+    if args.case:
+        wanted = [name.strip() for name in args.case.split(",") if name.strip()]
+        unknown = set(wanted) - {c.name for c in CASES}
+        if unknown:
+            parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+        cases = [c for c in CASES if c.name in wanted]
+
+    print(_HEADER, flush=True)
+    results, slower = {}, []
+    for case in cases:
+        r = results[case.name] = run_case(case, args.rows, args.rounds)
+        print(f"{case.name:<22}{r['before_ms_per_10k']:>11.1f}{r['before_median_ms']:>10.1f}"
+              f"{r['after_ms_per_10k']:>10.1f}{r['after_median_ms']:>10.1f}{r['speedup']:>8.2f}x", flush=True)
+        if r["speedup"] <= 1.0:
+            slower.append(case.name)
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-mapping.json"), "w") as f:
+            json.dump(results, f, indent=2)
+    if slower:
+        print(f"Not faster than before: {', '.join(slower)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Load-test WorkNest against a local SQLite stand-in for SQL Server.
+
+    cd Backend
+    python -m bench.run --scale small --scenario task_filter,login_storm --duration 20 --concurrency 32
+    python -m bench.run --save-baseline main        # record bench/baselines/main.json
+    python -m bench.run --compare main              # exit 1 if p95 or throughput regressed
+
+By default main.app runs in this process behind httpx's ASGI transport, so timings cover the
+app and the stand-in database without network noise. With --url the same scenarios drive a
+server started by `python -m bench.serve` (or any deployment seeded with the same dataset).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.datagen import SCALES, ensure_dataset
+from bench.scenarios import SCENARIOS, Tenants
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+# ---------------------------
+# LOAD LOOP
+# ---------------------------
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, tenants: Tenants, duration: float, warmup: float,
+                       concurrency: int, seed: int) -> Dict[str, float]:
+    """Closed loop: `concurrency` virtual users, each sending its next request as soon as the
+    previous one finished. Only requests started after the warm-up are recorded."""
+    scenario = SCENARIOS[name]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def user(index: int):
+        rng = random.Random(seed * 1000 + index)
+        while True:
+            call = scenario(tenants, rng)
+            sent = time.perf_counter()
+            if sent >= stop_at:
+                return
+            try:
+                response = await client.request(call.method, call.url, json=call.json)
+                outcome = None if response.status_code in call.expect else str(response.status_code)
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            if sent >= measure_from:
+                latencies.append(time.perf_counter() - sent)
+                if outcome is not None:
+                    errors[outcome] = errors.get(outcome, 0) + 1
+
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def run_all(args, dataset: str) -> Dict[str, Dict[str, float]]:
+    tenants = Tenants.load(dataset)
+    results = {}
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            for name in args.scenarios:
+                results[name] = await run_scenario(client, name, tenants, args.duration, args.warmup,
+                                                   args.concurrency, args.seed)
+                _print_row(name, results[name])
+        return results
+
+    # Work on a copy: bulk entry and login rehashing write to the database
+    workdir = tempfile.mkdtemp(prefix="worknest-bench-")
+    try:
+        working = os.path.join(workdir, "bench.sqlite")
+        shutil.copyfile(dataset, working)
+        from bench import fake_db
+        fake_db.install(working)
+        import main
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+                for name in args.scenarios:
+                    results[name] = await run_scenario(client, name, tenants, args.duration, args.warmup,
+                                                       args.concurrency, args.seed)
+                    _print_row(name, results[name])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# ---------------------------
+# REPORTING / BASELINES
+# ---------------------------
+_HEADER = f"{'scenario':<14}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+
+
+def _print_row(name: str, r: Dict[str, float]):
+    print(f"{name:<14}{r['requests']:>10}{r['errors']:>8}{r['throughput']:>10.1f}{r['p50_ms']:>10.1f}"
+          f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}", flush=True)
+    if r["error_kinds"]:
+        print(f"{'':<14}errors: {r['error_kinds']}", flush=True)
+
+
+def _meta(args) -> Dict[str, object]:
+    return {"scale": args.scale, "seed": args.seed, "concurrency": args.concurrency, "duration": args.duration,
+            "target": args.url or "in-process", "python": platform.python_version(), "machine": platform.machine(),
+            "recorded": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(baseline: dict, results: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Regressions beyond `threshold` (a fraction) in p95, p99 or throughput, or new errors."""
+    problems = []
+    for name, current in results.items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if before[metric] and current[metric] > before[metric] * (1 + threshold):
+                problems.append(f"{name}: {metric} {before[metric]} -> {current[metric]}")
+        if before["throughput"] and current["throughput"] < before["throughput"] * (1 - threshold):
+            problems.append(f"{name}: throughput {before['throughput']} -> {current['throughput']}")
+        if current["errors"] > before["errors"]:
+            problems.append(f"{name}: errors {before['errors']} -> {current['errors']}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario", default="login_storm,task_filter,logtime_bulk,exports",
+                        help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--url", help="drive a running server instead of main.app in-process")
+    parser.add_argument("--save-baseline", metavar="NAME", help="write the results to bench/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="fail if results regressed against bench/baselines/NAME.json")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed regression, as a fraction")
+    parser.add_argument("--log-slow-queries", action="store_true",
+                        help="keep the app's slow-query warnings (SQLite serializes writers, so there are many)")
+    args = parser.parse_args(argv)
+    if not args.log_slow_queries:
+        logging.getLogger("metrics").setLevel(logging.ERROR)
+    args.scenarios = [s.strip() for s in args.scenario.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    dataset = ensure_dataset(args.scale, args.seed)
+    print(_HEADER, flush=True)
+    results = asyncio.run(run_all(args, dataset))
+    report = {"meta": _meta(args), "scenarios": results}
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{args.scale}.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save_baseline}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved as {args.save_baseline}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        mismatched = [k for k in ("scale", "seed", "concurrency", "target") if baseline["meta"].get(k) != report["meta"][k]]
+        if mismatched:
+            print(f"Warning: baseline differs in {', '.join(mismatched)}; comparison is indicative only")
+        problems = compare(baseline, results, args.threshold)
+        if problems:
+            print("Regressions against baseline " + args.compare + ":")
+            for problem in problems:
+                print("  " + problem)
+            return 1
+        print(f"No regressions against baseline {args.compare} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
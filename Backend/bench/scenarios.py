@@ -0,0 +1,121 @@
+import random
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bench.datagen import BENCH_PASSWORD, PRIORITIES, WORDS
+
+
+@dataclass
+class Call:
+    method: str
+    url: str
+    json: Any = None
+    expect: Tuple[int, ...] = (200,)
+
+
+@dataclass
+class Tenants:
+    """Ids a scenario draws from, read once from the dataset."""
+    companies: List[int]
+    weights: List[float]  # requests follow the tenant size skew
+    users: List[str]
+    employees: Dict[int, List[int]] = field(default_factory=dict)
+    tasks: Dict[int, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str) -> "Tenants":
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            sizes = db.execute("SELECT CompanyId, COUNT(*) FROM Task GROUP BY CompanyId ORDER BY CompanyId").fetchall()
+            tenants = cls(companies=[c for c, _ in sizes], weights=[n for _, n in sizes],
+                          users=[email for email, in db.execute("SELECT Email FROM Users WHERE IsActive = 1")])
+            for company_id, emp_id in db.execute("SELECT CompanyId, EmpId FROM Employee WHERE IsActive = 1"):
+                tenants.employees.setdefault(company_id, []).append(emp_id)
+            for company_id, task_id in db.execute("SELECT CompanyId, TaskId FROM Task WHERE IsActive = 1"):
+                tenants.tasks.setdefault(company_id, []).append(task_id)
+            return tenants
+        finally:
+            db.close()
+
+    def company(self, rng: random.Random) -> int:
+        return rng.choices(self.companies, self.weights)[0]
+
+
+# ---------------------------
+# SCENARIOS
+# ---------------------------
+# Each returns the next request for one virtual user; run.py drives them closed-loop.
+
+def login_storm(tenants: Tenants, rng: random.Random) -> Call:
+    """Everyone signing in at 9am: scrypt verification in the process pool, plus one indexed read."""
+    if rng.random() < 0.05:
+        return Call("POST", "/login", {"email": rng.choice(tenants.users), "password": "wrong-password"}, (401,))
+    return Call("POST", "/login", {"email": rng.choice(tenants.users), "password": BENCH_PASSWORD})
+
+
+def task_filter(tenants: Tenants, rng: random.Random) -> Call:
+    """The task board: a tenant's paginated, filtered task list, page and total in one query."""
+    company_id = tenants.company(rng)
+    body: Dict[str, Any] = {"page": rng.choice([1, 1, 1, 2, 3, 5, 10]), "PageLimit": rng.choice([10, 25, 50]),
+                            "CompanyId": company_id}
+    if rng.random() < 0.4:
+        body["Priority"] = rng.choice(PRIORITIES)
+    if rng.random() < 0.3:
+        body["AssignedTo"] = rng.choice(tenants.employees[company_id])
+    if rng.random() < 0.2:
+        body["TaskName"] = rng.choice(WORDS)
+    if rng.random() < 0.1:
+        body["ProjectName"] = rng.choice(WORDS)
+    if rng.random() < 0.3:
+        body["estimate_total"] = True
+    return Call("POST", "/tasks/paginated/filter", body)
+
+
+def logtime_bulk(tenants: Tenants, rng: random.Random, size: int = 100) -> Call:
+    """Timesheet import: one company's week of entries posted as a single JSON array."""
+    company_id = tenants.company(rng)
+    staff, tasks = tenants.employees[company_id], tenants.tasks[company_id]
+    monday = date(2025, 6, 2) - timedelta(weeks=rng.randint(0, 12))
+    rows = []
+    for _ in range(size):
+        emp_id = rng.choice(staff)
+        rows.append({"EmpId": emp_id, "TaskId": rng.choice(tasks), "CreatedBy": emp_id, "CompanyId": company_id,
+                     "Date": (monday + timedelta(days=rng.randint(0, 4))).isoformat(),
+                     "Description": "Bench entry", "HoursSpent": rng.randint(0, 8), "MinutesSpent": rng.choice((0, 30))})
+    return Call("POST", "/logtimes/bulk", rows)
+
+
+def exports(tenants: Tenants, rng: random.Random) -> Call:
+    """Month-end reporting: a tenant's tasks as CSV or its log time as NDJSON, streamed."""
+    company_id = rng.choice(tenants.companies)
+    if rng.random() < 0.5:
+        return Call("GET", f"/companies/{company_id}/tasks?format=csv")
+    return Call("GET", f"/companies/{company_id}/logtimes?format=ndjson")
+
+
+def mixed(tenants: Tenants, rng: random.Random) -> Call:
+    """A working day: mostly board reads, some logins and timesheets, the odd export."""
+    pick = rng.random()
+    if pick < 0.70:
+        return task_filter(tenants, rng)
+    if pick < 0.85:
+        return login_storm(tenants, rng)
+    if pick < 0.99:
+        return logtime_bulk(tenants, rng, size=rng.choice([5, 20, 50]))
+    return exports(tenants, rng)
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "task_filter": task_filter,
+    "logtime_bulk": logtime_bulk,
+    "exports": exports,
+    "mixed": mixed,
+}
+
+
+def describe(name: str) -> Optional[str]:
+    scenario = SCENARIOS.get(name)
+    return scenario.__doc__ if scenario else None
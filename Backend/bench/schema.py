@@ -0,0 +1,90 @@
+# SQLite mirror of the tables the routers touch, with the indexes from migrations/ and a
+# RowVer column kept current by triggers (SQL Server's rowversion, as 8-byte big-endian blobs,
+# so MAX(RowVer), "RowVer > %s" and .hex() behave as they do against the real database).
+
+VERSIONED_TABLES = ["Company", "Employee", "Projects", "Task", "LogTime", "ProjectEmployee"]
+
+TABLES = """
+CREATE TABLE Company (
+    CompanyId INTEGER PRIMARY KEY, Name TEXT NOT NULL, IsActive INTEGER NOT NULL DEFAULT 1,
+    CompanyDescription TEXT, CompanyLogoName TEXT, CompanyLogoUrl TEXT, CompanyLogoPath TEXT,
+    ContactNo TEXT, Email TEXT, Address TEXT,
+    CreatedOn TIMESTAMP DEFAULT CURRENT_TIMESTAMP, CreatedBy INTEGER,
+    UpdatedOn TIMESTAMP, UpdatedBy INTEGER, DeletedOn TIMESTAMP, DeletedBy INTEGER, RowVer BLOB
+);
+CREATE TABLE Role (
+    RoleId INTEGER PRIMARY KEY, Role TEXT NOT NULL, CompanyId INTEGER, IsActive INTEGER NOT NULL DEFAULT 1,
+    CreatedOn TIMESTAMP DEFAULT CURRENT_TIMESTAMP, CreatedBy INTEGER,
+    UpdatedOn TIMESTAMP, UpdatedBy INTEGER, DeletedOn TIMESTAMP, DeletedBy INTEGER
+);
+CREATE TABLE Users (
+    UserId INTEGER PRIMARY KEY, Email TEXT NOT NULL, Password TEXT, RoleId INTEGER, CompanyId INTEGER,
+    IsActive INTEGER NOT NULL DEFAULT 1, CreatedOn TIMESTAMP DEFAULT CURRENT_TIMESTAMP, CreatedBy INTEGER,
+    UpdatedOn TIMESTAMP, UpdatedBy INTEGER, DeletedOn TIMESTAMP, DeletedBy INTEGER
+);
+CREATE TABLE Employee (
+    EmpId INTEGER PRIMARY KEY, Name TEXT NOT NULL, RoleID INTEGER, Phone TEXT, Address TEXT, Email TEXT,
+    Description TEXT, CompanyId INTEGER, IsActive INTEGER NOT NULL DEFAULT 1,
+    ImgUrl TEXT, EmployeeImg TEXT, ImgPath TEXT,
+    CreatedOn TIMESTAMP DEFAULT CURRENT_TIMESTAMP, CreatedBy INTEGER,
+    UpdatedOn TIMESTAMP, UpdatedBy INTEGER, DeletedOn TIMESTAMP, DeletedBy INTEGER, RowVer BLOB
+);
+CREATE TABLE Projects (
+    ProjectId INTEGER PRIMARY KEY, Name TEXT NOT NULL, StartDate TIMESTAMP, EndDate TIMESTAMP,
+    ProjectManager INTEGER, Priority TEXT, Status TEXT, CompanyId INTEGER, Description TEXT,
+    IsActive INTEGER NOT NULL DEFAULT 1, CreatedOn TIMESTAMP DEFAULT CURRENT_TIMESTAMP, CreatedBy INTEGER,
+    UpdatedOn TIMESTAMP, UpdatedBy INTEGER, DeletedOn TIMESTAMP, DeletedBy INTEGER, RowVer BLOB
+);
+CREATE TABLE Task (
+    TaskId INTEGER PRIMARY KEY, Name TEXT NOT NULL, ProjectId INTEGER, AssignedTo INTEGER,
+    DocumentPath TEXT, DocumentUrl TEXT, Deadline TIMESTAMP, Priority TEXT, Status TEXT,
+    CreatedOn TIMESTAMP DEFAULT CURRENT_TIMESTAMP, CreatedBy INTEGER,
+    UpdatedOn TIMESTAMP, UpdatedBy INTEGER, DeletedOn TIMESTAMP, DeletedBy INTEGER,
+    CompanyId INTEGER, Description TEXT, DocumentName TEXT, IsActive INTEGER NOT NULL DEFAULT 1,
+    ExptedHours DECIMAL, RowVer BLOB
+);
+CREATE TABLE LogTime (
+    LogId INTEGER PRIMARY KEY, EmpId INTEGER, TaskId INTEGER, Date DATE,
+    CreatedOn TIMESTAMP DEFAULT CURRENT_TIMESTAMP, CreatedBy INTEGER,
+    UpdatedOn TIMESTAMP, UpdatedBy INTEGER, IsActive INTEGER NOT NULL DEFAULT 1,
+    DeletedOn TIMESTAMP, DeletedBy INTEGER, CompanyId INTEGER, Description TEXT,
+    MinutesSpent INTEGER, HoursSpent INTEGER, RowVer BLOB
+);
+CREATE TABLE ProjectEmployee (
+    ProjectEmployeeId INTEGER PRIMARY KEY, ProjectId INTEGER, EmpId INTEGER, ProjectRoleId INTEGER,
+    CreatedOn TIMESTAMP DEFAULT CURRENT_TIMESTAMP, CreatedBy INTEGER, IsActive INTEGER NOT NULL DEFAULT 1,
+    UpdatedOn TIMESTAMP, UpdatedBy INTEGER, CompanyId INTEGER, DeletedOn TIMESTAMP, DeletedBy INTEGER,
+    RowVer BLOB
+);
+CREATE TABLE _RowVersion (v INTEGER NOT NULL);
+"""
+
+# migrations/001_tenant_indexes.sql and 002_users_email_index.sql
+INDEXES = """
+CREATE INDEX IX_Task_Company_Active_Deadline ON Task (CompanyId, IsActive, Deadline, TaskId);
+CREATE INDEX IX_LogTime_Company_Active_LogId ON LogTime (CompanyId, IsActive, LogId);
+CREATE INDEX IX_Projects_Company_Active_ProjectId ON Projects (CompanyId, IsActive, ProjectId);
+CREATE INDEX IX_Employee_Company_Active_EmpId ON Employee (CompanyId, IsActive, EmpId);
+CREATE INDEX IX_Users_Company_Active_UserId ON Users (CompanyId, IsActive, UserId);
+CREATE INDEX IX_Role_Company_Active_RoleId ON Role (CompanyId, IsActive, RoleId);
+CREATE INDEX IX_ProjectEmployee_Company_Active_ProjectEmployeeId ON ProjectEmployee (CompanyId, IsActive, ProjectEmployeeId);
+CREATE INDEX IX_Users_Email ON Users (Email);
+CREATE INDEX IX_LogTime_Task ON LogTime (TaskId);
+"""
+
+
+def version_statements() -> str:
+    """migrations/003_table_versions.sql: RowVer indexes, plus triggers standing in for rowversion.
+    Run after the bulk load, which stamps RowVer itself."""
+    statements = []
+    for table in VERSIONED_TABLES:
+        statements.append(f"CREATE INDEX IX_{table}_RowVer ON {table} (RowVer);")
+        if table != "Company":
+            statements.append(f"CREATE INDEX IX_{table}_Company_RowVer ON {table} (CompanyId, RowVer);")
+        for event in ("INSERT", "UPDATE"):
+            statements.append(f"""
+                CREATE TRIGGER TR_{table}_RowVer_{event} AFTER {event} ON {table} BEGIN
+                    UPDATE _RowVersion SET v = v + 1;
+                    UPDATE {table} SET RowVer = rowversion((SELECT v FROM _RowVersion)) WHERE rowid = NEW.rowid;
+                END;""")
+    return "\n".join(statements)
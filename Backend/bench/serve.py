@@ -0,0 +1,24 @@
+import argparse
+
+from bench import fake_db
+from bench.datagen import SCALES, ensure_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve main.app over HTTP against a benchmark dataset, "
+                                                 "for `python -m bench.run --url`.")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    import uvicorn
+    # Writes land in the dataset itself; regenerate it (datagen --force) for a clean run
+    fake_db.install(ensure_dataset(args.scale, args.seed))
+    import main as app_module
+    uvicorn.run(app_module.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
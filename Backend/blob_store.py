@@ -0,0 +1,245 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+BLOB_DIR = os.getenv("BLOB_DIR", "blobs")
+# Freshly stored blobs are kept this long before GC may reclaim them, so an upload survives
+# until the task/employee/company that will reference it is saved
+BLOB_GC_GRACE = float(os.getenv("BLOB_GC_GRACE", str(24 * 3600)))
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_BLOB_URL = re.compile(r"/?blobs/([0-9a-f]{64})")
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    digest: str   # hex SHA-256 of the content
+    size: int
+    content_type: Optional[str]
+
+    @property
+    def url(self) -> str:
+        return blob_url(self.digest)
+
+
+def blob_url(digest: str) -> str:
+    return f"/blobs/{digest}"
+
+
+def blob_digest(*values: Optional[str]) -> Optional[str]:
+    """The blob a stored path/URL points at (e.g. DocumentPath or DocumentUrl), if any."""
+    for value in values:
+        match = _BLOB_URL.search(value) if value else None
+        if match:
+            return match.group(1)
+    return None
+
+
+class BlobStore:
+    """Content-addressed files under `root/ab/cd/<sha256>`, so identical content is stored once.
+
+    A local SQLite index keeps size, content type and a refcount per blob. References are
+    keyed by owner (e.g. "task:42:document"), so re-saving an owner is idempotent and replacing
+    its file moves the reference. `gc()` deletes blobs nobody references after a grace period.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, ".tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS Blobs (
+                    Hash TEXT PRIMARY KEY, Size INTEGER NOT NULL, ContentType TEXT,
+                    RefCount INTEGER NOT NULL DEFAULT 0, TouchedAt REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS IX_Blobs_Unreferenced ON Blobs (RefCount, TouchedAt)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS BlobRefs (Owner TEXT PRIMARY KEY, Hash TEXT NOT NULL)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS BlobVariants (
+                    SourceHash TEXT NOT NULL, Variant TEXT NOT NULL, VariantHash TEXT NOT NULL,
+                    PRIMARY KEY (SourceHash, Variant)
+                )""")
+
+    # ---------------------------
+    # PATHS
+    # ---------------------------
+    def path(self, digest: str) -> str:
+        if not _DIGEST.match(digest):
+            raise ValueError(f"Not a blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def temp_path(self) -> str:
+        """Where to stream an upload before `ingest`; same filesystem, so ingest is a rename."""
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex)
+
+    # ---------------------------
+    # WRITES
+    # ---------------------------
+    def info(self, digest: str) -> Optional[BlobInfo]:
+        if not _DIGEST.match(digest):
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT Hash, Size, ContentType FROM Blobs WHERE Hash = ?", (digest,)).fetchone()
+        if row is None or not os.path.exists(self.path(digest)):
+            return None
+        return BlobInfo(*row)
+
+    def _record(self, digest: str, size: int, content_type: Optional[str]) -> BlobInfo:
+        # Touching an existing blob restarts its GC grace period; a new one starts with any
+        # references saved before its content arrived
+        self._conn.execute(
+            "INSERT INTO Blobs (Hash, Size, ContentType, RefCount, TouchedAt) "
+            "VALUES (?, ?, ?, (SELECT COUNT(*) FROM BlobRefs WHERE Hash = ?), ?) "
+            "ON CONFLICT (Hash) DO UPDATE SET TouchedAt = excluded.TouchedAt",
+            (digest, size, content_type, digest, time.time()))
+        row = self._conn.execute("SELECT Hash, Size, ContentType FROM Blobs WHERE Hash = ?", (digest,)).fetchone()
+        return BlobInfo(*row)
+
+    def ingest(self, temp_path: str, digest: str, size: int, content_type: Optional[str] = None) -> BlobInfo:
+        """Adopt a fully written temp file; if the content is already stored the temp file is dropped."""
+        final_path = self.path(digest)
+        with self._lock:
+            if os.path.exists(final_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+            return self._record(digest, size, content_type)
+
+    def touch(self, digest: str) -> Optional[BlobInfo]:
+        """Re-use stored content without sending it again (zero write I/O), or None if unknown."""
+        info = self.info(digest)
+        if info is None:
+            return None
+        with self._lock:
+            return self._record(digest, info.size, info.content_type)
+
+    def put_bytes(self, data: bytes, content_type: Optional[str] = None) -> BlobInfo:
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self.touch(digest)
+        if existing is not None:
+            return existing
+        temp_path = self.temp_path()
+        with open(temp_path, "wb") as fh:
+            fh.write(data)
+        return self.ingest(temp_path, digest, len(data), content_type)
+
+    # ---------------------------
+    # REFERENCES
+    # ---------------------------
+    def set_ref(self, owner: str, digest: Optional[str]):
+        """Point `owner` at `digest` (None drops its reference), adjusting both refcounts atomically."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT Hash FROM BlobRefs WHERE Owner = ?", (owner,)).fetchone()
+                old = row[0] if row else None
+                if old == digest:
+                    self._conn.execute("COMMIT")
+                    return
+                if old is not None:
+                    self._conn.execute("UPDATE Blobs SET RefCount = RefCount - 1, TouchedAt = ? WHERE Hash = ?",
+                                       (time.time(), old))
+                if digest is None:
+                    self._conn.execute("DELETE FROM BlobRefs WHERE Owner = ?", (owner,))
+                else:
+                    self._conn.execute("UPDATE Blobs SET RefCount = RefCount + 1 WHERE Hash = ?", (digest,))
+                    self._conn.execute("INSERT INTO BlobRefs (Owner, Hash) VALUES (?, ?) "
+                                       "ON CONFLICT (Owner) DO UPDATE SET Hash = excluded.Hash", (owner, digest))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ---------------------------
+    # VARIANTS
+    # ---------------------------
+    # Derived renditions (e.g. a WebP thumbnail) are blobs of their own, referenced by their
+    # source as owner "variant:<source>:<name>" and released when the source is collected.
+
+    def set_variant(self, source: str, name: str, variant: str):
+        self.set_ref(f"variant:{source}:{name}", variant)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO BlobVariants (SourceHash, Variant, VariantHash) VALUES (?, ?, ?) "
+                "ON CONFLICT (SourceHash, Variant) DO UPDATE SET VariantHash = excluded.VariantHash",
+                (source, name, variant))
+
+    def variant_names(self, source: str) -> set:
+        with self._lock:
+            rows = self._conn.execute("SELECT Variant FROM BlobVariants WHERE SourceHash = ?", (source,)).fetchall()
+        return {row[0] for row in rows}
+
+    def variants(self, sources: Iterable[str], name: str) -> Dict[str, str]:
+        """{source digest: variant digest} for the sources that already have `name` rendered."""
+        sources = list(dict.fromkeys(sources))
+        found = {}
+        with self._lock:
+            for start in range(0, len(sources), 500):
+                chunk = sources[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT SourceHash, VariantHash FROM BlobVariants "
+                    f"WHERE Variant = ? AND SourceHash IN ({', '.join('?' * len(chunk))})",
+                    (name, *chunk)).fetchall()
+                found.update(rows)
+        return found
+
+    def _drop_variants(self, source: str):
+        # Called under the lock: the variant blobs become unreferenced and go on a later pass
+        for variant_hash, in self._conn.execute(
+                "SELECT VariantHash FROM BlobVariants WHERE SourceHash = ?", (source,)).fetchall():
+            self._conn.execute("UPDATE Blobs SET RefCount = RefCount - 1 WHERE Hash = ?", (variant_hash,))
+        self._conn.execute("DELETE FROM BlobRefs WHERE Owner LIKE ?", (f"variant:{source}:%",))
+        self._conn.execute("DELETE FROM BlobVariants WHERE SourceHash = ?", (source,))
+
+    # ---------------------------
+    # GARBAGE COLLECTION
+    # ---------------------------
+    def gc(self, grace: float = BLOB_GC_GRACE) -> dict:
+        """Delete unreferenced blobs untouched for `grace` seconds, plus stale temp files."""
+        cutoff = time.time() - grace
+        removed, freed = 0, 0
+        with self._lock:
+            # Repeat until stable: removing a source can orphan its variants
+            while True:
+                rows = self._conn.execute(
+                    "SELECT Hash, Size FROM Blobs WHERE RefCount <= 0 AND TouchedAt < ?", (cutoff,)).fetchall()
+                if not rows:
+                    break
+                for digest, size in rows:
+                    self._conn.execute("DELETE FROM Blobs WHERE Hash = ? AND RefCount <= 0", (digest,))
+                    self._drop_variants(digest)
+                    try:
+                        os.remove(self.path(digest))
+                    except FileNotFoundError:
+                        pass
+                    removed += 1
+                    freed += size
+        for name in os.listdir(self.tmp_dir):
+            temp_path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.path.getmtime(temp_path) < cutoff:
+                    os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+        return {"removed": removed, "bytes_freed": freed}
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size, unreferenced = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(Size), 0), COALESCE(SUM(RefCount <= 0), 0) FROM Blobs").fetchone()
+        return {"blobs": count, "bytes": size, "unreferenced": unreferenced}
+
+
+blob_store = BlobStore(BLOB_DIR)
@@ -0,0 +1,69 @@
+import hashlib
+import os
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from blob_store import BlobInfo, blob_store
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+def too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {limit} byte limit")
+
+
+# ---------------------------
+# CHUNKED WRITES (off the event loop)
+# ---------------------------
+# File I/O and hashing run on the threadpool one chunk at a time, so the loop only ever
+# holds a single chunk and is never blocked by the disk; hashlib drops the GIL on big buffers.
+
+def write_chunk(fh, hasher, chunk: bytes):
+    fh.write(chunk)
+    hasher.update(chunk)
+
+
+def sync_close(fh):
+    fh.flush()
+    os.fsync(fh.fileno())
+    fh.close()
+
+
+def _finish(fh, partial_path: str, hasher, size: int, content_type: Optional[str]):
+    sync_close(fh)
+    # Identical content already stored: the partial file is simply dropped
+    return blob_store.ingest(partial_path, hasher.hexdigest(), size, content_type)
+
+
+def _discard(fh, partial_path: str):
+    fh.close()
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+
+async def store_stream(chunks: AsyncIterator[bytes], limit: int, content_type: Optional[str]) -> BlobInfo:
+    """Stream an upload into the blob store, hashing as it goes; 413 as soon as it passes `limit`."""
+    partial_path = blob_store.temp_path()
+    hasher = hashlib.sha256()
+    size = 0
+    fh = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > limit:
+                raise too_large(limit)
+            await run_in_threadpool(write_chunk, fh, hasher, chunk)
+        return await run_in_threadpool(_finish, fh, partial_path, hasher, size, content_type)
+    except BaseException:
+        await run_in_threadpool(_discard, fh, partial_path)
+        raise
+
+
+async def file_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
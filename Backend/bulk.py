@@ -0,0 +1,106 @@
+import json
+import os
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+
+# SQL Server caps a statement at 2100 parameters and a VALUES list at 1000 rows
+_MAX_PARAMS = 2000
+_MAX_VALUES_ROWS = 1000
+
+
+class InvalidRow:
+    """Placeholder for an NDJSON line that could not be decoded; reported back per row."""
+
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+# ---------------------------
+# REQUEST BODY
+# ---------------------------
+def _decode_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return InvalidRow(f"Invalid JSON: {e}")
+
+
+async def read_bulk_rows(request: Request, max_rows: int = BULK_MAX_ROWS) -> List[Any]:
+    """Read a bulk body: a JSON array, or NDJSON (one object per line) decoded as it streams in."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items, buffer = [], b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            items.extend(_decode_line(line) for line in lines if line.strip())
+            if len(items) > max_rows:
+                raise HTTPException(status_code=413, detail=f"At most {max_rows} rows per request")
+        if buffer.strip():
+            items.append(_decode_line(buffer))
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of rows")
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No rows provided")
+    if len(items) > max_rows:
+        raise HTTPException(status_code=413, detail=f"At most {max_rows} rows per request")
+    return items
+
+
+def validate_rows(items: Sequence[Any], model: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], Dict[int, Any]]:
+    """Parse every item into `model`; returns ([(index, row)], {index: error detail})."""
+    rows, errors = [], {}
+    for index, item in enumerate(items):
+        if isinstance(item, InvalidRow):
+            errors[index] = item.detail
+            continue
+        try:
+            rows.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            errors[index] = e.errors(include_url=False, include_context=False, include_input=False)
+    return rows, errors
+
+
+# ---------------------------
+# SET-BASED STATEMENTS
+# ---------------------------
+def batches(rows: Sequence[Any], params_per_row: int) -> Iterator[Sequence[Any]]:
+    """Split rows so each multi-row statement stays under SQL Server's parameter limit."""
+    size = max(1, min(_MAX_VALUES_ROWS, _MAX_PARAMS // params_per_row))
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def values_placeholders(row_count: int, params_per_row: int) -> str:
+    row = "(" + ", ".join(["%s"] * params_per_row) + ")"
+    return ", ".join([row] * row_count)
+
+
+def reject_invalid(errors: Dict[int, Any]):
+    """Used by atomic requests: fail the whole batch before anything is written."""
+    if errors:
+        raise HTTPException(status_code=422, detail={
+            "message": "No rows were written because some rows are invalid",
+            "errors": [{"index": i, "detail": errors[i]} for i in sorted(errors)],
+        })
+
+
+def bulk_response(results: Dict[int, Dict[str, Any]], errors: Dict[int, Any]) -> Dict[str, Any]:
+    """Merge per-row successes and failures back into request order."""
+    combined = dict(results)
+    combined.update({i: {"index": i, "status": "error", "detail": detail} for i, detail in errors.items()})
+    return {
+        "succeeded": len(results),
+        "failed": len(errors),
+        "results": [combined[i] for i in sorted(combined)],
+    }
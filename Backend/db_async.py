@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+import db_connection
+
+
+class DBExecutor:
+    """Runs blocking pymssql work off the event loop on a dedicated, bounded set of threads.
+
+    Handlers `await run_db(fn, ...)`; `fn(conn, ...)` runs on a worker thread with a pooled
+    connection. Waiting requests are cheap coroutines instead of parked anyio threads, and once
+    `max_pending` calls are queued new ones are rejected with 503 instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0   # only touched from the event loop thread
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        if self._pending >= self.max_pending:
+            raise HTTPException(status_code=503, detail="Database is busy, please retry.",
+                                headers={"Retry-After": "1"})
+
+        def call():
+            with db_connection.pooled_connection() as conn:
+                return fn(conn, *args, **kwargs)
+
+        # copy_context keeps contextvars (request-scoped state) visible on the worker thread
+        ctx = contextvars.copy_context()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), ctx.run, call)
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        return {"max_workers": self.max_workers, "max_pending": self.max_pending, "pending": self._pending}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# One worker per pooled connection, so worker threads never block waiting on the pool
+executor = DBExecutor(
+    max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", str(db_connection.pool.max_size))),
+    max_pending=int(os.getenv("DB_EXECUTOR_MAX_PENDING", "2000")),
+)
+
+
+async def run_db(fn, *args, **kwargs):
+    return await executor.run(fn, *args, **kwargs)
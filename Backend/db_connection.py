@@ -1,11 +1,199 @@
-
+import os
+import threading
+import time
+from contextlib import contextmanager
 
 import pymssql
 
-def get_connection():
+from metrics import InstrumentedConnection
+
+
+def _connect():
     return pymssql.connect(
         server='taskserver123.database.windows.net',
         user='adminuser',
         password='StrongPassword@123',
         database='TaskManager'
     )
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of pymssql connections shared by every router."""
+
+    def __init__(self, connect=_connect, min_size: int = 2, max_size: int = 20,
+                 max_age: float = 1800.0, idle_check: float = 30.0, timeout: float = 30.0):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_age = max_age          # recycle connections older than this (seconds)
+        self.idle_check = idle_check    # ping connections idle longer than this on checkout
+        self.timeout = timeout          # how long a checkout may wait for a free connection
+        self._idle = []                 # [(conn, created_at, last_used_at)]
+        self._created_at = {}           # id(conn) -> created_at, for checked-out connections
+        self._live = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "failed_health_checks": 0,
+        }
+
+    # ---------------------------
+    # CHECKOUT / RETURN
+    # ---------------------------
+    def acquire(self):
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    break
+                if self._live < self.max_size:
+                    self._live += 1
+                    conn = None
+                    break
+                waited = True
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._live >= self.max_size:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection available within {self.timeout}s")
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time"] += time.monotonic() - started
+
+        if conn is not None:
+            # A stale connection's slot is kept for its replacement, which _open() fills
+            now = time.monotonic()
+            if now - created_at > self.max_age:
+                self._close(conn, recycled=True, keep_slot=True)
+                conn = None
+            elif now - last_used > self.idle_check and not self._is_healthy(conn):
+                self._close(conn, recycled=True, keep_slot=True)
+                conn = None
+        if conn is None:
+            conn, created_at = self._open()
+
+        with self._cond:
+            self._created_at[id(conn)] = created_at
+        return conn
+
+    def release(self, conn, broken: bool = False):
+        with self._cond:
+            created_at = self._created_at.pop(id(conn), None)
+        if created_at is None:
+            return
+        if not broken:
+            try:
+                # Never hand an open transaction to the next request
+                conn.rollback()
+            except Exception:
+                broken = True
+        if broken or time.monotonic() - created_at > self.max_age:
+            self._close(conn, recycled=True)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    # ---------------------------
+    # HELPERS
+    # ---------------------------
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn, time.monotonic()
+
+    def _close(self, conn, recycled: bool = False, keep_slot: bool = False):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            if not keep_slot:
+                self._live -= 1
+                self._cond.notify()
+            if recycled:
+                self._stats["recycled"] += 1
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["failed_health_checks"] += 1
+            return False
+
+    def warm(self):
+        """Open connections up to min_size so the first requests skip the handshake."""
+        opened = []
+        try:
+            while len(opened) < self.min_size:
+                opened.append(self.acquire())
+        finally:
+            for conn in opened:
+                self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self._stats,
+                "live": self._live,
+                "idle": len(self._idle),
+                "in_use": self._live - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+
+pool = ConnectionPool(
+    min_size=int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+    max_age=float(os.getenv("DB_POOL_MAX_AGE", "1800")),
+    idle_check=float(os.getenv("DB_POOL_IDLE_CHECK", "30")),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+)
+
+
+def get_connection():
+    # FastAPI dependency: the connection always goes back to the pool after the response
+    conn = pool.acquire()
+    broken = False
+    try:
+        # Routes see a wrapper that times every query into /metrics; the pool keeps the raw one
+        yield InstrumentedConnection(conn)
+    except pymssql.Error:
+        broken = True
+        raise
+    finally:
+        pool.release(conn, broken=broken)
+
+
+# For `with pooled_connection() as conn:` blocks outside of Depends
+pooled_connection = contextmanager(get_connection)
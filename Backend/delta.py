@@ -0,0 +1,78 @@
+from typing import Any, Dict, Optional
+
+import pymssql
+from fastapi import HTTPException
+
+from row_mapping import ColumnSet
+
+DELTA_DEFAULT_LIMIT = 500
+DELTA_MAX_LIMIT = 5000
+SINCE_HELP = "`version` from the previous response; omit for the initial snapshot"
+
+
+# ---------------------------
+# DELTA SYNC
+# ---------------------------
+# The watermark is the RowVer (rowversion) column from migrations/003_table_versions.sql:
+# SQL Server bumps it on every insert and update, soft deletes included, and never reuses a
+# value, so "RowVer > watermark" is exactly what changed. Reads stop below
+# MIN_ACTIVE_ROWVERSION(), so a transaction still in flight with a lower RowVer cannot be
+# skipped past; once caught up, the watermark moves to just under that bound.
+# Both (RowVer) and (CompanyId, RowVer) are indexed, so a poll with no changes is a single seek.
+
+def _decode_version(raw: Optional[str]) -> bytes:
+    try:
+        version = bytes.fromhex(raw)
+    except ValueError:
+        version = b""
+    if len(version) != 8:
+        raise HTTPException(status_code=400, detail="Invalid since_version.")
+    return version
+
+
+def fetch_changes(db: pymssql.Connection, columns: ColumnSet, since_version: Optional[str],
+                  company_id: Optional[int], limit: int) -> Dict[str, Any]:
+    """Rows changed after `since_version`, oldest first: live rows in full under "changed",
+    soft-deleted ones as bare keys under "deleted". Feed "version" back in as the next
+    watermark, immediately while "has_more" is true."""
+    filters = ["RowVer < %s"]
+    params = []
+    if since_version:
+        filters.append("RowVer > %s")
+        params.append(_decode_version(since_version))
+    else:
+        filters.append("IsActive = 1")  # a client starting from nothing has nothing to delete
+    if company_id is not None:
+        filters.append("CompanyId = %s")
+        params.append(company_id)
+
+    query = (f"SELECT TOP ({limit + 1}) RowVer, {columns.select_list()} FROM {columns.table} "
+             f"WHERE {' AND '.join(filters)} ORDER BY RowVer")
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT MIN_ACTIVE_ROWVERSION()")
+            bound = bytes(cursor.fetchone()[0])
+            cursor.execute(query, (bound, *params))
+            rows = cursor.fetchall()
+    except pymssql.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    to_record = columns.record_mapper()
+    key_at = columns.columns.index(columns.key[0]) + 1
+    active_at = columns.columns.index("IsActive") + 1
+
+    changed, deleted = [], []
+    for row in rows:
+        if row[active_at]:
+            changed.append(to_record(row[1:]))
+        else:
+            deleted.append(row[key_at])
+
+    if has_more:
+        version = rows[-1][0].hex()
+    else:
+        # Everything below the bound has been read, so the next poll can start just under it
+        version = (int.from_bytes(bound, "big") - 1).to_bytes(8, "big").hex()
+    return {"changed": changed, "deleted": deleted, "version": version, "has_more": has_more}
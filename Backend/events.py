@@ -0,0 +1,126 @@
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fast_json import dumps
+
+# Frames a slow client may fall behind by before it is told to resync instead
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+# Comment frames on idle streams keep proxies from closing them
+EVENT_HEARTBEAT = float(os.getenv("EVENT_HEARTBEAT", "15"))
+
+RESYNC = b"event: resync\ndata: {}\n\n"
+
+
+def company_topic(company_id: Optional[int]) -> Optional[str]:
+    return f"company:{company_id}" if company_id is not None else None
+
+
+def project_topic(project_id: Optional[int]) -> Optional[str]:
+    return f"project:{project_id}" if project_id is not None else None
+
+
+def assignee_topic(emp_id: Optional[int]) -> Optional[str]:
+    return f"assignee:{emp_id}" if emp_id is not None else None
+
+
+class Subscription:
+    """One SSE client: the topics it follows and a bounded queue of encoded frames."""
+
+    def __init__(self, topics: Iterable[str], loop: asyncio.AbstractEventLoop):
+        self.topics = frozenset(topics)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+
+    def deliver(self, frame: bytes):
+        # Runs on the subscriber's loop. A client too slow to drain its queue gets a single
+        # "resync" (refetch via the /changes endpoints) rather than unbounded memory.
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+def _fan_out(subscriptions: List[Subscription], frame: bytes):
+    for subscription in subscriptions:
+        subscription.deliver(frame)
+
+
+class EventBus:
+    """In-process pub/sub for change events.
+
+    Writers publish from any thread (route handlers run on the threadpool and DB executor);
+    each event is encoded once and handed to every subscribed loop with call_soon_threadsafe.
+    Publishing with no subscribers costs a dict lookup. Subscribers only see events of the
+    worker process they are connected to.
+    """
+
+    def __init__(self):
+        self._by_topic: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(topics, asyncio.get_running_loop())
+        with self._lock:
+            for topic in subscription.topics:
+                self._by_topic.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._by_topic.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_topic[topic]
+
+    def publish(self, event: str, data: Dict[str, Any], topics: Iterable[Optional[str]]):
+        with self._lock:
+            targets = set()
+            for topic in topics:
+                if topic is not None:
+                    targets.update(self._by_topic.get(topic, ()))
+        if not targets:
+            return
+
+        frame = b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+        by_loop: Dict[asyncio.AbstractEventLoop, List[Subscription]] = {}
+        for subscription in targets:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_fan_out, subscriptions, frame)
+            except RuntimeError:
+                pass  # loop already closed (shutdown); its streams are gone
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscriptions = set().union(*self._by_topic.values()) if self._by_topic else set()
+            return {"subscribers": len(subscriptions), "topics": len(self._by_topic)}
+
+
+bus = EventBus()
+
+
+# ---------------------------
+# CHANGE EVENTS
+# ---------------------------
+# Compact on purpose: enough to tell a client which list is stale and what to refetch.
+
+def publish_task(event: str, task: Any, previous_assignee: Optional[int] = None):
+    bus.publish(event, {
+        "TaskId": task.TaskId, "ProjectId": task.ProjectId, "AssignedTo": task.AssignedTo,
+        "CompanyId": task.CompanyId, "Status": task.Status,
+    }, [company_topic(task.CompanyId), project_topic(task.ProjectId), assignee_topic(task.AssignedTo),
+        assignee_topic(previous_assignee) if previous_assignee != task.AssignedTo else None])
+
+
+def publish_logtime(event: str, log_id: int, task_id: Optional[int], emp_id: Optional[int],
+                    company_id: Optional[int], previous_emp_id: Optional[int] = None):
+    bus.publish(event, {"LogId": log_id, "TaskId": task_id, "EmpId": emp_id, "CompanyId": company_id},
+                [company_topic(company_id), assignee_topic(emp_id),
+                 assignee_topic(previous_emp_id) if previous_emp_id != emp_id else None])
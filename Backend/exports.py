@@ -0,0 +1,67 @@
+import csv
+import io
+import os
+from typing import Any, Callable, Iterator, List, Literal, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json, to_jsonable_python
+
+from db_connection import pooled_connection
+
+# Route parameters are typed ExportFormat, so FastAPI answers an unknown ?format= with a 422
+ExportFormat = Literal["json", "ndjson", "csv"]
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _ndjson_chunk(records: List[Any]) -> bytes:
+    return b"".join(to_json(record) + b"\n" for record in records)
+
+
+def _csv_chunk(records: List[Any], header: Optional[List[str]]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header is not None:
+        writer.writerow(header)
+    for record in records:
+        writer.writerow(to_jsonable_python(record).values())
+    return buffer.getvalue().encode("utf-8")
+
+
+def _field_names(record: Any) -> List[str]:
+    return list(to_jsonable_python(record).keys())
+
+
+def _export_rows(query: str, params: Sequence[Any], to_record: Callable[[Any], Any], fmt: str,
+                 as_dict: bool) -> Iterator[bytes]:
+    # Runs chunk by chunk on Starlette's threadpool; the connection is held only while streaming
+    with pooled_connection() as conn:
+        cursor = conn.cursor(as_dict=as_dict)
+        cursor.execute(query, tuple(params))
+        first = True
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            records = [to_record(row) for row in rows]
+            if fmt == "ndjson":
+                yield _ndjson_chunk(records)
+            else:
+                yield _csv_chunk(records, _field_names(records[0]) if first else None)
+            first = False
+
+
+def stream_export(query: str, params: Sequence[Any], to_record: Callable[[Any], Any], fmt: str,
+                  filename: str, as_dict: bool = False) -> StreamingResponse:
+    """Stream a query as NDJSON or CSV, mapping each row with `to_record` (a model or a dict).
+
+    Rows are read with fetchmany in EXPORT_CHUNK_SIZE chunks, so memory stays flat however
+    large the table is and the first chunk goes out as soon as the database returns it.
+    """
+    if fmt not in _MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {fmt}")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    return StreamingResponse(_export_rows(query, params, to_record, fmt, as_dict),
+                             media_type=_MEDIA_TYPES[fmt], headers=headers)
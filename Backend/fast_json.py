@@ -0,0 +1,35 @@
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # optional; pydantic-core's serializer produces the same bytes, just slower
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    # pydantic serializes Decimal as a JSON string ("1.50"); keep that so output does not change
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode plain dicts/lists/scalars to compact JSON, byte-for-byte what FastAPI emits for the Out models."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """Returned directly by list endpoints whose rows are already plain dicts in Out-model field order.
+
+    A Response instance bypasses `response_model`, so rows are neither built into models nor
+    re-validated; the route keeps its `response_model` for the OpenAPI schema only.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
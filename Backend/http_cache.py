@@ -0,0 +1,47 @@
+import os
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+
+# Hash-addressed URLs never change content, so clients may keep them for a year without asking
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Files served by name may be replaced; cache briefly, then revalidate with the ETag
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/"x" matches "x", and * matches anything."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str, cache_control: Optional[str] = None) -> Optional[Response]:
+    """A bodiless 304 when the client already holds `etag`, else None."""
+    if not etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles (which already answers If-None-Match/If-Modified-Since with 304) plus a
+    Cache-Control header, so browsers stop re-requesting every file on every page view."""
+
+    def __init__(self, *args, cache_control: str = f"public, max-age={STATIC_MAX_AGE}", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", self.cache_control)
+        return response
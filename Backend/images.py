@@ -0,0 +1,160 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+
+from blob_store import BlobInfo, blob_digest, blob_store, blob_url
+from blob_streaming import file_chunks, store_stream
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it every variant falls back to the original
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each rendered WebP variant
+IMAGE_VARIANTS = {"thumb": 64, "small": 160, "medium": 480}
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+
+
+# ---------------------------
+# RENDERING (runs in worker processes)
+# ---------------------------
+def render_variants(source_path: str, sizes: Dict[str, int]) -> Dict[str, bytes]:
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        rendered = {}
+        for name, edge in sizes.items():
+            copy = image.copy()
+            copy.thumbnail((edge, edge), Image.LANCZOS)
+            out = io.BytesIO()
+            copy.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+            rendered[name] = out.getvalue()
+        return rendered
+
+
+class ImagePool:
+    """Renders image variants in worker processes, so decoding and resizing never hold the GIL
+    of the API process. Work is fire-and-forget: until a variant exists, the original is served.
+
+    Like HashingPool, it stops taking work once `max_pending` sources are queued.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._inflight = set()   # source digests being rendered
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs DB and executor threads is not safe
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def schedule(self, blob: BlobInfo) -> bool:
+        """Queue the missing variants of an image blob; False if nothing was queued."""
+        if Image is None or not (blob.content_type or "").startswith("image/"):
+            return False
+        missing = {name: edge for name, edge in IMAGE_VARIANTS.items()
+                   if name not in blob_store.variant_names(blob.digest)}
+        if not missing:
+            return False
+        with self._lock:
+            if blob.digest in self._inflight or len(self._inflight) >= self.max_pending:
+                return False
+            self._inflight.add(blob.digest)
+            future = self._get_executor().submit(render_variants, blob_store.path(blob.digest), missing)
+        future.add_done_callback(lambda f: self._store(blob.digest, f))
+        return True
+
+    def schedule_digest(self, digest: Optional[str]) -> bool:
+        # For images that arrived through /upload and were then attached by URL
+        blob = blob_store.info(digest) if digest else None
+        return self.schedule(blob) if blob else False
+
+    def _store(self, source: str, future):
+        try:
+            for name, data in future.result().items():
+                variant = blob_store.put_bytes(data, "image/webp")
+                blob_store.set_variant(source, name, variant.digest)
+        except Exception as e:
+            logger.warning("Could not render variants for blob %s: %s", source, e)
+        finally:
+            with self._lock:
+                self._inflight.discard(source)
+
+    def stats(self) -> dict:
+        return {"enabled": Image is not None, "max_workers": self.max_workers,
+                "max_pending": self.max_pending, "pending": len(self._inflight)}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+image_pool = ImagePool(
+    max_workers=int(os.getenv("IMAGE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))),
+    max_pending=int(os.getenv("IMAGE_MAX_PENDING", "200")),
+)
+
+
+# ---------------------------
+# INPUT
+# ---------------------------
+def require_image(content_type: Optional[str]) -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if not content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Expected an image upload.")
+    return content_type
+
+
+async def receive_image(request: Request) -> BlobInfo:
+    """Store an image sent as multipart (field "file") or as a raw image/* body, streaming
+    either way, and queue its variants."""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form(max_files=1, max_fields=0)
+        try:
+            file = form.get("file")
+            if not isinstance(file, UploadFile):
+                raise HTTPException(status_code=400, detail='Missing image file field "file".')
+            blob = await store_stream(file_chunks(file), IMAGE_MAX_BYTES, require_image(file.content_type))
+        finally:
+            await form.close()
+    else:
+        content_type = require_image(request.headers.get("content-type"))
+        blob = await store_stream(request.stream(), IMAGE_MAX_BYTES, content_type)
+    await run_in_threadpool(image_pool.schedule, blob)
+    return blob
+
+
+# ---------------------------
+# OUTPUT
+# ---------------------------
+def check_variant(name: Optional[str]) -> Optional[str]:
+    if name is not None and name not in IMAGE_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Unknown image variant {name!r}; "
+                                                    f"expected one of {', '.join(IMAGE_VARIANTS)}.")
+    return name
+
+
+def variant_urls(values: Iterable[Optional[str]], name: str) -> Dict[str, str]:
+    """{stored path/URL: URL to serve} for values that point at a blob: the rendered variant
+    when it exists, otherwise the original blob (never an inline data: URL)."""
+    digests = {value: blob_digest(value) for value in values if value}
+    digests = {value: digest for value, digest in digests.items() if digest}
+    rendered = blob_store.variants(digests.values(), name)
+    return {value: blob_url(rendered.get(digest, digest)) for value, digest in digests.items()}
@@ -1,19 +1,126 @@
-import jwt
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Optional
+
+import jwt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-SECRET_KEY = "your-secret-key"
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
 
+security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+
+class TokenError(Exception):
+    """Raised by decode_access_token for an expired, malformed or tampered token."""
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The caller behind a verified access token."""
+    user_id: int
+    role: int
+    company_id: Optional[int]
+    email: Optional[str]
+    expires_at: float  # the token's exp, as a Unix timestamp
+
+
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def decode_access_token(token: str):
+
+# ---------------------------
+# VERIFIED-TOKEN CACHE
+# ---------------------------
+class TokenCache:
+    """Bounded LRU of already-verified tokens, keyed by the SHA-256 digest of the raw token.
+
+    An entry lives exactly as long as its token (until `exp`), so a polling client pays for
+    signature verification once per token instead of once per request.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # digest -> Principal
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes) -> Optional[Principal]:
+        with self._lock:
+            principal = self._entries.get(digest)
+            if principal is None:
+                return None
+            if principal.expires_at <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return principal
+
+    def set(self, digest: bytes, principal: Principal):
+        with self._lock:
+            self._entries[digest] = principal
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(max_entries=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
+
+
+def _principal(payload: dict) -> Principal:
+    return Principal(
+        user_id=payload["user_id"],
+        role=payload["role"],
+        company_id=payload.get("company_id"),
+        email=payload.get("sub"),
+        expires_at=float(payload["exp"]),
+    )
+
+
+def decode_access_token(token: str) -> Principal:
+    digest = hashlib.sha256(token.encode()).digest()
+    principal = token_cache.get(digest)
+    if principal is not None:
+        return principal
+
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp"]})
+        principal = _principal(payload)
     except jwt.ExpiredSignatureError:
-        raise Exception("Token expired")
-    except jwt.InvalidTokenError:
-        raise Exception("Invalid token")
+        raise TokenError("Token expired")
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+        raise TokenError("Invalid token")
+
+    token_cache.set(digest, principal)
+    return principal
+
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    try:
+        return decode_access_token(credentials.credentials)
+    except TokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[Principal]:
+    """Like get_current_user, but anonymous callers get None instead of a 401."""
+    if credentials is None:
+        return None
+    return get_current_user(credentials)
@@ -1,7 +1,8 @@
-import os
-import shutil
-from fastapi import FastAPI, File, UploadFile
-from fastapi.staticfiles import StaticFiles
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 # Routes
@@ -15,8 +16,35 @@ from routes.logtime_route import router as logtime_router
 from routes.EmployeeProject_route import router as employeeProject_router
 from routes.ProjectRole_router import router as ProjectRole_router
 from routes.auth_route import router as auth_router
+from routes.upload_route import router as upload_router, UPLOAD_DIR, LEGACY_IMAGE_DIR
+from routes.blob_route import router as blob_router
+from routes.events_route import router as events_router
+from routes.profile_route import router as profile_router
+from db_connection import pool, PoolTimeout
+from db_async import executor as db_executor
+from passwords import hashing
+from http_cache import IMMUTABLE, CachedStaticFiles
+from images import image_pool
+from events import bus
+from metrics import MetricsMiddleware, metrics
+from profiling import ProfilerMiddleware
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-open min_size connections; the app still starts if the database is unreachable
+    try:
+        await run_in_threadpool(pool.warm)
+    except Exception as e:
+        logger.warning("Could not warm database pool: %s", e)
+    yield
+    await run_in_threadpool(db_executor.shutdown)
+    await run_in_threadpool(hashing.shutdown)
+    await run_in_threadpool(image_pool.shutdown)
+    await run_in_threadpool(pool.close_all)
+
+app = FastAPI(lifespan=lifespan)
 
 # ✅ Add CORS middleware BEFORE route registration
 app.add_middleware(
@@ -28,7 +56,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the app read ETags (sent back as If-None-Match on POSTed paginated polls) and profiler headers
+    expose_headers=["ETag", "X-Profile-Id", "Server-Timing"],
 )
+# Inside MetricsMiddleware, whose per-request stats give the profile its DB time
+app.add_middleware(ProfilerMiddleware)
+# Outermost, so its latency covers CORS handling and every byte of the response
+app.add_middleware(MetricsMiddleware)
 
 # ✅ Now include routes
 app.include_router(company_router, tags=["Company Management"])
@@ -41,15 +75,37 @@ app.include_router(logtime_router, tags=["Log Time Management"])
 app.include_router(employeeProject_router, tags=["Employee Project Management"])
 app.include_router(ProjectRole_router, tags=["Project Role Management"])
 app.include_router(auth_router, tags=["Authentication"])
+app.include_router(upload_router, tags=["Uploads"])
+app.include_router(blob_router, tags=["Uploads"])
+app.include_router(events_router, tags=["Events"])
+app.include_router(profile_router, tags=["Health"])
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.get("/health/db-pool", tags=["Health"])
+def db_pool_stats():
+    return {**pool.stats(), "executor": db_executor.stats()}
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def prometheus_metrics():
+    pool_stats = pool.stats()
+    gauges = {
+        "worknest_db_pool_in_use": pool_stats["in_use"],
+        "worknest_db_pool_idle": pool_stats["idle"],
+        "worknest_db_executor_pending": db_executor.stats()["pending"],
+        "worknest_event_subscribers": bus.stats()["subscribers"],
+    }
+    counters = {
+        "worknest_db_pool_waits_total": pool_stats["waits"],
+        "worknest_db_pool_timeouts_total": pool_stats["timeouts"],
+    }
+    return PlainTextResponse(metrics.render(gauges, counters), media_type="text/plain; version=0.0.4")
 
-# Static file upload support
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
-
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    file_location = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    return {"filename": file.filename, "url": f"/uploads/{file.filename}"}
+# Static file upload support (uploads are handled in routes/upload_route.py)
+app.mount("/uploads", CachedStaticFiles(directory=UPLOAD_DIR), name="uploads")
+# Employee photos saved before the blob store; ImgPath holds "uploaded_images/<uuid>.<ext>",
+# and a UUID name is never reused, so these are as immutable as blobs
+app.mount("/uploaded_images", CachedStaticFiles(directory=LEGACY_IMAGE_DIR, cache_control=IMMUTABLE),
+          name="uploaded_images")
@@ -0,0 +1,345 @@
+import bisect
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their template and the request that ran them
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+# Distinct statement templates tracked; anything beyond is folded into "other"
+MAX_STATEMENTS = int(os.getenv("METRICS_MAX_STATEMENTS", "500"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# ---------------------------
+# HISTOGRAMS
+# ---------------------------
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense; callers hold the registry lock."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str, lines: list):
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+
+
+# ---------------------------
+# STATEMENT TEMPLATES
+# ---------------------------
+# Route SQL is built with f-strings, so the same statement shows up with different IN-list
+# lengths, VALUES batches and TOP/OFFSET numbers. Folding those gives one series per shape.
+_WS = re.compile(r"\s+")
+_STRING = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w@#.])\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+_VALUES_ROWS = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_templates: Dict[str, str] = {}
+
+
+def statement_template(sql: str) -> str:
+    template = _templates.get(sql)
+    if template is None:
+        template = _WS.sub(" ", sql).strip()
+        template = _STRING.sub("?", template)
+        template = _NUMBER.sub("?", template)
+        template = _PLACEHOLDER_LIST.sub("%s, ...", template)
+        template = _VALUES_ROWS.sub(r"\1, ...", template)
+        if len(_templates) < 4 * MAX_STATEMENTS:
+            _templates[sql] = template
+    return template
+
+
+# ---------------------------
+# PER-REQUEST STATS
+# ---------------------------
+class RequestStats:
+    """Database work of one request. The object is shared (not copied) by every context the
+    request fans out to, so the DB executor and threadpool add to the same counters."""
+
+    __slots__ = ("method", "path", "queries", "db_time", "rows", "threads")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.threads: Optional[Set[int]] = None  # set by the profiler to follow the request across threads
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+# ---------------------------
+# REGISTRY
+# ---------------------------
+class _Statement:
+    __slots__ = ("latency", "rows", "errors")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.rows = 0
+        self.errors = 0
+
+
+class _Route:
+    __slots__ = ("latency", "queries", "db_time", "rows")
+
+    def __init__(self):
+        self.latency: Dict[int, Histogram] = {}  # status -> request duration
+        self.queries = Histogram(QUERY_BUCKETS)  # queries per request
+        self.db_time = 0.0
+        self.rows = 0
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], _Route] = {}
+        self._statements: Dict[str, _Statement] = {}
+        self.slow_queries = 0
+
+    def _statement(self, template: str) -> _Statement:
+        statement = self._statements.get(template)
+        if statement is None:
+            if len(self._statements) >= MAX_STATEMENTS:
+                template = "other"
+            statement = self._statements.setdefault(template, _Statement())
+        return statement
+
+    def record_query(self, sql: str, elapsed: float, failed: bool = False):
+        template = statement_template(sql)
+        with self._lock:
+            statement = self._statement(template)
+            statement.latency.observe(elapsed)
+            if failed:
+                statement.errors += 1
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            with self._lock:
+                self.slow_queries += 1
+            where = f"{stats.method} {stats.path}" if stats is not None else "outside a request"
+            logger.warning("Slow query (%.0f ms, %s): %s", elapsed * 1000, where, template)
+
+    def record_fetch(self, sql: str, elapsed: float, rows: int):
+        # Fetches read the rest of the result stream, so they count as database time
+        template = statement_template(sql)
+        with self._lock:
+            self._statement(template).rows += rows
+        stats = _current.get()
+        if stats is not None:
+            stats.db_time += elapsed
+            stats.rows += rows
+
+    def record_request(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        with self._lock:
+            entry = self._routes.get((method, route))
+            if entry is None:
+                entry = self._routes[(method, route)] = _Route()
+            histogram = entry.latency.get(status)
+            if histogram is None:
+                histogram = entry.latency[status] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(elapsed)
+            entry.queries.observe(stats.queries)
+            entry.db_time += stats.db_time
+            entry.rows += stats.rows
+
+    def render(self, gauges: Dict[str, float], counters: Dict[str, float]) -> str:
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.append("# TYPE worknest_request_duration_seconds histogram")
+            for (method, route), entry in self._routes.items():
+                for status, histogram in entry.latency.items():
+                    histogram.render("worknest_request_duration_seconds",
+                                     f'method="{method}",route="{_escape(route)}",status="{status}"', lines)
+            lines.append("# TYPE worknest_request_db_queries histogram")
+            for (method, route), entry in self._routes.items():
+                entry.queries.render("worknest_request_db_queries", f'method="{method}",route="{_escape(route)}"', lines)
+            lines.append("# TYPE worknest_request_db_seconds_total counter")
+            for (method, route), entry in self._routes.items():
+                lines.append(f'worknest_request_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {entry.db_time}')
+            lines.append("# TYPE worknest_request_db_rows_total counter")
+            for (method, route), entry in self._routes.items():
+                lines.append(f'worknest_request_db_rows_total{{method="{method}",route="{_escape(route)}"}} {entry.rows}')
+
+            lines.append("# TYPE worknest_statement_duration_seconds histogram")
+            for template, statement in self._statements.items():
+                statement.latency.render("worknest_statement_duration_seconds", f'statement="{_escape(template)}"', lines)
+            lines.append("# TYPE worknest_statement_rows_total counter")
+            for template, statement in self._statements.items():
+                lines.append(f'worknest_statement_rows_total{{statement="{_escape(template)}"}} {statement.rows}')
+            lines.append("# TYPE worknest_statement_errors_total counter")
+            for template, statement in self._statements.items():
+                lines.append(f'worknest_statement_errors_total{{statement="{_escape(template)}"}} {statement.errors}')
+            lines.append("# TYPE worknest_slow_queries_total counter")
+            lines.append(f"worknest_slow_queries_total {self.slow_queries}")
+
+        for kind, values in (("gauge", gauges), ("counter", counters)):
+            for name, value in values.items():
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+
+# ---------------------------
+# INSTRUMENTED CONNECTION
+# ---------------------------
+class InstrumentedCursor:
+    """pymssql cursor that times execute() and fetch*() into `metrics` and the current request."""
+
+    __slots__ = ("_cursor", "_sql")
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._sql = ""
+
+    def execute(self, operation, params=None):
+        self._sql = operation
+        started = time.perf_counter()
+        try:
+            result = self._cursor.execute(operation, params) if params is not None else self._cursor.execute(operation)
+        except Exception:
+            metrics.record_query(operation, time.perf_counter() - started, failed=True)
+            raise
+        metrics.record_query(operation, time.perf_counter() - started)
+        return result
+
+    def executemany(self, operation, params):
+        self._sql = operation
+        started = time.perf_counter()
+        try:
+            result = self._cursor.executemany(operation, params)
+        except Exception:
+            metrics.record_query(operation, time.perf_counter() - started, failed=True)
+            raise
+        metrics.record_query(operation, time.perf_counter() - started)
+        return result
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        metrics.record_fetch(self._sql, time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        metrics.record_fetch(self._sql, time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        metrics.record_fetch(self._sql, time.perf_counter() - started, len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Hands out InstrumentedCursors; everything else goes straight to the pymssql connection."""
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        stats = _current.get()
+        if stats is not None and stats.threads is not None:
+            stats.threads.add(threading.get_ident())
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# ---------------------------
+# MIDDLEWARE
+# ---------------------------
+class MetricsMiddleware:
+    """Pure ASGI (BaseHTTPMiddleware would buffer streaming responses and cut the contextvar
+    off from the endpoint): times each request from arrival to the last body chunk and files it
+    under the matched route's path template, so /tasks/1 and /tasks/2 share one series."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["method"], scope["path"])
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                label = route.path
+            elif "endpoint" in scope:
+                label = scope["root_path"] + "/{path}"  # a mounted app such as /uploads
+            else:
+                label = "unmatched"  # one label for every 404, so scanners cannot add series
+            metrics.record_request(scope["method"], label, status, time.perf_counter() - started, stats)
@@ -0,0 +1,44 @@
+-- Composite indexes backing the company-scoped list and paginated endpoints.
+-- Each leads with CompanyId so a tenant's rows are a single range seek, then IsActive
+-- (every listing filters on it), then the column the listing orders or seeks by.
+-- Safe to re-run: every index is created only if it does not exist yet.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Task_Company_Active_Deadline' AND object_id = OBJECT_ID('dbo.Task'))
+    CREATE NONCLUSTERED INDEX IX_Task_Company_Active_Deadline
+        ON dbo.Task (CompanyId, IsActive, Deadline, TaskId);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LogTime_Company_Active_LogId' AND object_id = OBJECT_ID('dbo.LogTime'))
+    CREATE NONCLUSTERED INDEX IX_LogTime_Company_Active_LogId
+        ON dbo.LogTime (CompanyId, IsActive, LogId);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Projects_Company_Active_ProjectId' AND object_id = OBJECT_ID('dbo.Projects'))
+    CREATE NONCLUSTERED INDEX IX_Projects_Company_Active_ProjectId
+        ON dbo.Projects (CompanyId, IsActive, ProjectId);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Employee_Company_Active_EmpId' AND object_id = OBJECT_ID('dbo.Employee'))
+    CREATE NONCLUSTERED INDEX IX_Employee_Company_Active_EmpId
+        ON dbo.Employee (CompanyId, IsActive, EmpId);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Users_Company_Active_UserId' AND object_id = OBJECT_ID('dbo.Users'))
+    CREATE NONCLUSTERED INDEX IX_Users_Company_Active_UserId
+        ON dbo.Users (CompanyId, IsActive, UserId);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Role_Company_Active_RoleId' AND object_id = OBJECT_ID('dbo.Role'))
+    CREATE NONCLUSTERED INDEX IX_Role_Company_Active_RoleId
+        ON dbo.Role (CompanyId, IsActive, RoleId);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ProjectRole_Company_Active_ProjectRoleId' AND object_id = OBJECT_ID('dbo.ProjectRole'))
+    CREATE NONCLUSTERED INDEX IX_ProjectRole_Company_Active_ProjectRoleId
+        ON dbo.ProjectRole (CompanyId, IsActive, ProjectRoleId);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ProjectEmployee_Company_Active_ProjectEmployeeId' AND object_id = OBJECT_ID('dbo.ProjectEmployee'))
+    CREATE NONCLUSTERED INDEX IX_ProjectEmployee_Company_Active_ProjectEmployeeId
+        ON dbo.ProjectEmployee (CompanyId, IsActive, ProjectEmployeeId);
+GO
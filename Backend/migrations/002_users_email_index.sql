@@ -0,0 +1,11 @@
+-- Login looks users up by Email alone and verifies the password hash in the app,
+-- so Email gets its own index covering everything login reads.
+-- Hashes are stored as "scrypt$N$r$p$salt$hash" (86 characters with the default cost),
+-- so Users.Password must be at least that wide.
+-- Safe to re-run.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Users_Email' AND object_id = OBJECT_ID('dbo.Users'))
+    CREATE NONCLUSTERED INDEX IX_Users_Email
+        ON dbo.Users (Email)
+        INCLUDE (RoleId, IsActive, CompanyId, Password);
+GO
@@ -0,0 +1,74 @@
+-- Version stamps for conditional GETs (table_versions.py).
+-- A rowversion column changes on every insert and update (the API only soft-deletes), so
+-- MAX(RowVer) over a table, or over one company's rows, moves whenever that data does.
+-- The indexes make each MAX a single seek to the end of the index.
+-- Triggers are deliberately avoided: they would break the OUTPUT INSERTED clauses the API uses.
+-- Safe to re-run.
+
+IF COL_LENGTH('dbo.Task', 'RowVer') IS NULL
+    ALTER TABLE dbo.Task ADD RowVer ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Task_RowVer' AND object_id = OBJECT_ID('dbo.Task'))
+    CREATE NONCLUSTERED INDEX IX_Task_RowVer ON dbo.Task (RowVer);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Task_Company_RowVer' AND object_id = OBJECT_ID('dbo.Task'))
+    CREATE NONCLUSTERED INDEX IX_Task_Company_RowVer ON dbo.Task (CompanyId, RowVer);
+GO
+
+IF COL_LENGTH('dbo.Projects', 'RowVer') IS NULL
+    ALTER TABLE dbo.Projects ADD RowVer ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Projects_RowVer' AND object_id = OBJECT_ID('dbo.Projects'))
+    CREATE NONCLUSTERED INDEX IX_Projects_RowVer ON dbo.Projects (RowVer);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Projects_Company_RowVer' AND object_id = OBJECT_ID('dbo.Projects'))
+    CREATE NONCLUSTERED INDEX IX_Projects_Company_RowVer ON dbo.Projects (CompanyId, RowVer);
+GO
+
+IF COL_LENGTH('dbo.LogTime', 'RowVer') IS NULL
+    ALTER TABLE dbo.LogTime ADD RowVer ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LogTime_RowVer' AND object_id = OBJECT_ID('dbo.LogTime'))
+    CREATE NONCLUSTERED INDEX IX_LogTime_RowVer ON dbo.LogTime (RowVer);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LogTime_Company_RowVer' AND object_id = OBJECT_ID('dbo.LogTime'))
+    CREATE NONCLUSTERED INDEX IX_LogTime_Company_RowVer ON dbo.LogTime (CompanyId, RowVer);
+GO
+
+IF COL_LENGTH('dbo.Employee', 'RowVer') IS NULL
+    ALTER TABLE dbo.Employee ADD RowVer ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Employee_RowVer' AND object_id = OBJECT_ID('dbo.Employee'))
+    CREATE NONCLUSTERED INDEX IX_Employee_RowVer ON dbo.Employee (RowVer);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Employee_Company_RowVer' AND object_id = OBJECT_ID('dbo.Employee'))
+    CREATE NONCLUSTERED INDEX IX_Employee_Company_RowVer ON dbo.Employee (CompanyId, RowVer);
+GO
+
+IF COL_LENGTH('dbo.ProjectEmployee', 'RowVer') IS NULL
+    ALTER TABLE dbo.ProjectEmployee ADD RowVer ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ProjectEmployee_RowVer' AND object_id = OBJECT_ID('dbo.ProjectEmployee'))
+    CREATE NONCLUSTERED INDEX IX_ProjectEmployee_RowVer ON dbo.ProjectEmployee (RowVer);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ProjectEmployee_Company_RowVer' AND object_id = OBJECT_ID('dbo.ProjectEmployee'))
+    CREATE NONCLUSTERED INDEX IX_ProjectEmployee_Company_RowVer ON dbo.ProjectEmployee (CompanyId, RowVer);
+GO
+
+IF COL_LENGTH('dbo.Company', 'RowVer') IS NULL
+    ALTER TABLE dbo.Company ADD RowVer ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Company_RowVer' AND object_id = OBJECT_ID('dbo.Company'))
+    CREATE NONCLUSTERED INDEX IX_Company_RowVer ON dbo.Company (RowVer);
+GO
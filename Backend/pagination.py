@@ -0,0 +1,167 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+
+# ---------------------------
+# KEYSET (SEEK) CURSORS
+# ---------------------------
+# A cursor is an opaque token holding the sort key of the last row of a page,
+# tagged with the listing it belongs to so it cannot be replayed elsewhere.
+
+class PageOptions(BaseModel):
+    """Keyset and total-count options shared by every *PaginationRequest model."""
+    cursor: Optional[str] = None  # next_cursor from the previous page; switches to keyset paging
+    include_total: bool = True    # false skips counting entirely (infinite scroll)
+    estimate_total: bool = False  # reuse a recently cached total for the same filters
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+    return value
+
+
+def encode_cursor(kind: str, values: List[Any]) -> str:
+    payload = json.dumps({"k": kind, "v": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str, size: int) -> List[Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["k"] != kind or len(payload["v"]) != size:
+            raise ValueError("cursor does not belong to this listing")
+        return [_decode_value(v) for v in payload["v"]]
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+
+def next_cursor(kind: str, last_key: Optional[List[Any]], row_count: int, page_limit: int) -> Optional[str]:
+    # A short page means there is nothing left to seek to
+    if last_key is None or row_count < page_limit:
+        return None
+    return encode_cursor(kind, last_key)
+
+
+# ---------------------------
+# PAGE + TOTAL IN ONE ROUND TRIP
+# ---------------------------
+class TotalCountCache:
+    """Short-lived totals per filter signature, used when a client asks for an estimated total."""
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            total, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return total
+
+    def set(self, key, total: int):
+        with self._lock:
+            self._entries[key] = (total, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+total_counts = TotalCountCache()
+
+Page = namedtuple("Page", ["rows", "total", "columns"])
+
+
+def _first_value(row):
+    return row["TotalCount"] if isinstance(row, dict) else row[0]
+
+
+def fetch_page(cursor, kind: str, select_list: str, from_clause: str, params: Sequence[Any],
+               order_by: str, offset: int, limit: int, seek_clause: str = "", seek_params: Sequence[Any] = (),
+               include_total: bool = True, estimate_total: bool = False) -> Page:
+    """Fetch one page and (optionally) the total row count without a second round trip.
+
+    `from_clause` is everything from FROM through the WHERE filters. Totals are exact by default,
+    served from `total_counts` when `estimate_total` is set, and skipped when `include_total` is off.
+    In keyset mode the caller turns the decoded cursor into `seek_clause`/`seek_params`, which seek
+    past the previous page's last sort key instead of skipping `offset` rows (pass offset 0).
+    """
+    signature = (kind, from_clause, tuple(params))
+    total = total_counts.get(signature) if include_total and estimate_total else None
+    want_count = include_total and total is None
+
+    page_sql = f" {from_clause}{seek_clause} ORDER BY {order_by} OFFSET %s ROWS FETCH NEXT %s ROWS ONLY"
+    page_params = tuple(params) + tuple(seek_params) + (offset, limit)
+
+    if want_count and not seek_clause:
+        # The window count rides along on every row of the page
+        cursor.execute(f"SELECT {select_list}, COUNT(*) OVER() AS TotalCount{page_sql}", page_params)
+        rows = cursor.fetchall()
+        columns = [col[0] for col in cursor.description][:-1]
+        if rows and isinstance(rows[0], dict):
+            total = rows[0]["TotalCount"]
+            for row in rows:
+                del row["TotalCount"]
+        elif rows:
+            total = rows[0][-1]
+            rows = [row[:-1] for row in rows]
+        elif offset == 0:
+            total = 0
+        else:
+            # Past the last page there is no row to carry the count
+            cursor.execute(f"SELECT COUNT(*) AS TotalCount {from_clause}", tuple(params))
+            total = _first_value(cursor.fetchone())
+    elif want_count:
+        # After a seek the window count would only cover rows past the cursor,
+        # so batch the COUNT and the page into one round trip instead
+        cursor.execute(f"SELECT COUNT(*) AS TotalCount {from_clause}; SELECT {select_list}{page_sql}",
+                       tuple(params) + page_params)
+        total = _first_value(cursor.fetchone())
+        cursor.nextset()
+        rows = cursor.fetchall()
+        columns = [col[0] for col in cursor.description]
+    else:
+        cursor.execute(f"SELECT {select_list}{page_sql}", page_params)
+        rows = cursor.fetchall()
+        columns = [col[0] for col in cursor.description]
+
+    if want_count and estimate_total:
+        total_counts.set(signature, total)
+    return Page(rows, total, columns)
+
+
+def total_pages(total: Optional[int], limit: int) -> Optional[int]:
+    return None if total is None else (total + limit - 1) // limit
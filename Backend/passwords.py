@@ -0,0 +1,118 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+
+# scrypt cost: ~16 MiB and a few tens of ms per hash; raising N makes needs_rehash() upgrade on next login
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+_PREFIX = "scrypt"
+
+
+# ---------------------------
+# HASH FORMAT
+# ---------------------------
+# Stored as "scrypt$N$r$p$<salt b64>$<hash b64>". Anything else in Users.Password is a
+# legacy plaintext row, accepted once and rehashed on the next successful login.
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode()
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+
+def hash_password(password: str) -> str:
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def _parse(stored: str) -> Optional[tuple]:
+    parts = stored.split("$") if stored else []
+    if len(parts) != 6 or parts[0] != _PREFIX:
+        return None
+    try:
+        return int(parts[1]), int(parts[2]), int(parts[3]), base64.b64decode(parts[4]), base64.b64decode(parts[5])
+    except ValueError:
+        return None
+
+
+def verify_password(password: str, stored: Optional[str]) -> bool:
+    if not stored:
+        return False
+    parsed = _parse(stored)
+    if parsed is None:
+        # Legacy plaintext row
+        return hmac.compare_digest(password.encode(), stored.encode())
+    n, r, p, salt, expected = parsed
+    return hmac.compare_digest(_scrypt(password, salt, n, r, p), expected)
+
+
+def needs_rehash(stored: Optional[str]) -> bool:
+    parsed = _parse(stored)
+    return parsed is None or parsed[:3] != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+# ---------------------------
+# PROCESS POOL
+# ---------------------------
+class HashingPool:
+    """Runs password hashing in worker processes, one per core, off the event loop and the GIL.
+
+    Like DBExecutor, once `max_pending` hashes are queued new logins get a 503 instead of
+    stretching everyone's latency during a login storm.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0   # only touched from the event loop thread
+        self._lock = threading.Lock()   # run_sync() callers race from threadpool handlers
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs DB and executor threads is not safe
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    async def run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            raise HTTPException(status_code=503, detail="Too many sign-ins in progress, please retry.",
+                                headers={"Retry-After": "1"})
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    def run_sync(self, fn, *args):
+        # For sync (threadpool) handlers such as user create/update
+        return self._get_executor().submit(fn, *args).result()
+
+    def stats(self) -> dict:
+        return {"max_workers": self.max_workers, "max_pending": self.max_pending, "pending": self._pending}
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+hashing = HashingPool(
+    max_workers=int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1))),
+    max_pending=int(os.getenv("HASH_MAX_PENDING", "500")),
+)
@@ -0,0 +1,291 @@
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from jwt_handler import TokenError, decode_access_token
+from metrics import RequestStats, current_stats
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Fraction of requests profiled without being asked, e.g. 0.01; 0 turns sampling off
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Comma-separated path prefixes the sample rate applies to; empty means every path
+PROFILE_PATHS = tuple(p for p in os.getenv("PROFILE_PATHS", "").split(",") if p)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+# Oldest profiles are deleted beyond this many
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+
+PROFILE_HEADER = b"x-profile"
+_PROFILE_QUERY = re.compile(rb"(?:^|&)profile=(?:1|true)(?:&|$)")
+_ADMIN_ROLES = (1,)
+
+
+# ---------------------------
+# SAMPLER
+# ---------------------------
+# A background thread reads sys._current_frames() every PROFILE_INTERVAL for the threads the
+# request ran on: the event loop thread, plus any threadpool or DB executor thread that opened
+# a cursor for it (RequestStats.threads). Threads parked waiting for work are skipped; other
+# requests running on the same threads at the same moment do show up, so profile under
+# representative, not peak, load.
+
+_labels: Dict[object, Tuple[str, str, int]] = {}
+
+# (file name, function name) of leaf frames that mean "this thread is idle"
+_IDLE = {("selectors.py", "select"), ("runners.py", "run"), ("threading.py", "wait"), ("thread.py", "_worker"),
+         ("queue.py", "get")}
+
+# First match walking from the leaf decides where a sample's time went
+_CATEGORIES = (
+    ("db", ("metrics.py",), "InstrumentedCursor."),
+    ("serialization", ("fast_json.py", "exports.py", os.sep + "json" + os.sep, "encoders.py", "responses.py"), ""),
+    ("mapping", ("row_mapping.py", os.sep + "pydantic" + os.sep, "_compat.py"), ""),
+)
+
+
+def _label(code) -> Tuple[str, str, int]:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+    return label
+
+
+def _stack(frame) -> Tuple[Tuple[str, str, int], ...]:
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()  # root first, as flame graphs expect
+    return tuple(stack)
+
+
+def _category(stack) -> str:
+    for name, filename, _ in reversed(stack):
+        for category, files, prefix in _CATEGORIES:
+            if name.startswith(prefix) and any(f in filename for f in files):
+                return category
+    return "python"
+
+
+class Profile:
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.threads = {threading.get_ident()}
+        self.stacks: Counter = Counter()
+        self.started = time.perf_counter()
+        self.wall = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.wall = time.perf_counter() - self.started
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(PROFILE_INTERVAL):
+            frames = sys._current_frames()
+            for ident in tuple(self.threads):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    continue
+                self.stacks[_stack(frame)] += 1
+
+    # ---------------------------
+    # OUTPUT
+    # ---------------------------
+    def summary(self, stats: Optional[RequestStats]) -> dict:
+        samples = sum(self.stacks.values())
+        categories: Counter = Counter()
+        self_time: Counter = Counter()
+        total_time: Counter = Counter()
+        for stack, count in self.stacks.items():
+            categories[_category(stack)] += count
+            self_time[stack[-1]] += count
+            for frame in set(stack):
+                total_time[frame] += count
+
+        def top(counter: Counter) -> List[dict]:
+            return [{"function": name, "file": f"{filename}:{line}", "ms": round(count * PROFILE_INTERVAL * 1000, 1),
+                     "share": round(count / samples, 3)}
+                    for (name, filename, line), count in counter.most_common(15)]
+
+        db_time = stats.db_time if stats is not None else 0.0
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "wall_ms": round(self.wall * 1000, 1),
+            # Measured by the instrumented cursor, not sampled
+            "db_ms": round(db_time * 1000, 1),
+            "python_ms": round(max(self.wall - db_time, 0.0) * 1000, 1),
+            "queries": stats.queries if stats is not None else 0,
+            "rows": stats.rows if stats is not None else 0,
+            "samples": samples,
+            "interval_ms": PROFILE_INTERVAL * 1000,
+            "sampled_share": {category: round(count / samples, 3) for category, count in categories.most_common()}
+                             if samples else {},
+            "top_self": top(self_time) if samples else [],
+            "top_total": top(total_time) if samples else [],
+        }
+
+    def speedscope(self) -> dict:
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.stacks.items():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label[0], "file": label[1], "line": label[2]})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(count * PROFILE_INTERVAL * 1000)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.method} {self.path}",
+            "exporter": "worknest",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": f"{self.method} {self.path}", "unit": "milliseconds",
+                "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights,
+            }],
+        }
+
+    def collapsed(self) -> str:
+        """Folded stacks, one "root;...;leaf count" line each, for flamegraph.pl and friends."""
+        return "".join(f"{';'.join(label[0] for label in stack)} {count}\n" for stack, count in self.stacks.items())
+
+    def write(self, stats: Optional[RequestStats]) -> dict:
+        summary = self.summary(stats)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, self.id)
+        with open(f"{base}.speedscope.json", "w") as f:
+            json.dump(self.speedscope(), f)
+        with open(f"{base}.collapsed.txt", "w") as f:
+            f.write(self.collapsed())
+        with open(f"{base}.summary.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        _prune()
+        return summary
+
+
+PROFILE_FILES = {"summary": ".summary.json", "speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}
+
+
+def _prune():
+    summaries = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".summary.json"))
+    for name in summaries[:max(len(summaries) - PROFILE_KEEP, 0)]:
+        profile_id = name[:-len(".summary.json")]
+        for suffix in PROFILE_FILES.values():
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def profile_path(profile_id: str, kind: str) -> Optional[str]:
+    if kind not in PROFILE_FILES or not re.fullmatch(r"\d{8}-\d{6}-[0-9a-f]{8}", profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + PROFILE_FILES[kind])
+    return path if os.path.isfile(path) else None
+
+
+# ---------------------------
+# MIDDLEWARE
+# ---------------------------
+def _header(scope, name: bytes) -> bytes:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return b""
+
+
+def _requested_by_admin(scope) -> bool:
+    if _header(scope, PROFILE_HEADER) not in (b"1", b"true") and not _PROFILE_QUERY.search(scope.get("query_string", b"")):
+        return False
+    authorization = _header(scope, b"authorization").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        return decode_access_token(token).role in _ADMIN_ROLES
+    except TokenError:
+        return False
+
+
+class ProfilerMiddleware:
+    """Profiles a request when an admin asks for it (X-Profile: 1 header or ?profile=1) or when
+    PROFILE_SAMPLE_RATE picks it. Everyone else pays one header lookup. The response gets an
+    X-Profile-Id header and Server-Timing with the DB/app split; files land in PROFILE_DIR."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _reason(self, scope) -> Optional[str]:
+        if _requested_by_admin(scope):
+            return "requested"
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE \
+                and (not PROFILE_PATHS or scope["path"].startswith(PROFILE_PATHS)):
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        reason = self._reason(scope)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], reason)
+        stats = current_stats()
+        if stats is not None:
+            stats.threads = profile.threads
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                elapsed = (time.perf_counter() - profile.started) * 1000
+                db_ms = stats.db_time * 1000 if stats is not None else 0.0
+                queries = stats.queries if stats is not None else 0
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode()),
+                    (b"server-timing", f'db;dur={db_ms:.1f};desc="{queries} queries", '
+                                       f'app;dur={elapsed - db_ms:.1f}'.encode()),
+                ]
+            await send(message)
+
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            profile.stop()
+            try:
+                summary = await run_in_threadpool(profile.write, stats)
+                logger.info("Profiled %s %s: %.0f ms wall, %.0f ms db (%d queries), %s",
+                            profile.method, profile.path, summary["wall_ms"], summary["db_ms"],
+                            summary["queries"], summary["sampled_share"])
+            except OSError as e:
+                logger.warning("Could not write profile %s: %s", profile.id, e)
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException
+
+# entity -> (table, id column, extra predicate)
+ENTITIES = {
+    "employee": ("Employee", "EmpId", ""),
+    "active_employee": ("Employee", "EmpId", " AND IsActive = 1"),
+    "project": ("Projects", "ProjectId", ""),
+    "active_project": ("Projects", "ProjectId", " AND IsActive = 1"),
+    "company": ("Company", "CompanyId", ""),
+    "task": ("Task", "TaskId", ""),
+    "active_task": ("Task", "TaskId", " AND IsActive = 1"),
+    "active_logtime": ("LogTime", "LogId", " AND IsActive = 1"),
+    "project_role": ("ProjectRole", "ProjectRoleId", ""),
+    "user": ("Users", "UserId", ""),
+    "active_user": ("Users", "UserId", " AND IsActive = 1"),
+    "role": ("Role", "RoleId", ""),
+    "active_role": ("Role", "RoleId", " AND IsActive = 1"),
+}
+
+# SQL Server caps a statement at 2100 parameters
+_CHUNK = 1000
+
+
+class ExistenceCache:
+    """Process-local memory of ids known to exist, so write paths skip repeated `SELECT 1` probes.
+
+    Only hits are cached (a freshly inserted row is never reported missing). Entries expire after
+    `ttl` seconds and the update/delete endpoints invalidate what they touch.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (entity, id) -> expires_at
+        self._lock = threading.Lock()
+
+    def known(self, entity: str, id_) -> bool:
+        key = (entity, id_)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def add(self, entity: str, ids: Iterable):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for id_ in ids:
+                self._entries[(entity, id_)] = expires_at
+                self._entries.move_to_end((entity, id_))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table: str, id_=None):
+        # Drops every entity backed by `table` (e.g. both "user" and "active_user")
+        entities = {name for name, spec in ENTITIES.items() if spec[0] == table}
+        with self._lock:
+            if id_ is None:
+                for key in [k for k in self._entries if k[0] in entities]:
+                    del self._entries[key]
+            else:
+                for entity in entities:
+                    self._entries.pop((entity, id_), None)
+
+
+reference_cache = ExistenceCache(ttl=float(os.getenv("REFERENCE_CACHE_TTL", "60")))
+
+
+def _row_pair(row) -> Tuple[str, int]:
+    if isinstance(row, dict):
+        return row["Entity"], row["Id"]
+    return row[0], row[1]
+
+
+def existing_references(cursor, refs: Iterable[Tuple[str, int]]) -> Set[Tuple[str, int]]:
+    """Return which (entity, id) pairs exist, asking the database once for all cache misses."""
+    found = set()
+    misses = {}
+    for entity, id_ in refs:
+        if id_ is None:
+            continue
+        if reference_cache.known(entity, id_):
+            found.add((entity, id_))
+        else:
+            misses.setdefault(entity, set()).add(id_)
+
+    pending = [(entity, sorted(ids)) for entity, ids in misses.items()]
+    while pending:
+        # Pack up to _CHUNK ids per round trip across all entities
+        selects, params, budget = [], [], _CHUNK
+        while pending and budget:
+            entity, ids = pending.pop()
+            batch, rest = ids[:budget], ids[budget:]
+            if rest:
+                pending.append((entity, rest))
+            table, column, predicate = ENTITIES[entity]
+            placeholders = ", ".join(["%s"] * len(batch))
+            selects.append(f"SELECT '{entity}' AS Entity, {column} AS Id FROM {table} "
+                           f"WHERE {column} IN ({placeholders}){predicate}")
+            params.extend(batch)
+            budget -= len(batch)
+        cursor.execute(" UNION ALL ".join(selects), tuple(params))
+        hits = [_row_pair(row) for row in cursor.fetchall()]
+        for entity, id_ in hits:
+            reference_cache.add(entity, [id_])
+        found.update(hits)
+    return found
+
+
+def existing_ids(cursor, entity: str, ids: Iterable[int]) -> Set[int]:
+    return {id_ for _, id_ in existing_references(cursor, [(entity, id_) for id_ in ids])}
+
+
+def first_missing(found: Set[Tuple[str, int]], checks: Sequence[Tuple[str, Optional[int], int, str]]):
+    """The first (status_code, detail) whose reference is not in `found`, or None."""
+    for entity, id_, status_code, detail in checks:
+        if id_ is not None and (entity, id_) not in found:
+            return status_code, detail
+    return None
+
+
+def require_references(cursor, checks: Sequence[Tuple[str, Optional[int], int, str]]):
+    """Validate every (entity, id, status_code, detail) in one round trip.
+
+    Raises HTTPException for the first missing reference, in the order given; None ids are skipped.
+    """
+    found = existing_references(cursor, [(entity, id_) for entity, id_, _, _ in checks])
+    missing = first_missing(found, checks)
+    if missing:
+        raise HTTPException(status_code=missing[0], detail=missing[1])
@@ -1,9 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 from datetime import datetime
 import pymssql
 
 from db_connection import get_connection  # Make sure this uses pymssql.connect()
+from reference_cache import require_references
+from db_async import run_db
+from exports import ExportFormat, stream_export
+from delta import DELTA_DEFAULT_LIMIT, DELTA_MAX_LIMIT, SINCE_HELP, fetch_changes
+from fast_json import FastJSONResponse
+from row_mapping import PROJECT_EMPLOYEE_COLUMNS
 from tables.EmployeeProject import ProjectEmployeeCreate, ProjectEmployeeUpdate, ProjectEmployeeOut
 
 router = APIRouter()
@@ -11,25 +17,18 @@ router = APIRouter()
 # -------------------------
 # VALIDATION HELPERS
 # -------------------------
-def validate_project_role(cursor, project_role_id: int):
-    cursor.execute("SELECT 1 FROM ProjectRole WHERE ProjectRoleId = %s", (project_role_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail=f"ProjectRoleId {project_role_id} not found or inactive")
-
-def validate_emp(cursor, emp_id: int, role: str = "Employee"):
-    cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s", (emp_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail=f"{role} with EmpId {emp_id} not found")
-
-def validate_project(cursor, project_id: int):
-    cursor.execute("SELECT 1 FROM Projects WHERE ProjectId = %s", (project_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail=f"ProjectId {project_id} not found")
-
-def validate_company(cursor, company_id: int):
-    cursor.execute("SELECT 1 FROM Company WHERE CompanyId = %s", (company_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail=f"CompanyId {company_id} not found")
+# Reference checks - resolved together (and cached) by require_references()
+def project_role_check(project_role_id: Optional[int]):
+    return ("project_role", project_role_id, 404, f"ProjectRoleId {project_role_id} not found or inactive")
+
+def emp_check(emp_id: int, role: str = "Employee"):
+    return ("employee", emp_id, 404, f"{role} with EmpId {emp_id} not found")
+
+def project_check(project_id: Optional[int]):
+    return ("project", project_id, 404, f"ProjectId {project_id} not found")
+
+def company_check(company_id: Optional[int]):
+    return ("company", company_id, 404, f"CompanyId {company_id} not found")
 
 # -------------------------
 # CREATE
@@ -39,11 +38,13 @@ def create_project_employee(data: ProjectEmployeeCreate, db: pymssql.Connection
     try:
         cursor = db.cursor()
 
-        validate_emp(cursor, data.EmpId)
-        validate_emp(cursor, data.CreatedBy, "CreatedBy")
-        validate_project(cursor, data.ProjectId)
-        validate_company(cursor, data.CompanyId)
-        validate_project_role(cursor, data.ProjectRoleId)
+        require_references(cursor, [
+            emp_check(data.EmpId),
+            emp_check(data.CreatedBy, "CreatedBy"),
+            project_check(data.ProjectId),
+            company_check(data.CompanyId),
+            project_role_check(data.ProjectRoleId),
+        ])
 
         cursor.execute("""
             INSERT INTO ProjectEmployee (EmpId, ProjectId, CreatedBy, CompanyId, ProjectRoleId, CreatedOn, IsActive)
@@ -67,23 +68,26 @@ def update_project_employee(project_employee_id: int, data: ProjectEmployeeUpdat
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="Record not found")
 
-        validate_emp(cursor, data.UpdatedBy, "UpdatedBy")
+        # Optional references are skipped when None
+        require_references(cursor, [
+            emp_check(data.UpdatedBy, "UpdatedBy"),
+            project_check(data.ProjectId),
+            company_check(data.CompanyId),
+            project_role_check(data.ProjectRoleId),
+        ])
 
         fields = []
         params = []
 
         if data.ProjectId is not None:
-            validate_project(cursor, data.ProjectId)
             fields.append("ProjectId = %s")
             params.append(data.ProjectId)
 
         if data.CompanyId is not None:
-            validate_company(cursor, data.CompanyId)
             fields.append("CompanyId = %s")
             params.append(data.CompanyId)
 
         if data.ProjectRoleId is not None:
-            validate_project_role(cursor, data.ProjectRoleId)
             fields.append("ProjectRoleId = %s")
             params.append(data.ProjectRoleId)
 
@@ -116,7 +120,7 @@ def delete_project_employee(project_employee_id: int, deleted_by: int, db: pymss
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="Record not found")
 
-        validate_emp(cursor, deleted_by, "DeletedBy")
+        require_references(cursor, [emp_check(deleted_by, "DeletedBy")])
 
         cursor.execute("""
             UPDATE ProjectEmployee
@@ -132,27 +136,67 @@ def delete_project_employee(project_employee_id: int, deleted_by: int, db: pymss
 # -------------------------
 # LIST
 # -------------------------
-@router.get("/project-employees", response_model=List[ProjectEmployeeOut])
-def list_project_employees(status: str = Query("all", enum=["all", "active", "inactive"]), db: pymssql.Connection = Depends(get_connection)):
+def _project_employees_query(status: str, company_id: Optional[int] = None) -> Tuple[str, tuple]:
+    base_query = f"""
+        SELECT {PROJECT_EMPLOYEE_COLUMNS.select_list()}
+        FROM ProjectEmployee
+    """
+    filters = []
+    params = ()
+    if company_id is not None:
+        filters.append("CompanyId = %s")
+        params = (company_id,)
+    if status == "active":
+        filters.append("IsActive = 1")
+    elif status == "inactive":
+        filters.append("IsActive = 0")
+    if filters:
+        base_query += " WHERE " + " AND ".join(filters)
+    return base_query, params
+
+_project_employee_record = PROJECT_EMPLOYEE_COLUMNS.record_mapper()
+
+def _list_project_employees(db: pymssql.Connection, status: str, company_id: Optional[int] = None) -> List[Dict[str, Any]]:
     try:
         cursor = db.cursor()
-        base_query = """
-            SELECT ProjectEmployeeId, EmpId, ProjectId, CreatedOn, CreatedBy, IsActive,
-                   DeletedOn, DeletedBy, CompanyId, ProjectRoleId, UpdatedOn, UpdatedBy
-            FROM ProjectEmployee
-        """
-        if status == "active":
-            base_query += " WHERE IsActive = 1"
-        elif status == "inactive":
-            base_query += " WHERE IsActive = 0"
-
-        cursor.execute(base_query)
+        cursor.execute(*_project_employees_query(status, company_id))
         rows = cursor.fetchall()
-        columns = [col[0] for col in cursor.description]
-        return [ProjectEmployeeOut(**dict(zip(columns, row))) for row in rows]
+        return [_project_employee_record(row) for row in rows]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+@router.get("/project-employees", response_model=List[ProjectEmployeeOut])
+async def list_project_employees(status: str = Query("all", enum=["all", "active", "inactive"]),
+                                 format: ExportFormat = Query("json")):
+    if format != "json":
+        query, params = _project_employees_query(status)
+        return stream_export(query, params, _project_employee_record, format, "project-employees")
+    return FastJSONResponse(await run_db(_list_project_employees, status))
+
+@router.get("/companies/{company_id}/project-employees", response_model=List[ProjectEmployeeOut])
+async def list_company_project_employees(company_id: int,
+                                         status: str = Query("all", enum=["all", "active", "inactive"]),
+                                         format: ExportFormat = Query("json")):
+    if format != "json":
+        query, params = _project_employees_query(status, company_id)
+        return stream_export(query, params, _project_employee_record, format, "project-employees")
+    return FastJSONResponse(await run_db(_list_project_employees, status, company_id))
+
+# -------------------------
+# DELTA SYNC
+# -------------------------
+# Only assignments inserted, updated or deleted since the client's watermark
+@router.get("/project-employees/changes", response_model=Dict[str, Any])
+async def get_project_employee_changes(since_version: Optional[str] = Query(None, description=SINCE_HELP),
+                                       limit: int = Query(DELTA_DEFAULT_LIMIT, ge=1, le=DELTA_MAX_LIMIT)):
+    return FastJSONResponse(await run_db(fetch_changes, PROJECT_EMPLOYEE_COLUMNS, since_version, None, limit))
+
+@router.get("/companies/{company_id}/project-employees/changes", response_model=Dict[str, Any])
+async def get_company_project_employee_changes(company_id: int,
+                                               since_version: Optional[str] = Query(None, description=SINCE_HELP),
+                                               limit: int = Query(DELTA_DEFAULT_LIMIT, ge=1, le=DELTA_MAX_LIMIT)):
+    return FastJSONResponse(await run_db(fetch_changes, PROJECT_EMPLOYEE_COLUMNS, since_version, company_id, limit))
+
 # -------------------------
 # FILTER BY COMPANY & PROJECT
 # -------------------------
@@ -166,12 +210,10 @@ def get_project_employees_by_company_and_project(
     try:
         cursor = db.cursor()
 
-        validate_company(cursor, company_id)
-        validate_project(cursor, project_id)
+        require_references(cursor, [company_check(company_id), project_check(project_id)])
 
-        query = """
-            SELECT ProjectEmployeeId, EmpId, ProjectId, CreatedOn, CreatedBy, IsActive,
-                   DeletedOn, DeletedBy, CompanyId, ProjectRoleId, UpdatedOn, UpdatedBy
+        query = f"""
+            SELECT {PROJECT_EMPLOYEE_COLUMNS.select_list()}
             FROM ProjectEmployee
             WHERE CompanyId = %s AND ProjectId = %s
         """
@@ -185,8 +227,7 @@ def get_project_employees_by_company_and_project(
 
         cursor.execute(query, tuple(params))
         rows = cursor.fetchall()
-        columns = [col[0] for col in cursor.description]
 
-        return [ProjectEmployeeOut(**dict(zip(columns, row))) for row in rows]
+        return FastJSONResponse([_project_employee_record(row) for row in rows])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
 from datetime import datetime
 import pymssql # Changed from pyodbc
 
 from db_connection import get_connection
+from reference_cache import reference_cache, require_references
+from db_async import run_db
+from tenancy import company_scoped
+from row_mapping import PROJECT_ROLE_COLUMNS
+from fast_json import FastJSONResponse
 from tables.projectRole import ProjectRoleCreate, ProjectRoleUpdate, ProjectRoleOut
 
 router = APIRouter()
@@ -11,15 +16,12 @@ router = APIRouter()
 # ---------------------------
 # VALIDATION HELPERS
 # ---------------------------
-def validate_emp(cursor, emp_id: int, label: str = "Employee"):
-    cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s", (emp_id,)) # Changed ? to %s
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail=f"{label} with EmpId {emp_id} not found")
+# Reference checks - resolved together (and cached) by require_references()
+def emp_check(emp_id: int, label: str = "Employee"):
+    return ("employee", emp_id, 404, f"{label} with EmpId {emp_id} not found")
 
-def validate_company(cursor, company_id: int):
-    cursor.execute("SELECT 1 FROM Company WHERE CompanyId = %s", (company_id,)) # Changed ? to %s
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail=f"CompanyId {company_id} not found")
+def company_check(company_id: Optional[int]):
+    return ("company", company_id, 404, f"CompanyId {company_id} not found")
 
 # ---------------------------
 # CREATE
@@ -29,8 +31,7 @@ def create_project_role(data: ProjectRoleCreate, db: pymssql.Connection = Depend
     try:
         cursor = db.cursor()
 
-        validate_emp(cursor, data.CreatedBy, "CreatedBy")
-        validate_company(cursor, data.CompanyId)
+        require_references(cursor, [emp_check(data.CreatedBy, "CreatedBy"), company_check(data.CompanyId)])
 
         cursor.execute("""
             INSERT INTO ProjectRole (Role, CreatedBy, CompanyId, CreatedOn, IsActive)
@@ -58,9 +59,10 @@ def update_project_role(role_id: int, data: ProjectRoleUpdate, db: pymssql.Conne
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="ProjectRole not found or inactive")
 
-        validate_emp(cursor, data.UpdatedBy, "UpdatedBy")
-        if data.CompanyId:
-            validate_company(cursor, data.CompanyId)
+        require_references(cursor, [
+            emp_check(data.UpdatedBy, "UpdatedBy"),
+            company_check(data.CompanyId or None),
+        ])
 
         fields = []
         params = []
@@ -106,7 +108,7 @@ def delete_project_role(role_id: int, deleted_by: int, db: pymssql.Connection =
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="ProjectRole not found or already deleted")
 
-        validate_emp(cursor, deleted_by, "DeletedBy")
+        require_references(cursor, [emp_check(deleted_by, "DeletedBy")])
 
         cursor.execute("""
             UPDATE ProjectRole
@@ -115,6 +117,7 @@ def delete_project_role(role_id: int, deleted_by: int, db: pymssql.Connection =
         """, (deleted_by, role_id)) # Changed ? to %s and ensured tuple
 
         db.commit()
+        reference_cache.invalidate("ProjectRole", role_id)
         return {"message": "Project role deleted successfully."}
     except pymssql.Error as e: # Catch pymssql specific errors
         db.rollback()
@@ -126,20 +129,28 @@ def delete_project_role(role_id: int, deleted_by: int, db: pymssql.Connection =
 # ---------------------------
 # LIST
 # ---------------------------
-@router.get("/projectroles", response_model=List[ProjectRoleOut])
-def list_project_roles(db: pymssql.Connection = Depends(get_connection)): # Changed type hint
+_ALL_PROJECT_ROLES_QUERY = "SELECT " + PROJECT_ROLE_COLUMNS.select_list() + """
+    FROM ProjectRole
+    WHERE IsActive = 1{company_filter}
+"""
+
+_project_role_record = PROJECT_ROLE_COLUMNS.record_mapper()
+
+def _list_project_roles(db: pymssql.Connection, company_id: Optional[int]) -> List[Dict[str, Any]]:
     try:
         cursor = db.cursor()
-        cursor.execute("""
-            SELECT ProjectRoleId, Role, CreatedOn, CreatedBy, UpdatedOn, UpdatedBy,
-                   IsActive, DeletedOn, DeletedBy, CompanyId
-            FROM ProjectRole
-            WHERE IsActive = 1
-        """)
+        cursor.execute(*company_scoped(_ALL_PROJECT_ROLES_QUERY, "CompanyId", company_id))
         rows = cursor.fetchall()
-        columns = [col[0] for col in cursor.description]
-        return [ProjectRoleOut(**dict(zip(columns, row))) for row in rows]
+        return [_project_role_record(row) for row in rows]
     except pymssql.Error as e: # Catch pymssql specific errors
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@router.get("/projectroles", response_model=List[ProjectRoleOut])
+async def list_project_roles():
+    return FastJSONResponse(await run_db(_list_project_roles, None))
+
+@router.get("/companies/{company_id}/project-roles", response_model=List[ProjectRoleOut])
+async def list_company_project_roles(company_id: int):
+    return FastJSONResponse(await run_db(_list_project_roles, company_id))
\ No newline at end of file
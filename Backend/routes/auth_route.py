@@ -1,30 +1,104 @@
-from fastapi import APIRouter, HTTPException
-from db_connection import get_connection
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+import pymssql
+from db_async import run_db
 from jwt_handler import create_access_token
+from passwords import hash_password, hashing, needs_rehash, verify_password
+from sessions import RefreshError, end_session, revoke_user_sessions, rotate_session, start_session
+from tables.auth import Principal, RefreshRequest, get_current_user
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Verified against when the email is unknown, so both failure paths cost one hash
+_UNKNOWN_USER_HASH = hash_password("unknown-user")
+
+
+def _find_user(db: pymssql.Connection, email: str):
+    with db.cursor() as cursor:
+        # Seeks IX_Users_Email (migrations/002_users_email_index.sql)
+        cursor.execute(
+            "SELECT UserId, RoleId, IsActive, CompanyId, Password FROM TaskManager.dbo.Users WHERE Email = %s",
+            (email,)
+        )
+        return cursor.fetchone()
+
+
+def _store_rehash(db: pymssql.Connection, user_id: int, old_password: str, new_password: str):
+    with db.cursor() as cursor:
+        # Only replace what we verified, in case the password changed meanwhile
+        cursor.execute(
+            "UPDATE TaskManager.dbo.Users SET Password = %s WHERE UserId = %s AND Password = %s",
+            (new_password, user_id, old_password)
+        )
+    db.commit()
+
 
 @router.post("/login")
-def login_user(credentials: dict):
+async def login_user(credentials: dict):
     email = credentials.get("email")
     password = credentials.get("password")
+    if not isinstance(email, str) or not isinstance(password, str):
+        raise HTTPException(status_code=401, detail="Invalid credentials.")
+
+    user = await run_db(_find_user, email)
+    stored = user[4] if user else _UNKNOWN_USER_HASH
+    if not await hashing.run(verify_password, password, stored) or not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials.")
+    if user[2] != 1:
+        raise HTTPException(status_code=403, detail="User is inactive.")
+
+    if needs_rehash(stored):
+        # Legacy plaintext (or outdated cost) row: upgrade it now that we know the password
+        try:
+            new_hash = await hashing.run(hash_password, password)
+            await run_db(_store_rehash, user[0], stored, new_hash)
+        except Exception as e:
+            logger.warning("Could not rehash password for user %s: %s", user[0], e)
+
+    token = create_access_token({
+        "sub": email,
+        "user_id": user[0],
+        "role": user[1],
+        "company_id": user[3]
+    })
+    refresh_token = await run_in_threadpool(start_session, user[0], user[1], user[3], email)
+    return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+# ---------------------------
+# SESSIONS
+# ---------------------------
+@router.post("/token/refresh")
+def refresh_access_token(body: RefreshRequest):
+    """Trade a refresh token for a new access token and a new refresh token; never reads Users."""
+    try:
+        session, refresh_token = rotate_session(body.refresh_token)
+    except RefreshError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    token = create_access_token({
+        "sub": session.email,
+        "user_id": session.user_id,
+        "role": session.role,
+        "company_id": session.company_id
+    })
+    return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+@router.post("/logout")
+def logout(body: RefreshRequest):
+    try:
+        end_session(body.refresh_token)
+    except RefreshError:
+        pass  # Logging out with a bad token is still a logout
+    return {"message": "Logged out."}
+
 
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT UserId, RoleId, IsActive FROM TaskManager.dbo.Users WHERE Email = %s AND Password = %s",
-                (email, password)
-            )
-            user = cursor.fetchone()
-
-            if not user:
-                raise HTTPException(status_code=401, detail="Invalid credentials.")
-            if user[2] != 1:
-                raise HTTPException(status_code=403, detail="User is inactive.")
-
-            token = create_access_token({
-                "sub": email,
-                "user_id": user[0],
-                "role": user[1]
-            })
-            return {"access_token": token, "token_type": "bearer"}
+@router.delete("/users/{user_id}/sessions")
+def revoke_sessions(user_id: int, current_user: Principal = Depends(get_current_user)):
+    """Sign a user out everywhere. Access tokens already issued stay valid until they expire."""
+    if current_user.role not in [1] and current_user.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to revoke these sessions.")
+    return {"message": f"Revoked {revoke_user_sessions(user_id)} session(s) for user {user_id}."}
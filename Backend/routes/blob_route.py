@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from blob_store import blob_store
+from http_cache import IMMUTABLE, not_modified
+from tables.auth import Principal, get_current_user
+
+router = APIRouter()
+
+# Only raster images render inline; anything else (HTML, SVG, PDFs...) is downloaded, so
+# uploaded content can never run as a page on the app's origin
+_INLINE_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp", "image/bmp", "image/avif")
+
+
+@router.api_route("/blobs/{digest}", methods=["GET", "HEAD"])
+def get_blob(digest: str, request: Request):
+    """Content-addressed, so the digest is a strong ETag and the response never goes stale.
+
+    FileResponse serves Range/If-Range requests (resumable document downloads) and hands the
+    file to the server via the ASGI pathsend extension where the server supports it.
+    """
+    info = blob_store.info(digest)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    etag = f'"{digest}"'
+    cached = not_modified(request, etag, IMMUTABLE)
+    if cached is not None:
+        return cached
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE, "X-Content-Type-Options": "nosniff"}
+    if info.content_type not in _INLINE_TYPES:
+        headers["Content-Disposition"] = "attachment"
+    return FileResponse(blob_store.path(digest), media_type=info.content_type or "application/octet-stream",
+                        headers=headers)
+
+
+@router.post("/blobs/gc")
+async def collect_blobs(current_user: Principal = Depends(get_current_user)):
+    """Delete blobs no task, employee or company references any more (after the grace period)."""
+    if current_user.role not in [1]:
+        raise HTTPException(status_code=403, detail="Only administrators can run blob garbage collection.")
+    result = await run_in_threadpool(blob_store.gc)
+    return {**result, **blob_store.stats()}
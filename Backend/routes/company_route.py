@@ -1,16 +1,32 @@
-from typing import Any, Dict
-from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
 from tables.company import Company, CompanyCreate, CompanyUpdate, CompanyPaginationRequest
-from db_connection import get_connection
+from db_connection import pooled_connection
+from reference_cache import reference_cache
+from blob_store import blob_digest, blob_store
+from images import IMAGE_VARIANTS, check_variant, image_pool, receive_image, variant_urls
+from db_async import run_db
+from exports import ExportFormat, stream_export
+from pagination import decode_cursor, fetch_page, next_cursor, total_pages
+from row_mapping import COMPANY_FIELDS
+from fast_json import FastJSONResponse
 from datetime import datetime
 
 router = APIRouter()
 
+def _logo_owner(company_id: int) -> str:
+    return f"company:{company_id}:logo"
+
+def _attach_logo(company_id: int, digest: Optional[str]):
+    blob_store.set_ref(_logo_owner(company_id), digest)
+    image_pool.schedule_digest(digest)
+
 # ✅ Create a new company
 @router.post("/companies", response_model=Company)
 def create_company(comp: CompanyCreate):
     try:
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor(as_dict=True) as cursor:
                 cursor.execute("SELECT COUNT(*) AS count FROM Company WHERE Name = %s OR Email = %s", (comp.name, comp.email))
                 existing_company = cursor.fetchone()['count']
@@ -28,6 +44,7 @@ def create_company(comp: CompanyCreate):
                 )
                 inserted_row = cursor.fetchone()
                 conn.commit()
+        _attach_logo(inserted_row['CompanyId'], blob_digest(comp.company_logo_path, comp.company_logo_url))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -47,40 +64,39 @@ def create_company(comp: CompanyCreate):
     }
 
 # ✅ Get all companies
+_ALL_COMPANIES_QUERY = f"SELECT {COMPANY_FIELDS.select_list()} FROM Company"
+_company_record = COMPANY_FIELDS.record_mapper()
+
+def _with_logo_variant(companies: List[Dict[str, Any]], image: Optional[str]) -> List[Dict[str, Any]]:
+    # Swap stored logos for links to the sized WebP variant
+    if not image:
+        return companies
+    urls = variant_urls((c["company_logo_path"] or c["company_logo_url"] for c in companies), image)
+    for c in companies:
+        url = urls.get(c["company_logo_path"] or c["company_logo_url"])
+        if url:
+            c["company_logo_path"] = c["company_logo_url"] = url
+    return companies
+
 @router.get("/allcompanies", response_model=list[Company])
-def get_companies():
-    with get_connection() as conn:
-        with conn.cursor(as_dict=True) as cursor:
-            cursor.execute("SELECT * FROM Company")
+def get_companies(format: ExportFormat = Query("json"),
+                  image: Optional[str] = Query(None, enum=list(IMAGE_VARIANTS))):
+    check_variant(image)
+    if format != "json":
+        return stream_export(_ALL_COMPANIES_QUERY, (), _company_record, format, "companies")
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(_ALL_COMPANIES_QUERY)
             rows = cursor.fetchall()
 
-    return [
-        Company(
-            company_id=row['CompanyId'],
-            name=row['Name'],
-            is_active=bool(row['IsActive']),
-            company_description=row.get('CompanyDescription'),
-            company_logo_name=row.get('CompanyLogoName'),
-            company_logo_url=row.get('CompanyLogoUrl'),
-            company_logo_path=row.get('CompanyLogoPath'),
-            contact_no=row.get('ContactNo'),
-            email=row.get('Email'),
-            address=row.get('Address'),
-            created_on=row['CreatedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('CreatedOn') else None,
-            created_by=row.get('CreatedBy', 0),
-            updated_on=row['UpdatedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('UpdatedOn') else None,
-            updated_by=row.get('UpdatedBy'),
-            deleted_on=row['DeletedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('DeletedOn') else None,
-            deleted_by=row.get('DeletedBy')
-        )
-        for row in rows
-    ]
+    return FastJSONResponse(_with_logo_variant([_company_record(row) for row in rows], image))
 
 # ✅ Update company details
 @router.put("/companies/{company_id}")
 def update_company(company_id: int, comp: CompanyUpdate):
     try:
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("SELECT CompanyId, IsActive FROM Company WHERE CompanyId = %s", (company_id,))
                 existing_row = cursor.fetchone()
@@ -98,16 +114,43 @@ def update_company(company_id: int, comp: CompanyUpdate):
 
                 cursor.execute(update_query, tuple(params))
                 conn.commit()
+        changes = comp.dict(exclude_unset=True)
+        if "company_logo_path" in changes or "company_logo_url" in changes:
+            _attach_logo(company_id, blob_digest(changes.get("company_logo_path"), changes.get("company_logo_url")))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
     return {"message": f"Company {company_id} updated successfully!"}
 
+def _set_logo(db, company_id: int, url: str, name: Optional[str]) -> int:
+    with db.cursor() as cursor:
+        cursor.execute(
+            "UPDATE Company SET CompanyLogoPath = %s, CompanyLogoUrl = %s, CompanyLogoName = COALESCE(%s, CompanyLogoName), "
+            "UpdatedOn = GETDATE() WHERE CompanyId = %s AND IsActive = 1",
+            (url, url, name, company_id)
+        )
+        updated = cursor.rowcount
+    db.commit()
+    return updated
+
+# ✅ Upload a company logo (multipart or raw image/* body)
+@router.post("/companies/{company_id}/logo")
+async def upload_company_logo(company_id: int, request: Request, name: Optional[str] = None):
+    blob = await receive_image(request)
+    try:
+        updated = await run_db(_set_logo, company_id, blob.url, name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not updated:
+        raise HTTPException(status_code=404, detail=f"Company with ID {company_id} not found.")
+    await run_in_threadpool(blob_store.set_ref, _logo_owner(company_id), blob.digest)
+    return {"message": f"Company {company_id} logo updated successfully!", "company_logo_path": blob.url}
+
 # ✅ Soft delete a company
 @router.delete("/companies/{company_id}")
 def delete_company(company_id: int, deleted_by: int):
     try:
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("SELECT CompanyId FROM Company WHERE CompanyId = %s", (company_id,))
                 company_exists = cursor.fetchone()
@@ -120,6 +163,7 @@ def delete_company(company_id: int, deleted_by: int):
                     (deleted_by, company_id)
                 )
                 conn.commit()
+        reference_cache.invalidate("Company", company_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -127,53 +171,40 @@ def delete_company(company_id: int, deleted_by: int):
 
 @router.post("/companies/paginated", response_model=Dict[str, Any])
 def get_paginated_companies(pagination: CompanyPaginationRequest):
+    check_variant(pagination.image)
     try:
         page = pagination.page
         limit = pagination.limit
         offset = (page - 1) * limit
 
-        with get_connection() as conn:
-            with conn.cursor(as_dict=True) as cursor:
-                cursor.execute("SELECT COUNT(*) AS count FROM Company WHERE IsActive = 1")
-                total_count = cursor.fetchone()['count']
-
-                cursor.execute("""
-                    SELECT * FROM Company
-                    WHERE IsActive = 1
-                    ORDER BY CompanyId
-                    OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
-                """, (offset, limit))
-                rows = cursor.fetchall()
-
-        data = [
-            Company(
-                company_id=row['CompanyId'],
-                name=row['Name'],
-                is_active=bool(row['IsActive']),
-                company_description=row.get('CompanyDescription'),
-                company_logo_name=row.get('CompanyLogoName'),
-                company_logo_url=row.get('CompanyLogoUrl'),
-                company_logo_path=row.get('CompanyLogoPath'),
-                contact_no=row.get('ContactNo'),
-                email=row.get('Email'),
-                address=row.get('Address'),
-                created_on=row['CreatedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('CreatedOn') else None,
-                created_by=row.get('CreatedBy', 0),
-                updated_on=row['UpdatedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('UpdatedOn') else None,
-                updated_by=row.get('UpdatedBy'),
-                deleted_on=row['DeletedOn'].strftime("%Y-%m-%d %H:%M:%S") if row.get('DeletedOn') else None,
-                deleted_by=row.get('DeletedBy')
-            ).dict()
-            for row in rows
-        ]
+        seek_clause = ""
+        seek_params = []
+        if pagination.cursor:
+            (last_company_id,) = decode_cursor(pagination.cursor, "companies", 1)
+            seek_clause = " AND CompanyId > %s"
+            seek_params = [last_company_id]
+            offset = 0
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                rows, total_count, _ = fetch_page(
+                    cursor, "companies", COMPANY_FIELDS.select_list(), "FROM Company WHERE IsActive = 1", [], "CompanyId",
+                    offset, limit, seek_clause, seek_params,
+                    pagination.include_total, pagination.estimate_total
+                )
+
+        data = _with_logo_variant([_company_record(row) for row in rows], pagination.image)
 
         return {
             "data": data,
             "total": total_count,
             "page": page,
             "limit": limit,
-            "total_pages": (total_count + limit - 1) // limit
+            "total_pages": total_pages(total_count, limit),
+            "next_cursor": next_cursor("companies", [rows[-1][0]] if rows else None, len(rows), limit)
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
\ No newline at end of file
@@ -1,31 +1,47 @@
-from datetime import datetime
-
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Any, Dict, List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
 import pymssql
 from db_connection import get_connection
+from reference_cache import reference_cache, require_references
+from db_async import run_db
+from exports import ExportFormat, stream_export
+from tenancy import company_scoped
+from row_mapping import EMPLOYEE_FIELDS
+from fast_json import FastJSONResponse
+from pagination import decode_cursor, fetch_page, next_cursor, total_pages
+from blob_store import blob_digest, blob_store
+from blob_streaming import too_large
+from images import IMAGE_MAX_BYTES, IMAGE_VARIANTS, check_variant, image_pool, receive_image, require_image, variant_urls
 from tables.employee import EmployeeCreate, EmployeePaginationRequest, EmployeeUpdate, EmployeeOut
 
 import base64
-import os
-import uuid
+import binascii
 
 router = APIRouter()
 
-UPLOAD_DIR = "uploaded_images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 def save_base64_image(base64_string: str) -> str:
+    # Stored by content hash: the same avatar uploaded twice is written once
     try:
         header, encoded = base64_string.split(",", 1)
-        file_ext = header.split("/")[1].split(";")[0]
-        filename = f"{uuid.uuid4()}.{file_ext}"
-        filepath = os.path.join(UPLOAD_DIR, filename)
-        with open(filepath, "wb") as f:
-            f.write(base64.b64decode(encoded))
-        return filepath
-    except Exception as e:
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid base64 image data: {e}")
+    # Same rules as /employees/{id}/image: an image/* type and at most IMAGE_MAX_BYTES decoded
+    content_type = require_image(header.split(":", 1)[-1].split(";")[0])
+    try:
+        data = base64.b64decode(encoded)
+    except (ValueError, binascii.Error) as e:
         raise HTTPException(status_code=400, detail=f"Invalid base64 image data: {e}")
+    if not data:
+        raise HTTPException(status_code=400, detail="Invalid base64 image data: empty image")
+    if len(data) > IMAGE_MAX_BYTES:
+        raise too_large(IMAGE_MAX_BYTES)
+    blob = blob_store.put_bytes(data, content_type)
+    image_pool.schedule(blob)
+    return blob.url
+
+def _image_owner(emp_id: int) -> str:
+    return f"employee:{emp_id}:image"
 
 @router.post("/employees", response_model=dict)
 def create_employee(employee: EmployeeCreate, db: pymssql.Connection = Depends(get_connection)):
@@ -36,13 +52,10 @@ def create_employee(employee: EmployeeCreate, db: pymssql.Connection = Depends(g
         if cursor.fetchone():
             raise HTTPException(status_code=400, detail="Email or phone already exists")
 
-        cursor.execute("SELECT 1 FROM Company WHERE CompanyId = %s", (employee.company_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Company ID not found")
-
-        cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s", (employee.created_by,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Created by user not found")
+        require_references(cursor, [
+            ("company", employee.company_id, 404, "Company ID not found"),
+            ("employee", employee.created_by, 404, "Created by user not found"),
+        ])
 
         image_path = None
         if employee.ImageUrl:
@@ -52,12 +65,16 @@ def create_employee(employee: EmployeeCreate, db: pymssql.Connection = Depends(g
             INSERT INTO Employee (Name, RoleID, Phone, Address, Email, Description,
                                   CreatedOn, CreatedBy, IsActive, CompanyId,
                                   ImgUrl, EmployeeImg, ImgPath)
+            OUTPUT INSERTED.EmpId
             VALUES (%s, %s, %s, %s, %s, %s, GETDATE(), %s, 1, %s, %s, %s, %s)
         """, (employee.name, employee.role_id, employee.phone, employee.address, employee.email,
               employee.description, employee.created_by, employee.company_id,
               employee.ImageUrl, None, image_path))
+        emp_id = cursor.fetchone()[0]
 
         db.commit()
+        if image_path:
+            blob_store.set_ref(_image_owner(emp_id), blob_digest(image_path))
         return {"message": "Employee created successfully"}
 
     except pymssql.Error as e:
@@ -68,13 +85,10 @@ def update_employee(emp_id: int, employee: EmployeeUpdate, db: pymssql.Connectio
     try:
         cursor = db.cursor()
 
-        cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s AND IsActive = 1", (emp_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Employee not found")
-
-        cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s", (employee.updated_by,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Updated by user not found")
+        require_references(cursor, [
+            ("active_employee", emp_id, 404, "Employee not found"),
+            ("employee", employee.updated_by, 404, "Updated by user not found"),
+        ])
 
         FIELD_MAP = {
             "name": "Name",
@@ -88,6 +102,7 @@ def update_employee(emp_id: int, employee: EmployeeUpdate, db: pymssql.Connectio
 
         update_fields = []
         params = []
+        image_path = None
 
         for field, value in employee.dict(exclude_unset=True).items():
             if field in ["updated_by", "EmployeeImage"]:
@@ -117,6 +132,8 @@ def update_employee(emp_id: int, employee: EmployeeUpdate, db: pymssql.Connectio
         query = f"UPDATE Employee SET {', '.join(update_fields)} WHERE EmpId = %s"
         cursor.execute(query, tuple(params))
         db.commit()
+        if image_path:
+            blob_store.set_ref(_image_owner(emp_id), blob_digest(image_path))
 
         return {"message": "Employee updated successfully"}
 
@@ -124,53 +141,98 @@ def update_employee(emp_id: int, employee: EmployeeUpdate, db: pymssql.Connectio
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
 @router.delete("/employees/{emp_id}", response_model=dict)
-def delete_employee(emp_id: int, deleted_by: str, db: pymssql.Connection = Depends(get_connection)):
+def delete_employee(emp_id: int, deleted_by: int, db: pymssql.Connection = Depends(get_connection)):
     try:
         cursor = db.cursor()
 
-        cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s AND IsActive = 1", (emp_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Employee not found")
-
-        cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s", (deleted_by,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Deleted by user not found")
+        require_references(cursor, [
+            ("active_employee", emp_id, 404, "Employee not found"),
+            ("employee", deleted_by, 404, "Deleted by user not found"),
+        ])
 
         cursor.execute("""
             UPDATE Employee SET IsActive = 0, DeletedOn = GETDATE(), DeletedBy = %s WHERE EmpId = %s
         """, (deleted_by, emp_id))
         db.commit()
+        reference_cache.invalidate("Employee", emp_id)
 
         return {"message": "Employee deleted successfully"}
 
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
-@router.get("/allemployees", response_model=List[EmployeeOut])
-def list_employees(db: pymssql.Connection = Depends(get_connection)):
+def _set_image(db: pymssql.Connection, emp_id: int, url: str) -> int:
+    with db.cursor() as cursor:
+        cursor.execute(
+            "UPDATE Employee SET ImgPath = %s, ImgUrl = %s, UpdatedOn = GETDATE() WHERE EmpId = %s AND IsActive = 1",
+            (url, url, emp_id)
+        )
+        updated = cursor.rowcount
+    db.commit()
+    return updated
+
+@router.post("/employees/{emp_id}/image", response_model=dict)
+async def upload_employee_image(emp_id: int, request: Request):
+    """Replace an employee photo from a multipart or raw image/* body (no base64 JSON)."""
+    blob = await receive_image(request)
+    try:
+        updated = await run_db(_set_image, emp_id, blob.url)
+    except pymssql.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+    if not updated:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    await run_in_threadpool(blob_store.set_ref, _image_owner(emp_id), blob.digest)
+    return {"message": "Employee image updated successfully", "ImagePath": blob.url}
+
+_ALL_EMPLOYEES_QUERY = "SELECT " + EMPLOYEE_FIELDS.select_list() + """
+    FROM Employee
+    WHERE IsActive = 1{company_filter}
+"""
+
+_employee_record = EMPLOYEE_FIELDS.record_mapper()
+
+def _list_employees(db: pymssql.Connection, query: str, params: tuple) -> List[Dict[str, Any]]:
     try:
         cursor = db.cursor()
-        cursor.execute("""
-            SELECT EmpId, Name, RoleID, Phone, Address, Email, Description,
-                   CompanyId, CreatedBy, UpdatedBy, IsActive, ImgUrl, EmployeeImg, ImgPath
-            FROM Employee
-            WHERE IsActive = 1
-        """)
+        cursor.execute(query, params)
         rows = cursor.fetchall()
 
-        result = []
-        for row in rows:
-            result.append(EmployeeOut(
-                emp_id=row[0], name=row[1], role_id=row[2], phone=row[3], address=row[4],
-                email=row[5], description=row[6], company_id=row[7], created_by=row[8],
-                updated_by=row[9], is_active=bool(row[10]), ImageUrl=row[11],
-                EmployeeImage=row[12], ImagePath=row[13]
-            ))
-        return result
+        return [_employee_record(row) for row in rows]
 
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
+def _with_image_variant(employees: List[Dict[str, Any]], image: str) -> List[Dict[str, Any]]:
+    # Swap stored photos (and inline base64 ImageUrls) for links to the sized WebP variant
+    urls = variant_urls((e["ImagePath"] for e in employees), image)
+    for e in employees:
+        url = urls.get(e["ImagePath"])
+        if url:
+            if not e["ImageUrl"] or e["ImageUrl"].startswith("data:") or blob_digest(e["ImageUrl"]):
+                e["ImageUrl"] = url
+            e["ImagePath"] = url
+    return employees
+
+async def _all_employees(company_id: Optional[int], format: str, image: Optional[str]):
+    check_variant(image)
+    query, params = company_scoped(_ALL_EMPLOYEES_QUERY, "CompanyId", company_id)
+    if format != "json":
+        return stream_export(query, params, _employee_record, format, "employees")
+    employees = await run_db(_list_employees, query, params)
+    if image:
+        employees = await run_in_threadpool(_with_image_variant, employees, image)
+    return FastJSONResponse(employees)
+
+@router.get("/allemployees", response_model=List[EmployeeOut])
+async def list_employees(format: ExportFormat = Query("json"),
+                         image: Optional[str] = Query(None, enum=list(IMAGE_VARIANTS))):
+    return await _all_employees(None, format, image)
+
+@router.get("/companies/{company_id}/employees", response_model=List[EmployeeOut])
+async def list_company_employees(company_id: int, format: ExportFormat = Query("json"),
+                                 image: Optional[str] = Query(None, enum=list(IMAGE_VARIANTS))):
+    return await _all_employees(company_id, format, image)
+
 @router.post("/employees/paginated", response_model=Dict[str, Any])
 def get_paginated_employees(pagination: EmployeePaginationRequest, db: pymssql.Connection = Depends(get_connection)):
     try:
@@ -197,43 +259,35 @@ def get_paginated_employees(pagination: EmployeePaginationRequest, db: pymssql.C
 
         cursor = db.cursor()
 
-        count_query = f"SELECT COUNT(*) FROM Employee WHERE {where_clause}"
-        cursor.execute(count_query, tuple(params))
-        total_count = cursor.fetchone()[0]
+        seek_clause = ""
+        seek_params = []
+        if pagination.cursor:
+            (last_emp_id,) = decode_cursor(pagination.cursor, "employees", 1)
+            seek_clause = " AND EmpId > %s"
+            seek_params = [last_emp_id]
+            offset = 0
 
-        data_query = f"""
-            SELECT EmpId, Name, RoleID, Phone, Address, Email, Description,
-                   CompanyId, CreatedBy, UpdatedBy, IsActive, CreatedOn, UpdatedOn, DeletedOn, DeletedBy
-            FROM Employee
-            WHERE {where_clause}
-            ORDER BY EmpId
-            OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
-        """
-        cursor.execute(data_query, tuple(params + [offset, page_limit]))
+        rows, total_count, columns = fetch_page(
+            cursor, "employees",
+            """EmpId, Name, RoleID, Phone, Address, Email, Description,
+               CompanyId, CreatedBy, UpdatedBy, IsActive, CreatedOn, UpdatedOn, DeletedOn, DeletedBy""",
+            f"FROM Employee WHERE {where_clause}", params, "EmpId",
+            offset, page_limit, seek_clause, seek_params,
+            pagination.include_total, pagination.estimate_total
+        )
 
-        rows = cursor.fetchall()
+        to_employee = EMPLOYEE_FIELDS.record_mapper(columns)
+        data = [to_employee(row) for row in rows]
 
-        data = []
-        for row in rows:
-            data.append(EmployeeOut(
-                emp_id=row[0], name=row[1], role_id=row[2], phone=row[3], address=row[4], email=row[5],
-                description=row[6], company_id=row[7], created_by=row[8], updated_by=row[9],
-                is_active=bool(row[10]),
-                created_on=row[11].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[11], datetime) else None,
-                updated_on=row[12].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[12], datetime) else None,
-                deleted_on=row[13].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[13], datetime) else None,
-                deleted_by=row[14]
-            ))
-
-        total_pages = (total_count + page_limit - 1) // page_limit
-        current_page = page if total_count > 0 else 0
+        current_page = 0 if total_count == 0 else page
 
         return {
-            "data": [d.dict() for d in data],
+            "data": data,
             "total": total_count,
             "page": current_page,
             "page_limit": page_limit,
-            "total_pages": total_pages
+            "total_pages": total_pages(total_count, page_limit),
+            "next_cursor": next_cursor("employees", [rows[-1][0]] if rows else None, len(rows), page_limit)
         }
 
     except pymssql.Error as e:
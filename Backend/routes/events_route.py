@@ -0,0 +1,66 @@
+import asyncio
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from db_async import run_db
+from events import EVENT_HEARTBEAT, assignee_topic, bus, company_topic, project_topic
+from tables.auth import Principal, get_current_user
+
+router = APIRouter()
+
+
+def _scope_companies(conn, project_id: Optional[int], assignee_id: Optional[int]) -> Dict[str, Optional[int]]:
+    # The owning company of each requested project / employee topic, in one round trip
+    selects, params = [], []
+    if project_id is not None:
+        selects.append("SELECT 'project' AS Scope, CompanyId FROM Projects WHERE ProjectId = %s")
+        params.append(project_id)
+    if assignee_id is not None:
+        selects.append("SELECT 'assignee' AS Scope, CompanyId FROM Employee WHERE EmpId = %s")
+        params.append(assignee_id)
+    with conn.cursor() as cursor:
+        cursor.execute(" UNION ALL ".join(selects), tuple(params))
+        return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+@router.get("/events")
+async def stream_events(company_id: Optional[int] = None, project_id: Optional[int] = None,
+                        assignee_id: Optional[int] = None,
+                        principal: Principal = Depends(get_current_user)):
+    """Server-Sent Events for task and log-time changes in any of the given scopes.
+
+    Events: task.created / task.updated / task.deleted and logtime.created / logtime.updated /
+    logtime.deleted, plus "resync" if the client fell too far behind. An idle stream costs no
+    database work; clients refetch through the /changes endpoints when an event arrives.
+    Every scope must belong to the caller's company.
+    """
+    topics = [t for t in (company_topic(company_id), project_topic(project_id), assignee_topic(assignee_id)) if t]
+    if not topics:
+        raise HTTPException(status_code=400, detail="Subscribe to a company_id, project_id or assignee_id.")
+    if principal.company_id is None or company_id not in (None, principal.company_id):
+        raise HTTPException(status_code=403, detail="Not authorized to follow this company.")
+    if project_id is not None or assignee_id is not None:
+        # Unknown ids get the same 403 as another tenant's, so ids can't be probed
+        owners = await run_db(_scope_companies, project_id, assignee_id)
+        if project_id is not None and owners.get("project") != principal.company_id:
+            raise HTTPException(status_code=403, detail="Not authorized to follow this project.")
+        if assignee_id is not None and owners.get("assignee") != principal.company_id:
+            raise HTTPException(status_code=403, detail="Not authorized to follow this employee.")
+
+    subscription = bus.subscribe(topics)
+
+    async def frames():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), EVENT_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+        finally:
+            bus.unsubscribe(subscription)
+
+    return StreamingResponse(frames(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
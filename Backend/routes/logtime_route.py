@@ -1,36 +1,37 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import Any, Dict, List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import Any, Dict, List, Optional
 import pymssql # Changed from pyodbc/pymysql
 from db_connection import get_connection
+from db_async import run_db
+from pagination import decode_cursor, fetch_page, next_cursor, total_pages
+from reference_cache import existing_references, reference_cache, require_references
+from exports import ExportFormat, stream_export
+from tenancy import company_scoped
+from row_mapping import LOGTIME_COLUMNS
+from fast_json import FastJSONResponse
+from table_versions import conditional
+from delta import DELTA_DEFAULT_LIMIT, DELTA_MAX_LIMIT, SINCE_HELP, fetch_changes
+from events import publish_logtime
+from bulk import batches, bulk_response, read_bulk_rows, reject_invalid, validate_rows, values_placeholders
 from tables.logtime import LogTimeCreate, LogTimeOut, LogTimeUpdate, PaginationRequest
 
 router = APIRouter()
 
+_FIELDS_HELP = "Comma-separated sparse field set, e.g. LogId,EmpId,Date,HoursSpent"
+
 @router.post("/logtimes", response_model=LogTimeOut)
 def create_logtime(logtime: LogTimeCreate, db: pymssql.Connection = Depends(get_connection)):
     try:
         cursor = db.cursor()
 
-        # Validate EmpId
-        cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s", (logtime.EmpId,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="EmpId not found")
-
-        # Validate TaskId
-        cursor.execute("SELECT 1 FROM Task WHERE TaskId = %s", (logtime.TaskId,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="TaskId not found")
-
-        # Validate CreatedBy
-        # Assuming 'Employee' table is still used for CreatedBy validation as in original
-        cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s", (logtime.CreatedBy,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="CreatedBy user not found")
-
-        # Validate CompanyId
-        cursor.execute("SELECT 1 FROM Company WHERE CompanyId = %s", (logtime.CompanyId,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="CompanyId not found")
+        # Validate EmpId, TaskId, CreatedBy and CompanyId in a single round trip
+        # (CreatedBy is still validated against 'Employee' as in original)
+        require_references(cursor, [
+            ("employee", logtime.EmpId, 404, "EmpId not found"),
+            ("task", logtime.TaskId, 404, "TaskId not found"),
+            ("employee", logtime.CreatedBy, 404, "CreatedBy user not found"),
+            ("company", logtime.CompanyId, 404, "CompanyId not found"),
+        ])
 
         insert_query = """
             INSERT INTO LogTime (EmpId, TaskId, Date, CreatedBy, CompanyId, Description, MinutesSpent, HoursSpent)
@@ -42,6 +43,7 @@ def create_logtime(logtime: LogTimeCreate, db: pymssql.Connection = Depends(get_
                         logtime.CompanyId, logtime.Description, logtime.MinutesSpent, logtime.HoursSpent))
         inserted = cursor.fetchone()
         db.commit()
+        publish_logtime("logtime.created", inserted[0], logtime.TaskId, logtime.EmpId, logtime.CompanyId)
 
         # If using default pymssql cursor (tuples), access by index
         return LogTimeOut(
@@ -65,33 +67,96 @@ def create_logtime(logtime: LogTimeCreate, db: pymssql.Connection = Depends(get_
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 
+
+# ---------------------------
+# BULK INSERT
+# ---------------------------
+_BULK_COLUMNS = ["EmpId", "TaskId", "Date", "CreatedBy", "CompanyId", "Description", "MinutesSpent", "HoursSpent"]
+
+def _bulk_create_logtimes(db: pymssql.Connection, items: List[Any], atomic: bool) -> Dict[str, Any]:
+    rows, errors = validate_rows(items, LogTimeCreate)
+    try:
+        cursor = db.cursor()
+
+        # Every referenced id of the whole request, validated set-based
+        refs = []
+        for _, lt in rows:
+            refs += [("employee", lt.EmpId), ("task", lt.TaskId), ("employee", lt.CreatedBy), ("company", lt.CompanyId)]
+        found = existing_references(cursor, refs)
+
+        valid = []
+        for index, lt in rows:
+            # Same checks and messages as POST /logtimes, in the same order
+            if ("employee", lt.EmpId) not in found:
+                errors[index] = "EmpId not found"
+            elif ("task", lt.TaskId) not in found:
+                errors[index] = "TaskId not found"
+            elif ("employee", lt.CreatedBy) not in found:
+                errors[index] = "CreatedBy user not found"
+            elif ("company", lt.CompanyId) not in found:
+                errors[index] = "CompanyId not found"
+            else:
+                valid.append((index, lt))
+        if atomic:
+            reject_invalid(errors)
+
+        # MERGE ... ON 1 = 0 always inserts, and unlike INSERT its OUTPUT clause can
+        # return the source RowIdx so each new LogId maps back to its request row
+        results = {}
+        columns = ", ".join(_BULK_COLUMNS)
+        source_columns = ", ".join(f"src.{c}" for c in _BULK_COLUMNS)
+        params_per_row = len(_BULK_COLUMNS) + 1
+        for batch in batches(valid, params_per_row):
+            params = []
+            for index, lt in batch:
+                params += [index, lt.EmpId, lt.TaskId, lt.Date, lt.CreatedBy, lt.CompanyId,
+                           lt.Description, lt.MinutesSpent, lt.HoursSpent]
+            cursor.execute(f"""
+                MERGE INTO LogTime AS t
+                USING (VALUES {values_placeholders(len(batch), params_per_row)}) AS src (RowIdx, {columns})
+                ON 1 = 0
+                WHEN NOT MATCHED THEN INSERT ({columns}) VALUES ({source_columns})
+                OUTPUT src.RowIdx, INSERTED.LogId, INSERTED.CreatedOn;
+            """, tuple(params))
+            for row_idx, log_id, created_on in cursor.fetchall():
+                results[row_idx] = {"index": row_idx, "status": "created", "LogId": log_id, "CreatedOn": created_on}
+
+        # One transaction for the whole request
+        db.commit()
+        entries = dict(valid)
+        for row_idx, result in results.items():
+            lt = entries[row_idx]
+            publish_logtime("logtime.created", result["LogId"], lt.TaskId, lt.EmpId, lt.CompanyId)
+        return bulk_response(results, errors)
+    except HTTPException:
+        raise
+    except pymssql.Error as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@router.post("/logtimes/bulk", response_model=Dict[str, Any])
+async def bulk_create_logtimes(request: Request, atomic: bool = Query(False, description="Reject the whole request if any row is invalid")):
+    """Create many log-time entries from a JSON array of LogTimeCreate objects or an NDJSON stream
+    (Content-Type: application/x-ndjson). Returns a result per row, in request order."""
+    items = await read_bulk_rows(request)
+    return await run_db(_bulk_create_logtimes, items, atomic)
+
+
 @router.put("/logtimes/{log_id}", response_model=dict)
 def update_logtime(log_id: int, logtime: LogTimeUpdate, db: pymssql.Connection = Depends(get_connection)):
     try:
         cursor = db.cursor()
 
-        # Check if LogTime exists and active
-        cursor.execute("SELECT 1 FROM LogTime WHERE LogId = %s AND IsActive = 1", (log_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="LogTime entry not found or is inactive")
-
-        # Validate UpdatedBy user (assuming 'Users' table based on original code)
-        # If UpdatedBy refers to EmployeeId, change 'Users' to 'Employee'
-        cursor.execute("SELECT 1 FROM Users WHERE UserId = %s", (logtime.UpdatedBy,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="UpdatedBy user not found")
-
-        # Validate EmpId if provided
-        if logtime.EmpId is not None:
-            cursor.execute("SELECT 1 FROM Employee WHERE EmpId = %s", (logtime.EmpId,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail="EmpId not found")
-
-        # Validate TaskId if provided
-        if logtime.TaskId is not None:
-            cursor.execute("SELECT 1 FROM Task WHERE TaskId = %s", (logtime.TaskId,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail="TaskId not found")
+        # The entry must be active; UpdatedBy is a Users id (EmpId/TaskId are skipped when None)
+        require_references(cursor, [
+            ("active_logtime", log_id, 404, "LogTime entry not found or is inactive"),
+            ("user", logtime.UpdatedBy, 404, "UpdatedBy user not found"),
+            ("employee", logtime.EmpId, 404, "EmpId not found"),
+            ("task", logtime.TaskId, 404, "TaskId not found"),
+        ])
 
         # Prepare update query dynamically
         fields = []
@@ -120,9 +185,13 @@ def update_logtime(log_id: int, logtime: LogTimeUpdate, db: pymssql.Connection =
 
         params.append(log_id) # Add log_id for the WHERE clause
 
-        sql = f"UPDATE LogTime SET {', '.join(fields)} WHERE LogId = %s"
+        sql = (f"UPDATE LogTime SET {', '.join(fields)} "
+               f"OUTPUT INSERTED.TaskId, INSERTED.EmpId, INSERTED.CompanyId, DELETED.EmpId WHERE LogId = %s")
         cursor.execute(sql, tuple(params)) # pymssql expects parameters as a tuple
+        row = cursor.fetchone()
         db.commit()
+        if row:
+            publish_logtime("logtime.updated", log_id, *row[:3], previous_emp_id=row[-1])
 
         return {"message": "LogTime updated successfully"}
 
@@ -139,21 +208,21 @@ def delete_logtime(log_id: int, deleted_by: int = Query(..., description="ID of
     try:
         cursor = db.cursor()
 
-        # Check if LogTime exists and active
-        cursor.execute("SELECT 1 FROM LogTime WHERE LogId = %s AND IsActive = 1", (log_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="LogTime entry not found or already inactive")
-
-        # Validate deleted_by user (assuming 'Users' table based on original code)
-        # If DeletedBy refers to EmployeeId, change 'Users' to 'Employee'
-        cursor.execute("SELECT 1 FROM Users WHERE UserId = %s", (deleted_by,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="DeletedBy user not found")
+        # The entry must be active; DeletedBy is a Users id
+        require_references(cursor, [
+            ("active_logtime", log_id, 404, "LogTime entry not found or already inactive"),
+            ("user", deleted_by, 404, "DeletedBy user not found"),
+        ])
 
         cursor.execute("""
-            UPDATE LogTime SET IsActive = 0, DeletedOn = GETDATE(), DeletedBy = %s WHERE LogId = %s
+            UPDATE LogTime SET IsActive = 0, DeletedOn = GETDATE(), DeletedBy = %s
+            OUTPUT INSERTED.TaskId, INSERTED.EmpId, INSERTED.CompanyId WHERE LogId = %s
         """, (deleted_by, log_id))
+        row = cursor.fetchone()
         db.commit()
+        reference_cache.invalidate("LogTime", log_id)
+        if row:
+            publish_logtime("logtime.deleted", log_id, *row)
 
         return {"message": "LogTime deleted successfully"}
 
@@ -165,51 +234,61 @@ def delete_logtime(log_id: int, deleted_by: int = Query(..., description="ID of
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 
-@router.get("/alllogtimes", response_model=List[LogTimeOut])
-def list_logtimes(db: pymssql.Connection = Depends(get_connection)):
+_ALL_LOGTIMES_QUERY = """
+    SELECT {columns}
+    FROM LogTime
+    WHERE IsActive = 1{company_filter}
+"""
+
+def _list_logtimes(db: pymssql.Connection, query: str, params: tuple, fields: Optional[tuple] = None) -> List[Any]:
     try:
         cursor = db.cursor()
-        cursor.execute("""
-            SELECT LogId, EmpId, TaskId, Date, CreatedOn, CreatedBy, UpdatedOn, UpdatedBy, IsActive,
-                   DeletedOn, DeletedBy, CompanyId, Description, MinutesSpent, HoursSpent
-            FROM LogTime
-            WHERE IsActive = 1
-        """)
+        cursor.execute(query, params)
         rows = cursor.fetchall()
 
-        result = []
-        for row in rows:
-            # Accessing by index as default pymssql cursor returns tuples
-            result.append(LogTimeOut(
-                LogId=row[0],
-                EmpId=row[1],
-                TaskId=row[2],
-                Date=row[3],
-                CreatedOn=row[4],
-                CreatedBy=row[5],
-                UpdatedOn=row[6],
-                UpdatedBy=row[7],
-                IsActive=bool(row[8]), # Convert tinyint/bit to boolean
-                DeletedOn=row[9],
-                DeletedBy=row[10],
-                CompanyId=row[11],
-                Description=row[12],
-                MinutesSpent=row[13],
-                HoursSpent=row[14]
-            ))
-        return result
+        to_logtime = LOGTIME_COLUMNS.record_mapper(fields)
+        return [to_logtime(row) for row in rows]
 
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+async def _all_logtimes(request: Request, company_id: Optional[int], format: str, fields: Optional[str]):
+    selected = LOGTIME_COLUMNS.parse_fields(fields)
+    query, params = company_scoped(_ALL_LOGTIMES_QUERY, "CompanyId", company_id,
+                                   columns=LOGTIME_COLUMNS.select_list(selected))
+    if format != "json":
+        return stream_export(query, params, LOGTIME_COLUMNS.record_mapper(selected), format, "logtimes")
 
-@router.post("/logtimesPaginated", response_model=Dict[str, Any])
-def get_paginated_logtimes(
-    pagination: PaginationRequest,
-    db: pymssql.Connection = Depends(get_connection)
-):
+    async def build():
+        return FastJSONResponse(await run_db(_list_logtimes, query, params, selected))
+    return await conditional(request, ("LogTime",), company_id, build)
+
+@router.get("/alllogtimes", response_model=List[LogTimeOut])
+async def list_logtimes(request: Request, format: ExportFormat = Query("json"),
+                        fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    return await _all_logtimes(request, None, format, fields)
+
+@router.get("/companies/{company_id}/logtimes", response_model=List[LogTimeOut])
+async def list_company_logtimes(request: Request, company_id: int, format: ExportFormat = Query("json"),
+                                fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    return await _all_logtimes(request, company_id, format, fields)
+
+
+# Delta sync: only log entries inserted, updated or deleted since the client's watermark
+@router.get("/logtimes/changes", response_model=Dict[str, Any])
+async def get_logtime_changes(since_version: Optional[str] = Query(None, description=SINCE_HELP),
+                              limit: int = Query(DELTA_DEFAULT_LIMIT, ge=1, le=DELTA_MAX_LIMIT)):
+    return FastJSONResponse(await run_db(fetch_changes, LOGTIME_COLUMNS, since_version, None, limit))
+
+@router.get("/companies/{company_id}/logtimes/changes", response_model=Dict[str, Any])
+async def get_company_logtime_changes(company_id: int, since_version: Optional[str] = Query(None, description=SINCE_HELP),
+                                      limit: int = Query(DELTA_DEFAULT_LIMIT, ge=1, le=DELTA_MAX_LIMIT)):
+    return FastJSONResponse(await run_db(fetch_changes, LOGTIME_COLUMNS, since_version, company_id, limit))
+
+
+def _paginated_logtimes(db: pymssql.Connection, pagination: PaginationRequest) -> Dict[str, Any]:
     try:
         page = max(pagination.page, 1)
         PageLimit = max(pagination.PageLimit, 1)
@@ -221,6 +300,10 @@ def get_paginated_logtimes(
         filters = ["lt.IsActive = 1"]
         params = []
 
+        if pagination.company_id is not None:
+            filters.append("lt.CompanyId = %s")
+            params.append(pagination.company_id)
+
         if pagination.employee_name:
             filters.append("LOWER(e.Name) LIKE %s")
             params.append(f"%{pagination.employee_name.lower()}%")
@@ -231,99 +314,76 @@ def get_paginated_logtimes(
 
         filter_clause = " AND ".join(filters)
 
-        # Total count query
-        count_query = f"""
-            SELECT COUNT(*)
-            FROM LogTime lt
-            JOIN Employee e ON lt.EmpId = e.EmpId
-            JOIN Task t ON lt.TaskId = t.TaskId
-            WHERE {filter_clause}
-        """
-        cursor.execute(count_query, tuple(params))
-        total_count = cursor.fetchone()[0] # Access first element of the tuple
-
-        # Data query
-        data_query = f"""
-            SELECT lt.LogId, lt.EmpId, lt.TaskId, lt.Date, lt.CreatedOn, lt.CreatedBy,
-                   lt.UpdatedOn, lt.UpdatedBy, lt.IsActive, lt.DeletedOn, lt.DeletedBy,
-                   lt.CompanyId, lt.Description, lt.MinutesSpent, lt.HoursSpent
+        # FROM/WHERE shared by the page and its total
+        from_clause = f"""
             FROM LogTime lt
             JOIN Employee e ON lt.EmpId = e.EmpId
             JOIN Task t ON lt.TaskId = t.TaskId
             WHERE {filter_clause}
-            ORDER BY lt.LogId
-            OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
         """
-        # params for data_query should include offset and PageLimit
-        data_params = params + [offset, PageLimit]
-        cursor.execute(data_query, tuple(data_params))
-        rows = cursor.fetchall()
 
-        data = []
-        for row in rows:
-            data.append(LogTimeOut(
-                LogId=row[0],
-                EmpId=row[1],
-                TaskId=row[2],
-                Date=row[3],
-                CreatedOn=row[4],
-                CreatedBy=row[5],
-                UpdatedOn=row[6],
-                UpdatedBy=row[7],
-                IsActive=bool(row[8]),
-                DeletedOn=row[9],
-                DeletedBy=row[10],
-                CompanyId=row[11],
-                Description=row[12],
-                MinutesSpent=row[13],
-                HoursSpent=row[14]
-            ).dict())
+        seek_clause = ""
+        seek_params = []
+        if pagination.cursor:
+            (last_log_id,) = decode_cursor(pagination.cursor, "logtimes", 1)
+            seek_clause = " AND lt.LogId > %s"
+            seek_params = [last_log_id]
+            offset = 0
+
+        # LogId (the keyset) leads every field set
+        selected = LOGTIME_COLUMNS.parse_fields(pagination.fields)
+        rows, total_count, columns = fetch_page(
+            cursor, "logtimes", LOGTIME_COLUMNS.select_list(selected, prefix="lt."),
+            from_clause, params, "lt.LogId", offset, PageLimit, seek_clause, seek_params,
+            pagination.include_total, pagination.estimate_total
+        )
+
+        to_logtime = LOGTIME_COLUMNS.record_mapper(selected)
+        data = [to_logtime(row) for row in rows]
 
         return {
             "data": data,
             "total": total_count,
             "page": page,
             "PageLimit": PageLimit,
-            "total_pages": (total_count + PageLimit - 1) // PageLimit
+            "total_pages": total_pages(total_count, PageLimit),
+            "next_cursor": next_cursor("logtimes", [rows[-1][columns.index("LogId")]] if rows else None, len(rows), PageLimit)
         }
 
+    except HTTPException:
+        raise
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 
-@router.get("/logtimes/by-task/{task_id}", response_model=List[LogTimeOut])
-def get_logs_by_task(task_id: int, db: pymssql.Connection = Depends(get_connection)):
-    try:
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT LogId, EmpId, TaskId, Date, CreatedOn, CreatedBy, UpdatedOn, UpdatedBy, IsActive,
-                   DeletedOn, DeletedBy, CompanyId, Description, MinutesSpent, HoursSpent
-            FROM LogTime
-            WHERE TaskId = %s AND IsActive = 1
-        """, (task_id,))
-        rows = cursor.fetchall()
+async def _paginated_logtime_response(request: Request, pagination: PaginationRequest):
+    async def build():
+        return FastJSONResponse(await run_db(_paginated_logtimes, pagination))
+    # The page joins Employee and Task, so their versions count too
+    return await conditional(request, ("LogTime", "Employee", "Task"), pagination.company_id, build,
+                             pagination.model_dump_json())
 
-        return [LogTimeOut(
-            LogId=row[0],
-            EmpId=row[1],
-            TaskId=row[2],
-            Date=row[3],
-            CreatedOn=row[4],
-            CreatedBy=row[5],
-            UpdatedOn=row[6],
-            UpdatedBy=row[7],
-            IsActive=bool(row[8]),
-            DeletedOn=row[9],
-            DeletedBy=row[10],
-            CompanyId=row[11],
-            Description=row[12],
-            MinutesSpent=row[13],
-            HoursSpent=row[14]
-        ) for row in rows]
 
-    except pymssql.Error as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+@router.post("/logtimesPaginated", response_model=Dict[str, Any])
+async def get_paginated_logtimes(request: Request, pagination: PaginationRequest):
+    return await _paginated_logtime_response(request, pagination)
+
+
+@router.post("/companies/{company_id}/logtimes/paginated", response_model=Dict[str, Any])
+async def get_company_paginated_logtimes(request: Request, company_id: int, pagination: PaginationRequest):
+    return await _paginated_logtime_response(request, pagination.model_copy(update={"company_id": company_id}))
+
+
+@router.get("/logtimes/by-task/{task_id}", response_model=List[LogTimeOut])
+async def get_logs_by_task(request: Request, task_id: int, fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    selected = LOGTIME_COLUMNS.parse_fields(fields)
+    query = f"""
+        SELECT {LOGTIME_COLUMNS.select_list(selected)}
+        FROM LogTime
+        WHERE TaskId = %s AND IsActive = 1
+    """
+    async def build():
+        return FastJSONResponse(await run_db(_list_logtimes, query, (task_id,), selected))
+    return await conditional(request, ("LogTime",), None, build)
\ No newline at end of file
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from profiling import PROFILE_FILES, profile_path
+from tables.auth import Principal, get_current_user
+
+router = APIRouter()
+
+_MEDIA_TYPES = {"summary": "application/json", "speedscope": "application/json", "collapsed": "text/plain"}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, kind: str = Query("summary", enum=list(PROFILE_FILES)),
+                current_user: Principal = Depends(get_current_user)):
+    """A profile recorded by ProfilerMiddleware; the id comes from the X-Profile-Id response header.
+    Open kind=speedscope in https://www.speedscope.app, or feed kind=collapsed to flamegraph.pl."""
+    if current_user.role not in [1]:
+        raise HTTPException(status_code=403, detail="Only administrators can read profiles.")
+    path = profile_path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type=_MEDIA_TYPES[kind], filename=path.rsplit("/", 1)[-1])
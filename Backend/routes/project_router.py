@@ -1,8 +1,17 @@
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Any, Dict, List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import Any, Dict, List, Optional
 import pymssql # Changed from pyodbc
-from db_connection import get_connection
+from db_connection import get_connection, pooled_connection
+from db_async import run_db
+from reference_cache import reference_cache, require_references
+from exports import ExportFormat, stream_export
+from tenancy import company_scoped
+from row_mapping import PROJECT_COLUMNS
+from fast_json import FastJSONResponse
+from table_versions import conditional
+from delta import DELTA_DEFAULT_LIMIT, DELTA_MAX_LIMIT, SINCE_HELP, fetch_changes
+from pagination import decode_cursor, fetch_page, next_cursor, total_pages
 from tables.project import ProjectCreate, ProjectPaginationRequest, ProjectUpdate, ProjectOut
 
 router = APIRouter()
@@ -10,8 +19,8 @@ router = APIRouter()
 @router.post("/projects", response_model=dict)
 def create_project(proj: ProjectCreate):
     try:
-        # Using `get_connection()` as a context manager ensures proper closing
-        with get_connection() as conn:
+        # `pooled_connection()` hands the connection back to the pool on exit
+        with pooled_connection() as conn:
             with conn.cursor() as cursor:
                 # Check for duplicate project name in same company (optional)
                 cursor.execute(
@@ -21,15 +30,11 @@ def create_project(proj: ProjectCreate):
                 if cursor.fetchone():
                     raise HTTPException(status_code=400, detail="Project with this name already exists in the company.")
 
-                # Validate CreatedBy user exists
-                cursor.execute("SELECT 1 FROM TaskManager.dbo.Employee WHERE EmpId = %s", (proj.CreatedBy,))
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=404, detail="CreatedBy user not found.")
-
-                # Validate ProjectManager user exists
-                cursor.execute("SELECT 1 FROM TaskManager.dbo.Employee WHERE EmpId = %s", (proj.ProjectManager,))
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=404, detail="ProjectManager user not found.")
+                # Validate CreatedBy and ProjectManager employees exist
+                require_references(cursor, [
+                    ("employee", proj.CreatedBy, 404, "CreatedBy user not found."),
+                    ("employee", proj.ProjectManager, 404, "ProjectManager user not found."),
+                ])
 
                 # Insert project with OUTPUT to get inserted ProjectId
                 insert_query = """
@@ -47,9 +52,8 @@ def create_project(proj: ProjectCreate):
                 conn.commit()
 
     except pymssql.Error as e: # Catch pymssql specific errors
-        # No rollback needed here if using `with conn:` context for `get_connection`
-        # and cursor also within `with` as `pymssql` handles implicit transaction for DML.
-        # However, explicit rollback on error is safer if you modify transaction behavior.
+        # No rollback needed here: `pooled_connection()` rolls back before returning
+        # the connection to the pool.
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
@@ -76,21 +80,12 @@ def update_project(project_id: int, project: ProjectUpdate, db: pymssql.Connecti
     try:
         cursor = db.cursor()
 
-        # Check if project exists and is active
-        cursor.execute("SELECT 1 FROM Projects WHERE ProjectId = %s AND IsActive = 1", (project_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Project not found or is inactive")
-
-        # Validate UpdatedBy user
-        cursor.execute("SELECT 1 FROM [dbo].[Employee] WHERE EmpId = %s", (project.UpdatedBy,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="UpdatedBy user not found.")
-
-        # If ProjectManager is being updated, validate it
-        if project.ProjectManager is not None:
-            cursor.execute("SELECT 1 FROM [dbo].[Employee] WHERE EmpId = %s", (project.ProjectManager,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail="ProjectManager user not found.")
+        # The project must be active; ProjectManager is only validated when being updated
+        require_references(cursor, [
+            ("active_project", project_id, 404, "Project not found or is inactive"),
+            ("employee", project.UpdatedBy, 404, "UpdatedBy user not found."),
+            ("employee", project.ProjectManager, 404, "ProjectManager user not found."),
+        ])
 
         # Build update statement dynamically
         fields = []
@@ -125,6 +120,8 @@ def update_project(project_id: int, project: ProjectUpdate, db: pymssql.Connecti
         sql = f"UPDATE Projects SET {', '.join(fields)} WHERE ProjectId = %s"
         cursor.execute(sql, tuple(params)) # pymssql expects parameters as a tuple
         db.commit()
+        if project.IsActive is not None:
+            reference_cache.invalidate("Projects", project_id)
 
         return {"message": "Project updated successfully"}
 
@@ -140,20 +137,17 @@ def delete_project(project_id: int, deleted_by: int, db: pymssql.Connection = De
     try:
         cursor = db.cursor()
 
-        # Check if project exists and is active
-        cursor.execute("SELECT 1 FROM Projects WHERE ProjectId = %s AND IsActive = 1", (project_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Project not found or is already inactive")
-
-        # Validate deleted_by user
-        cursor.execute("SELECT 1 FROM [dbo].[Employee] WHERE EmpId = %s", (deleted_by,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="DeletedBy user not found.")
+        # The project must be active and deleted_by an existing employee
+        require_references(cursor, [
+            ("active_project", project_id, 404, "Project not found or is already inactive"),
+            ("employee", deleted_by, 404, "DeletedBy user not found."),
+        ])
 
         cursor.execute("""
             UPDATE Projects SET IsActive = 0, DeletedOn = GETDATE(), DeletedBy = %s WHERE ProjectId = %s
         """, (deleted_by, project_id))
         db.commit()
+        reference_cache.invalidate("Projects", project_id)
 
         return {"message": "Project deleted successfully"}
 
@@ -164,49 +158,74 @@ def delete_project(project_id: int, deleted_by: int, db: pymssql.Connection = De
         db.rollback()
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-@router.get("/allprojects", response_model=List[ProjectOut])
-def list_projects(db: pymssql.Connection = Depends(get_connection)):
+_ALL_PROJECTS_QUERY = """
+    SELECT {columns}
+    FROM Projects
+    WHERE IsActive = 1{company_filter}
+"""
+
+_FIELDS_HELP = "Comma-separated sparse field set, e.g. ProjectId,Name,Status,EndDate"
+_project_record = PROJECT_COLUMNS.record_mapper()
+
+def _list_projects(db: pymssql.Connection, query: str, params: tuple, fields: Optional[tuple] = None) -> List[Any]:
     try:
         cursor = db.cursor()
-        cursor.execute("""
-            SELECT ProjectId, Name, StartDate, EndDate, ProjectManager, Priority, Status,
-                   CreatedOn, CreatedBy, UpdatedOn, UpdatedBy, IsActive, DeletedOn, DeletedBy, CompanyId, Description
-            FROM Projects
-            WHERE IsActive = 1
-        """)
+        cursor.execute(query, params)
         rows = cursor.fetchall()
 
-        result = []
-        for row in rows:
-            # Accessing by index as default pymssql cursor returns tuples
-            result.append(ProjectOut(
-                ProjectId=row[0],
-                Name=row[1],
-                StartDate=row[2],
-                EndDate=row[3],
-                ProjectManager=row[4],
-                Priority=row[5],
-                Status=row[6],
-                CreatedOn=row[7],
-                CreatedBy=row[8],
-                UpdatedOn=row[9],
-                UpdatedBy=row[10],
-                IsActive=bool(row[11]), # Convert tinyint/bit to boolean
-                DeletedOn=row[12],
-                DeletedBy=row[13],
-                CompanyId=row[14],
-                Description=row[15]
-            ))
-        return result
+        to_project = PROJECT_COLUMNS.record_mapper(fields)
+        return [to_project(row) for row in rows]
 
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+async def _all_projects(request: Request, company_id: Optional[int], format: str, fields: Optional[str]):
+    selected = PROJECT_COLUMNS.parse_fields(fields)
+    query, params = company_scoped(_ALL_PROJECTS_QUERY, "CompanyId", company_id,
+                                   columns=PROJECT_COLUMNS.select_list(selected))
+    if format != "json":
+        return stream_export(query, params, PROJECT_COLUMNS.record_mapper(selected), format, "projects")
 
-@router.post("/projects/paginated", response_model=Dict[str, Any])
-def get_paginated_projects(pagination: ProjectPaginationRequest):
+    async def build():
+        return FastJSONResponse(await run_db(_list_projects, query, params, selected))
+    return await conditional(request, ("Projects",), company_id, build)
+
+@router.get("/allprojects", response_model=List[ProjectOut])
+async def list_projects(request: Request, format: ExportFormat = Query("json"),
+                        fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    return await _all_projects(request, None, format, fields)
+
+@router.get("/companies/{company_id}/projects", response_model=List[ProjectOut])
+async def list_company_projects(request: Request, company_id: int, format: ExportFormat = Query("json"),
+                                fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    return await _all_projects(request, company_id, format, fields)
+
+# Delta sync: only projects inserted, updated or deleted since the client's watermark
+# (declared before /projects/{project_id} so "changes" is not taken for an id)
+@router.get("/projects/changes", response_model=Dict[str, Any])
+async def get_project_changes(since_version: Optional[str] = Query(None, description=SINCE_HELP),
+                              limit: int = Query(DELTA_DEFAULT_LIMIT, ge=1, le=DELTA_MAX_LIMIT)):
+    return FastJSONResponse(await run_db(fetch_changes, PROJECT_COLUMNS, since_version, None, limit))
+
+@router.get("/companies/{company_id}/projects/changes", response_model=Dict[str, Any])
+async def get_company_project_changes(company_id: int, since_version: Optional[str] = Query(None, description=SINCE_HELP),
+                                      limit: int = Query(DELTA_DEFAULT_LIMIT, ge=1, le=DELTA_MAX_LIMIT)):
+    return FastJSONResponse(await run_db(fetch_changes, PROJECT_COLUMNS, since_version, company_id, limit))
+
+def _truncated_project(row) -> Dict[str, Any]:
+    # The paginated, by-manager and by-id reads have always truncated dates to the day and timestamps to the second
+    record = _project_record(row)
+    for name in ("StartDate", "EndDate"):
+        value = record[name]
+        record[name] = value.replace(hour=0, minute=0, second=0, microsecond=0) if isinstance(value, datetime) else None
+    for name in ("CreatedOn", "UpdatedOn", "DeletedOn"):
+        value = record[name]
+        record[name] = value.replace(microsecond=0) if isinstance(value, datetime) else None
+    return record
+
+def _paginated_projects(db: pymssql.Connection, pagination: ProjectPaginationRequest) -> Dict[str, Any]:
     try:
         page = pagination.page
         PageLimit = pagination.PageLimit
@@ -216,6 +235,10 @@ def get_paginated_projects(pagination: ProjectPaginationRequest):
         params = []
 
         # Apply filters
+        if pagination.company_id is not None:
+            filters.append("CompanyId = %s")
+            params.append(pagination.company_id)
+
         if pagination.name:
             filters.append("Name LIKE %s")
             params.append(f"%{pagination.name}%")
@@ -234,108 +257,77 @@ def get_paginated_projects(pagination: ProjectPaginationRequest):
 
         where_clause = " AND ".join(filters)
 
-        with get_connection() as conn:
-            with conn.cursor() as cursor:
-                # Count total matching projects
-                cursor.execute(f"SELECT COUNT(*) FROM Projects WHERE {where_clause}", tuple(params))
-                total_count = cursor.fetchone()[0] # Access first element of the tuple
-
-                # Fetch paginated projects
-                cursor.execute(f"""
-                    SELECT ProjectId, Name, StartDate, EndDate, ProjectManager, Priority, Status,
-                           CreatedOn, CreatedBy, UpdatedOn, UpdatedBy, IsActive,
-                           DeletedOn, DeletedBy, CompanyId, Description
-                    FROM Projects
-                    WHERE {where_clause}
-                    ORDER BY ProjectId DESC
-                    OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
-                """, tuple(params + [offset, PageLimit])) # Combine params for WHERE and OFFSET/FETCH
-
-                rows = cursor.fetchall()
-
-        data = [
-            ProjectOut(
-                ProjectId=row[0],
-                Name=row[1],
-                StartDate=row[2].strftime("%Y-%m-%d") if isinstance(row[2], datetime) else None,
-                EndDate=row[3].strftime("%Y-%m-%d") if isinstance(row[3], datetime) else None,
-                ProjectManager=row[4],
-                Priority=row[5],
-                Status=row[6],
-                CreatedOn=row[7].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[7], datetime) else None,
-                CreatedBy=row[8],
-                UpdatedOn=row[9].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[9], datetime) else None,
-                UpdatedBy=row[10],
-                IsActive=bool(row[11]),
-                DeletedOn=row[12].strftime("%Y-%m-%d %H:%M:%S") if row[12] and isinstance(row[12], datetime) else None,
-                DeletedBy=row[13],
-                CompanyId=row[14],
-                Description=row[15]
-            ).dict()
-            for row in rows
-        ]
+        seek_clause = ""
+        seek_params = []
+        if pagination.cursor:
+            (last_project_id,) = decode_cursor(pagination.cursor, "projects", 1)
+            seek_clause = " AND ProjectId < %s"
+            seek_params = [last_project_id]
+            offset = 0
+
+        with db.cursor() as cursor:
+            rows, total_count, _ = fetch_page(
+                cursor, "projects",
+                PROJECT_COLUMNS.select_list(),
+                f"FROM Projects WHERE {where_clause}", params, "ProjectId DESC",
+                offset, PageLimit, seek_clause, seek_params,
+                pagination.include_total, pagination.estimate_total
+            )
+
+        data = [_truncated_project(row) for row in rows]
 
         return {
             "data": data,
             "total": total_count,
             "page": page,
             "PageLimit": PageLimit,
-            "total_pages": (total_count + PageLimit - 1) // PageLimit
+            "total_pages": total_pages(total_count, PageLimit),
+            "next_cursor": next_cursor("projects", [rows[-1][0]] if rows else None, len(rows), PageLimit)
         }
 
+    except HTTPException:
+        raise
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+async def _paginated_project_response(request: Request, pagination: ProjectPaginationRequest):
+    async def build():
+        return FastJSONResponse(await run_db(_paginated_projects, pagination))
+    return await conditional(request, ("Projects",), pagination.company_id, build, pagination.model_dump_json())
+
+@router.post("/projects/paginated", response_model=Dict[str, Any])
+async def get_paginated_projects(request: Request, pagination: ProjectPaginationRequest):
+    return await _paginated_project_response(request, pagination)
+
+@router.post("/companies/{company_id}/projects/paginated", response_model=Dict[str, Any])
+async def get_company_paginated_projects(request: Request, company_id: int, pagination: ProjectPaginationRequest):
+    return await _paginated_project_response(request, pagination.model_copy(update={"company_id": company_id}))
+
 @router.get("/projects/by-manager", response_model=List[ProjectOut])
 def get_projects_by_manager(emp_id: int, db: pymssql.Connection = Depends(get_connection)):
     try:
         cursor = db.cursor()
-        cursor.execute("""
-            SELECT ProjectId, Name, StartDate, EndDate, ProjectManager, Priority, Status,
-                   CreatedOn, CreatedBy, UpdatedOn, UpdatedBy, IsActive, DeletedOn, DeletedBy, CompanyId, Description
+        cursor.execute(f"""
+            SELECT {PROJECT_COLUMNS.select_list()}
             FROM Projects
             WHERE IsActive = 1 AND ProjectManager = %s
         """, (emp_id,))
 
         rows = cursor.fetchall()
-
-        result = []
-        for row in rows:
-            result.append(ProjectOut(
-                ProjectId=row[0],
-                Name=row[1],
-                StartDate=row[2].strftime("%Y-%m-%d") if isinstance(row[2], datetime) else None,
-                EndDate=row[3].strftime("%Y-%m-%d") if isinstance(row[3], datetime) else None,
-                ProjectManager=row[4],
-                Priority=row[5],
-                Status=row[6],
-                CreatedOn=row[7].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[7], datetime) else None,
-                CreatedBy=row[8],
-                UpdatedOn=row[9].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[9], datetime) else None,
-                UpdatedBy=row[10],
-                IsActive=bool(row[11]),
-                DeletedOn=row[12].strftime("%Y-%m-%d %H:%M:%S") if row[12] and isinstance(row[12], datetime) else None,
-                DeletedBy=row[13],
-                CompanyId=row[14],
-                Description=row[15]
-            ))
-        return result
+        return FastJSONResponse([_truncated_project(row) for row in rows])
 
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-@router.get("/projects/{project_id}", response_model=ProjectOut)
-def get_project_by_id(project_id: int, db: pymssql.Connection = Depends(get_connection)):
+def _project_by_id(db: pymssql.Connection, project_id: int) -> Dict[str, Any]:
     try:
         cursor = db.cursor()
-        cursor.execute("""
-            SELECT ProjectId, Name, StartDate, EndDate, ProjectManager, Priority, Status,
-                   CreatedOn, CreatedBy, UpdatedOn, UpdatedBy, IsActive,
-                   DeletedOn, DeletedBy, CompanyId, Description
+        cursor.execute(f"""
+            SELECT {PROJECT_COLUMNS.select_list()}
             FROM Projects
             WHERE ProjectId = %s AND IsActive = 1
         """, (project_id,))
@@ -344,26 +336,17 @@ def get_project_by_id(project_id: int, db: pymssql.Connection = Depends(get_conn
         if not row:
             raise HTTPException(status_code=404, detail="Project not found.")
 
-        return ProjectOut(
-            ProjectId=row[0],
-            Name=row[1],
-            StartDate=row[2].strftime("%Y-%m-%d") if isinstance(row[2], datetime) else None,
-            EndDate=row[3].strftime("%Y-%m-%d") if isinstance(row[3], datetime) else None,
-            ProjectManager=row[4],
-            Priority=row[5],
-            Status=row[6],
-            CreatedOn=row[7].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[7], datetime) else None,
-            CreatedBy=row[8],
-            UpdatedOn=row[9].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[9], datetime) else None,
-            UpdatedBy=row[10],
-            IsActive=bool(row[11]),
-            DeletedOn=row[12].strftime("%Y-%m-%d %H:%M:%S") if row[12] and isinstance(row[12], datetime) else None,
-            DeletedBy=row[13],
-            CompanyId=row[14],
-            Description=row[15]
-        )
+        return _truncated_project(row)
 
+    except HTTPException:
+        raise
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@router.get("/projects/{project_id}", response_model=ProjectOut)
+async def get_project_by_id(request: Request, project_id: int):
+    async def build():
+        return FastJSONResponse(await run_db(_project_by_id, project_id))
+    return await conditional(request, ("Projects",), None, build)
@@ -1,7 +1,11 @@
-from typing import Any, Dict, List
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
 import pymssql # Changed from pyodbc
-from db_connection import get_connection
+from db_connection import pooled_connection
+from reference_cache import reference_cache, require_references
+from exports import ExportFormat, stream_export
+from tenancy import company_scoped
+from pagination import decode_cursor, fetch_page, next_cursor, total_pages
 from tables.role import Role, RoleCreate, RolePaginationRequest, RoleUpdate
 from datetime import datetime
 
@@ -11,17 +15,13 @@ router = APIRouter()
 @router.post("/roles", response_model=Role)
 def create_role(role: RoleCreate):
     try:
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cursor:
-                # ✅ Ensure CompanyId exists
-                cursor.execute("SELECT CompanyId FROM TaskManager.dbo.Company WHERE CompanyId = %s", (role.company_id,)) # Changed ? to %s
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=400, detail=f"Company ID {role.company_id} does not exist.")
-
-                # ✅ Ensure CreatedBy (UserId) exists
-                cursor.execute("SELECT UserId FROM TaskManager.dbo.Users WHERE UserId = %s", (role.created_by,)) # Changed ? to %s
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=400, detail=f"CreatedBy user ID {role.created_by} does not exist.")
+                # ✅ Ensure CompanyId and CreatedBy (UserId) exist
+                require_references(cursor, [
+                    ("company", role.company_id, 400, f"Company ID {role.company_id} does not exist."),
+                    ("user", role.created_by, 400, f"CreatedBy user ID {role.created_by} does not exist."),
+                ])
 
                 cursor.execute("""
                     INSERT INTO TaskManager.dbo.Role (Role, CompanyId, IsActive, CreatedBy, CreatedOn)
@@ -33,14 +33,10 @@ def create_role(role: RoleCreate):
                 conn.commit()
 
     except pymssql.Error as e: # Catch pymssql specific errors
-        # Rollback is handled by the context manager if an exception occurs before commit,
-        # but explicit rollback is good practice if not using context manager for connection.
-        # For `with conn:`, `conn.rollback()` might be needed if `conn.commit()` fails or
-        # if you have multiple operations within the `try` block that need atomic rollback.
-        conn.rollback() # Explicit rollback on database error
+        # The pool rolls back any open transaction when `pooled_connection()` exits,
+        # so the connection must not be touched here (it may already belong to another request).
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        conn.rollback() # Rollback for other unexpected errors
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
     # Ensure row is not None before accessing elements
@@ -61,36 +57,39 @@ def create_role(role: RoleCreate):
     }
 
 # ✅ Get all active roles with joins
-@router.get("/allroles", response_model=List[Dict[str, Any]]) # Added response_model for clarity
-def get_roles():
+_ALL_ROLES_QUERY = """
+    SELECT
+        R.RoleId,
+        R.Role,
+        R.CreatedOn,
+        R.CreatedBy,
+        CU.Email AS CreatedByEmail,
+        R.UpdatedOn,
+        R.UpdatedBy,
+        UU.Email AS UpdatedByEmail,
+        R.IsActive,
+        R.DeletedOn,
+        R.DeletedBy,
+        DU.Email AS DeletedByEmail,
+        R.CompanyId,
+        C.Name AS CompanyName
+    FROM TaskManager.dbo.Role R
+    INNER JOIN TaskManager.dbo.Company C ON R.CompanyId = C.CompanyId
+    LEFT JOIN TaskManager.dbo.Users CU ON R.CreatedBy = CU.UserId
+    LEFT JOIN TaskManager.dbo.Users UU ON R.UpdatedBy = UU.UserId
+    LEFT JOIN TaskManager.dbo.Users DU ON R.DeletedBy = DU.UserId
+    WHERE R.IsActive = 1{company_filter}
+    ORDER BY R.RoleId DESC
+"""
+
+def _list_roles(company_id: Optional[int], format: str):
+    query, params = company_scoped(_ALL_ROLES_QUERY, "R.CompanyId", company_id)
+    if format != "json":
+        return stream_export(query, params, dict, format, "roles", as_dict=True)
     try:
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cursor:
-                query = """
-                SELECT
-                    R.RoleId,
-                    R.Role,
-                    R.CreatedOn,
-                    R.CreatedBy,
-                    CU.Email AS CreatedByEmail,
-                    R.UpdatedOn,
-                    R.UpdatedBy,
-                    UU.Email AS UpdatedByEmail,
-                    R.IsActive,
-                    R.DeletedOn,
-                    R.DeletedBy,
-                    DU.Email AS DeletedByEmail,
-                    R.CompanyId,
-                    C.Name AS CompanyName
-                FROM TaskManager.dbo.Role R
-                INNER JOIN TaskManager.dbo.Company C ON R.CompanyId = C.CompanyId
-                LEFT JOIN TaskManager.dbo.Users CU ON R.CreatedBy = CU.UserId
-                LEFT JOIN TaskManager.dbo.Users UU ON R.UpdatedBy = UU.UserId
-                LEFT JOIN TaskManager.dbo.Users DU ON R.DeletedBy = DU.UserId
-                WHERE R.IsActive = 1
-                ORDER BY R.RoleId DESC
-                """
-                cursor.execute(query)
+                cursor.execute(query, params)
                 rows = cursor.fetchall()
 
                 columns = [column[0] for column in cursor.description]
@@ -103,6 +102,14 @@ def get_roles():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+@router.get("/allroles", response_model=List[Dict[str, Any]]) # Added response_model for clarity
+def get_roles(format: ExportFormat = Query("json")):
+    return _list_roles(None, format)
+
+@router.get("/companies/{company_id}/roles", response_model=List[Dict[str, Any]])
+def get_company_roles(company_id: int, format: ExportFormat = Query("json")):
+    return _list_roles(company_id, format)
+
 
 # ✅ Update a role
 @router.put("/roles/{role_id}")
@@ -122,15 +129,13 @@ def update_role(role_id: int, role: RoleUpdate):
                 detail="At least one updatable field (e.g., role, company_id) must be provided."
             )
 
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cursor:
                 # Check if updated_by user exists and is active
-                cursor.execute(
-                    "SELECT 1 FROM TaskManager.dbo.Users WHERE UserId = %s AND IsActive = 1", # Changed ? to %s
-                    (update_data['updated_by'],)
-                )
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=400, detail=f"UpdatedBy user ID {update_data['updated_by']} not found or inactive.")
+                require_references(cursor, [
+                    ("active_user", update_data['updated_by'], 400,
+                     f"UpdatedBy user ID {update_data['updated_by']} not found or inactive."),
+                ])
 
                 # Fetch existing role data
                 cursor.execute("""
@@ -191,10 +196,8 @@ def update_role(role_id: int, role: RoleUpdate):
         return {"message": f"Role {role_id} updated successfully."}
 
     except pymssql.Error as e: # Catch pymssql specific errors
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 
@@ -202,17 +205,13 @@ def update_role(role_id: int, role: RoleUpdate):
 @router.delete("/roles/{role_id}")
 def delete_role(role_id: int, deleted_by: int):
     try:
-        with get_connection() as conn:
+        with pooled_connection() as conn:
             with conn.cursor() as cursor:
-                # Check if role exists
-                cursor.execute("SELECT RoleId FROM TaskManager.dbo.Role WHERE RoleId = %s", (role_id,)) # Changed ? to %s
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=404, detail=f"Role ID {role_id} not found.")
-
-                # Ensure deleted_by exists
-                cursor.execute("SELECT UserId FROM TaskManager.dbo.Users WHERE UserId = %s", (deleted_by,)) # Changed ? to %s
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=400, detail=f"DeletedBy user ID {deleted_by} does not exist.")
+                # Check the role exists and deleted_by is a user
+                require_references(cursor, [
+                    ("role", role_id, 404, f"Role ID {role_id} not found."),
+                    ("user", deleted_by, 400, f"DeletedBy user ID {deleted_by} does not exist."),
+                ])
 
                 cursor.execute("""
                     UPDATE TaskManager.dbo.Role
@@ -220,12 +219,11 @@ def delete_role(role_id: int, deleted_by: int):
                     WHERE RoleId = %s
                 """, (deleted_by, role_id)) # Changed ? to %s and ensured tuple
                 conn.commit()
+        reference_cache.invalidate("Role", role_id)
 
     except pymssql.Error as e: # Catch pymssql specific errors
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
     return {"message": f"Role {role_id} deleted by user {deleted_by}."}
@@ -238,40 +236,46 @@ def get_paginated_roles(pagination: RolePaginationRequest):
         page_limit = pagination.PageLimit
         offset = (page - 1) * page_limit
 
-        with get_connection() as conn:
+        where_clause = "R.IsActive = 1"
+        params = []
+        if pagination.company_id is not None:
+            where_clause += " AND R.CompanyId = %s"
+            params.append(pagination.company_id)
+
+        seek_clause = ""
+        seek_params = []
+        if pagination.cursor:
+            (last_role_id,) = decode_cursor(pagination.cursor, "roles", 1)
+            seek_clause = " AND R.RoleId < %s"
+            seek_params = [last_role_id]
+            offset = 0
+
+        with pooled_connection() as conn:
             with conn.cursor() as cursor:
-                # Get total count of active roles
-                cursor.execute("SELECT COUNT(*) FROM TaskManager.dbo.Role WHERE IsActive = 1")
-                total_count = cursor.fetchone()[0]
-
-                # Get paginated roles
-                cursor.execute("""
-                    SELECT
-                        R.RoleId AS role_id,
-                        R.Role AS role,
-                        R.CompanyId AS company_id,
-                        C.Name AS company_name,
-                        R.CreatedOn AS created_on,
-                        R.CreatedBy AS created_by,
-                        CU.Email AS created_by_email,
-                        R.UpdatedOn AS updated_on,
-                        R.UpdatedBy AS updated_by,
-                        UU.Email AS updated_by_email,
-                        R.DeletedOn AS deleted_on,
-                        R.DeletedBy AS deleted_by,
-                        DU.Email AS deleted_by_email
-                    FROM TaskManager.dbo.Role R
+                rows, total_count, columns = fetch_page(
+                    cursor, "roles",
+                    """R.RoleId AS role_id,
+                       R.Role AS role,
+                       R.CompanyId AS company_id,
+                       C.Name AS company_name,
+                       R.CreatedOn AS created_on,
+                       R.CreatedBy AS created_by,
+                       CU.Email AS created_by_email,
+                       R.UpdatedOn AS updated_on,
+                       R.UpdatedBy AS updated_by,
+                       UU.Email AS updated_by_email,
+                       R.DeletedOn AS deleted_on,
+                       R.DeletedBy AS deleted_by,
+                       DU.Email AS deleted_by_email""",
+                    """FROM TaskManager.dbo.Role R
                     INNER JOIN TaskManager.dbo.Company C ON R.CompanyId = C.CompanyId
                     LEFT JOIN TaskManager.dbo.Users CU ON R.CreatedBy = CU.UserId
                     LEFT JOIN TaskManager.dbo.Users UU ON R.UpdatedBy = UU.UserId
                     LEFT JOIN TaskManager.dbo.Users DU ON R.DeletedBy = DU.UserId
-                    WHERE R.IsActive = 1
-                    ORDER BY R.RoleId DESC
-                    OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
-                """, (offset, page_limit)) # Changed ? to %s and ensured tuple
-
-                columns = [col[0] for col in cursor.description]
-                rows = cursor.fetchall()
+                    WHERE """ + where_clause, params, "R.RoleId DESC",
+                    offset, page_limit, seek_clause, seek_params,
+                    pagination.include_total, pagination.estimate_total
+                )
                 roles = [dict(zip(columns, row)) for row in rows]
 
         return {
@@ -279,10 +283,17 @@ def get_paginated_roles(pagination: RolePaginationRequest):
             "total": total_count,
             "page": page,
             "PageLimit": page_limit,
-            "total_pages": (total_count + page_limit - 1) // page_limit
+            "total_pages": total_pages(total_count, page_limit),
+            "next_cursor": next_cursor("roles", [rows[-1][0]] if rows else None, len(rows), page_limit)
         }
 
+    except HTTPException:
+        raise
     except pymssql.Error as e: # Catch pymssql specific errors
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@router.post("/companies/{company_id}/roles/paginated", response_model=Dict[str, Any])
+def get_company_paginated_roles(company_id: int, pagination: RolePaginationRequest):
+    return get_paginated_roles(pagination.model_copy(update={"company_id": company_id}))
@@ -1,33 +1,82 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from typing import Any, Dict, List, Optional
 import pymssql # Changed from pyodbc
 from datetime import datetime
-from tables.task import TaskCreate, TaskPaginationRequest, TaskUpdate, TaskOut
+from tables.task import TaskBulkReassign, TaskBulkUpdate, TaskCreate, TaskPaginationRequest, TaskUpdate, TaskOut
 from db_connection import get_connection
+from db_async import run_db
+from pagination import decode_cursor, fetch_page, next_cursor, total_pages
+from reference_cache import existing_references, first_missing, reference_cache, require_references
+from exports import ExportFormat, stream_export
+from tenancy import company_scoped
+from blob_store import blob_digest, blob_store
+from row_mapping import TASK_COLUMNS
+from fast_json import FastJSONResponse
+from table_versions import conditional
+from delta import DELTA_DEFAULT_LIMIT, DELTA_MAX_LIMIT, SINCE_HELP, fetch_changes
+from events import publish_task
+from bulk import batches, bulk_response, read_bulk_rows, reject_invalid, validate_rows, values_placeholders
 
 router = APIRouter()
 
-# Helper validation functions - changed to pymssql parameter style and cursor type
-def validate_user(cursor: pymssql.Cursor, user_id: int, role: str):
-    # Use %s placeholder and pass parameters as a tuple
-    cursor.execute("SELECT 1 FROM [dbo].[Employee] WHERE EmpId = %s", (user_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail=f"{role} user not found")
-
-def validate_employee(cursor: pymssql.Cursor, emp_id: int):
-    cursor.execute("SELECT 1 FROM [dbo].[Employee] WHERE EmpId = %s", (emp_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail="Assigned employee not found")
-
-def validate_project(cursor: pymssql.Cursor, project_id: int):
-    cursor.execute("SELECT 1 FROM [dbo].[Projects] WHERE ProjectId = %s", (project_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail="Project not found")
-
-def validate_company(cursor: pymssql.Cursor, company_id: int):
-    cursor.execute("SELECT 1 FROM [dbo].[company] WHERE CompanyId = %s", (company_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail="Company not found")
+# Reference checks - resolved together (and cached) by require_references()
+def user_check(user_id: int, role: str):
+    return ("employee", user_id, 404, f"{role} user not found")
+
+def employee_check(emp_id: Optional[int]):
+    return ("employee", emp_id, 404, "Assigned employee not found")
+
+def project_check(project_id: Optional[int]):
+    return ("project", project_id, 404, "Project not found")
+
+def company_check(company_id: Optional[int]):
+    return ("company", company_id, 404, "Company not found")
+
+def _create_checks(task: TaskCreate):
+    return [
+        user_check(task.CreatedBy, "CreatedBy"),
+        company_check(task.CompanyId),
+        project_check(task.ProjectId),
+        employee_check(task.AssignedTo),
+    ]
+
+def _update_checks(task: TaskUpdate):
+    return [
+        user_check(task.UpdatedBy, "UpdatedBy"),
+        employee_check(task.AssignedTo),
+        project_check(task.ProjectId),
+        company_check(task.CompanyId),
+    ]
+
+# Explicit Task projections and the shared tuple -> TaskOut mapper
+_TASK_COLUMNS = TASK_COLUMNS.select_list()
+_INSERTED_TASK_COLUMNS = TASK_COLUMNS.select_list(prefix="INSERTED.")
+_task_out = TASK_COLUMNS.mapper()
+_FIELDS_HELP = "Comma-separated sparse field set, e.g. TaskId,Name,Status,Deadline"
+
+def _update_fields(task: TaskUpdate) -> Dict[str, Any]:
+    # Columns a TaskUpdate sets: every field that is not None
+    allowed_fields = {
+        "Name": task.Name,
+        "ProjectId": task.ProjectId,
+        "AssignedTo": task.AssignedTo,
+        "DocumentPath": task.DocumentPath,
+        "DocumentUrl": task.DocumentUrl,
+        "Deadline": task.Deadline,
+        "Priority": task.Priority,
+        "Status": task.Status,
+        "Description": task.Description,
+        "DocumentName": task.DocumentName,
+        "ExptedHours": task.ExptedHours,
+        "IsActive": int(task.IsActive) if task.IsActive is not None else None, # Convert bool to int for SQL Server BIT/TINYINT
+        "CompanyId": task.CompanyId
+    }
+    return {key: value for key, value in allowed_fields.items() if value is not None}
+
+def _track_documents(tasks):
+    # Keep blob refcounts in step with the document each task now points at
+    for task in tasks:
+        blob_store.set_ref(f"task:{task.TaskId}:document", blob_digest(task.DocumentPath, task.DocumentUrl))
 
 ## Task Management Endpoints
 
@@ -35,21 +84,15 @@ def validate_company(cursor: pymssql.Cursor, company_id: int):
 @router.post("/tasks", response_model=TaskOut)
 def create_task(task: TaskCreate, db: pymssql.Connection = Depends(get_connection)):
     try:
-        # Create cursor with as_dict=True for dictionary-like row access
-        cursor = db.cursor(as_dict=True)
+        cursor = db.cursor()
 
-        validate_user(cursor, task.CreatedBy, "CreatedBy")
-        validate_company(cursor, task.CompanyId)
-        validate_project(cursor, task.ProjectId)
+        require_references(cursor, _create_checks(task))  # AssignedTo is skipped when None
 
-        if task.AssignedTo is not None:
-            validate_employee(cursor, task.AssignedTo)
-
-        insert_query = """
+        insert_query = f"""
             INSERT INTO Task
             (Name, ProjectId, AssignedTo, DocumentPath, DocumentUrl, Deadline, Priority, Status,
              CreatedOn, CreatedBy, IsActive, CompanyId, Description, DocumentName, ExptedHours)
-            OUTPUT INSERTED.* -- SQL Server specific, works with pymssql
+            OUTPUT {_INSERTED_TASK_COLUMNS} -- SQL Server specific, works with pymssql
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, GETDATE(), %s, 1, %s, %s, %s, %s)
         """
         cursor.execute(insert_query, (
@@ -63,28 +106,10 @@ def create_task(task: TaskCreate, db: pymssql.Connection = Depends(get_connectio
         if not row:
             raise HTTPException(status_code=500, detail="Failed to retrieve inserted task data after creation.")
 
-        return TaskOut(
-            TaskId=row['TaskId'], # Access as dictionary key
-            Name=row['Name'],
-            ProjectId=row['ProjectId'],
-            AssignedTo=row['AssignedTo'],
-            DocumentPath=row['DocumentPath'],
-            DocumentUrl=row['DocumentUrl'],
-            Deadline=row['Deadline'],
-            Priority=row['Priority'],
-            Status=row['Status'],
-            CreatedOn=row['CreatedOn'],
-            CreatedBy=row['CreatedBy'],
-            UpdatedOn=row['UpdatedOn'],
-            UpdatedBy=row['UpdatedBy'],
-            DeletedOn=row['DeletedOn'],
-            DeletedBy=row['DeletedBy'],
-            CompanyId=row['CompanyId'],
-            Description=row['Description'],
-            DocumentName=row['DocumentName'],
-            ExptedHours=row['ExptedHours'],
-            IsActive=bool(row['IsActive']) # Convert 1/0 to bool
-        )
+        created = _task_out(row)
+        _track_documents([created])
+        publish_task("task.created", created)
+        return created
 
     except pymssql.Error as e: # Catch specific pymssql errors
         db.rollback() # Rollback on database error
@@ -97,88 +122,44 @@ def create_task(task: TaskCreate, db: pymssql.Connection = Depends(get_connectio
 @router.put("/tasks/{task_id}", response_model=TaskOut)
 def update_task(task_id: int, task: TaskUpdate, db: pymssql.Connection = Depends(get_connection)):
     try:
-        cursor = db.cursor(as_dict=True) # Create cursor with as_dict=True
+        cursor = db.cursor()
 
         cursor.execute("SELECT 1 FROM Task WHERE TaskId = %s AND IsActive = 1", (task_id,))
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="Task not found or is inactive.")
 
-        validate_user(cursor, task.UpdatedBy, "UpdatedBy")
-
-        if task.AssignedTo is not None:
-            validate_employee(cursor, task.AssignedTo)
-        if task.ProjectId is not None:
-            validate_project(cursor, task.ProjectId)
-        if task.CompanyId is not None:
-            validate_company(cursor, task.CompanyId)
-
-        fields = []
-        params = []
-
-        allowed_fields = {
-            "Name": task.Name,
-            "ProjectId": task.ProjectId,
-            "AssignedTo": task.AssignedTo,
-            "DocumentPath": task.DocumentPath,
-            "DocumentUrl": task.DocumentUrl,
-            "Deadline": task.Deadline,
-            "Priority": task.Priority,
-            "Status": task.Status,
-            "Description": task.Description,
-            "DocumentName": task.DocumentName,
-            "ExptedHours": task.ExptedHours,
-            "IsActive": int(task.IsActive) if task.IsActive is not None else None, # Convert bool to int for SQL Server BIT/TINYINT
-            "CompanyId": task.CompanyId
-        }
+        # Optional references are skipped when None
+        require_references(cursor, _update_checks(task))
 
-        for key, value in allowed_fields.items():
-            if value is not None:
-                fields.append(f"{key} = %s") # pymssql placeholder
-                params.append(value)
-
-        if not fields:
+        changes = _update_fields(task)
+        if not changes:
             raise HTTPException(status_code=400, detail="No valid fields provided to update.")
 
+        fields = [f"{key} = %s" for key in changes] # pymssql placeholder
+        params = list(changes.values())
+
         fields.append("UpdatedOn = GETDATE()")
         fields.append("UpdatedBy = %s") # pymssql placeholder
         params.append(task.UpdatedBy)
 
-        sql = f"UPDATE Task SET {', '.join(fields)} WHERE TaskId = %s" # pymssql placeholder
+        # OUTPUT returns the updated row (and the previous assignee), no re-select needed
+        sql = f"UPDATE Task SET {', '.join(fields)} OUTPUT {_INSERTED_TASK_COLUMNS}, DELETED.AssignedTo WHERE TaskId = %s" # pymssql placeholder
         
         # All parameters must be passed as a single tuple/list
         final_params = tuple(params) + (task_id,) 
         cursor.execute(sql, final_params)
-        db.commit()
-
-        # Fetch the updated task to return
-        cursor.execute("SELECT * FROM Task WHERE TaskId = %s", (task_id,))
         row = cursor.fetchone()
+        db.commit()
+        if task.IsActive is False:
+            reference_cache.invalidate("Task", task_id)
 
         if not row:
             raise HTTPException(status_code=404, detail="Task not found after update (unexpected error).")
 
-        return TaskOut(
-            TaskId=row['TaskId'],
-            Name=row['Name'],
-            ProjectId=row['ProjectId'],
-            AssignedTo=row['AssignedTo'],
-            DocumentPath=row['DocumentPath'],
-            DocumentUrl=row['DocumentUrl'],
-            Deadline=row['Deadline'],
-            Priority=row['Priority'],
-            Status=row['Status'],
-            CreatedOn=row['CreatedOn'],
-            CreatedBy=row['CreatedBy'],
-            UpdatedOn=row['UpdatedOn'],
-            UpdatedBy=row['UpdatedBy'],
-            DeletedOn=row['DeletedOn'],
-            DeletedBy=row['DeletedBy'],
-            CompanyId=row['CompanyId'],
-            Description=row['Description'],
-            DocumentName=row['DocumentName'],
-            ExptedHours=row['ExptedHours'],
-            IsActive=bool(row['IsActive'])
-        )
+        updated = _task_out(row[:-1])
+        _track_documents([updated])
+        publish_task("task.updated", updated, previous_assignee=row[-1])
+        return updated
 
     except pymssql.Error as e: # Catch specific pymssql errors
         db.rollback() # Rollback on database error
@@ -198,11 +179,16 @@ def delete_task(task_id: int, deleted_by: int, db: pymssql.Connection = Depends(
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="Task not found or already deleted.")
 
-        validate_user(cursor, deleted_by, "DeletedBy")
-        cursor.execute("""
-            UPDATE Task SET IsActive = 0, DeletedOn = GETDATE(), DeletedBy = %s WHERE TaskId = %s
+        require_references(cursor, [user_check(deleted_by, "DeletedBy")])
+        cursor.execute(f"""
+            UPDATE Task SET IsActive = 0, DeletedOn = GETDATE(), DeletedBy = %s
+            OUTPUT {_INSERTED_TASK_COLUMNS} WHERE TaskId = %s
         """, (deleted_by, task_id)) # Pass parameters as a single tuple
+        row = cursor.fetchone()
         db.commit()
+        reference_cache.invalidate("Task", task_id)
+        if row:
+            publish_task("task.deleted", _task_out(row))
 
         return {"message": "Task deleted successfully"}
     except pymssql.Error as e: # Catch specific pymssql errors
@@ -212,128 +198,254 @@ def delete_task(task_id: int, deleted_by: int, db: pymssql.Connection = Depends(
         db.rollback() # Rollback for other unexpected errors
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-### List All Tasks
-@router.get("/alltasks", response_model=List[TaskOut])
-def list_tasks(db: pymssql.Connection = Depends(get_connection)):
+### Bulk Create / Update / Reassign
+_BULK_CREATE_COLUMNS = ["Name", "ProjectId", "AssignedTo", "DocumentPath", "DocumentUrl", "Deadline", "Priority",
+                        "Status", "CreatedBy", "CompanyId", "Description", "DocumentName", "ExptedHours"]
+
+def _check_refs(cursor, rows, checks_for, errors: Dict[int, Any]):
+    # Resolves the references of every row in one pass; returns the rows that passed
+    checks = {index: checks_for(row) for index, row in rows}
+    found = existing_references(cursor, [(c[0], c[1]) for row_checks in checks.values() for c in row_checks])
+    valid = []
+    for index, row in rows:
+        missing = first_missing(found, checks[index])
+        if missing:
+            errors[index] = missing[1]
+        else:
+            valid.append((index, row))
+    return valid
+
+def _bulk_create_tasks(db: pymssql.Connection, items: List[Any], atomic: bool) -> Dict[str, Any]:
+    rows, errors = validate_rows(items, TaskCreate)
     try:
-        cursor = db.cursor(as_dict=True) # Create cursor with as_dict=True
-        cursor.execute("""
-            SELECT * FROM Task WHERE IsActive = 1
-        """)
-        rows = cursor.fetchall() # Returns list of dicts
-
-        return [
-            TaskOut(
-                TaskId=row['TaskId'],
-                Name=row['Name'],
-                ProjectId=row['ProjectId'],
-                AssignedTo=row['AssignedTo'],
-                DocumentPath=row['DocumentPath'],
-                DocumentUrl=row['DocumentUrl'],
-                Deadline=row['Deadline'],
-                Priority=row['Priority'],
-                Status=row['Status'],
-                CreatedOn=row['CreatedOn'],
-                CreatedBy=row['CreatedBy'],
-                UpdatedOn=row['UpdatedOn'],
-                UpdatedBy=row['UpdatedBy'],
-                DeletedOn=row['DeletedOn'],
-                DeletedBy=row['DeletedBy'],
-                CompanyId=row['CompanyId'],
-                Description=row['Description'],
-                DocumentName=row['DocumentName'],
-                ExptedHours=row['ExptedHours'],
-                IsActive=bool(row['IsActive'])
-            )
-            for row in rows
-        ]
+        cursor = db.cursor()
+        valid = _check_refs(cursor, rows, _create_checks, errors)
+        if atomic:
+            reject_invalid(errors)
+
+        # MERGE ... ON 1 = 0 always inserts and lets OUTPUT carry the source RowIdx
+        results = {}
+        columns = ", ".join(_BULK_CREATE_COLUMNS)
+        params_per_row = len(_BULK_CREATE_COLUMNS) + 1
+        for batch in batches(valid, params_per_row):
+            params = []
+            for index, task in batch:
+                params += [index] + [getattr(task, c) for c in _BULK_CREATE_COLUMNS]
+            cursor.execute(f"""
+                MERGE INTO Task AS t
+                USING (VALUES {values_placeholders(len(batch), params_per_row)}) AS src (RowIdx, {columns})
+                ON 1 = 0
+                WHEN NOT MATCHED THEN INSERT ({columns}, CreatedOn, IsActive)
+                    VALUES ({", ".join(f"src.{c}" for c in _BULK_CREATE_COLUMNS)}, GETDATE(), 1)
+                OUTPUT src.RowIdx, {_INSERTED_TASK_COLUMNS};
+            """, tuple(params))
+            for row in cursor.fetchall():
+                results[row[0]] = {"index": row[0], "status": "created", "task": _task_out(row[1:])}
+
+        db.commit()
+        _track_documents(result["task"] for result in results.values())
+        for result in results.values():
+            publish_task("task.created", result["task"])
+        return bulk_response(results, errors)
+    except HTTPException:
+        raise
     except pymssql.Error as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-### Tasks by Assigned Employee
-@router.get("/tasks/by-assigned/{employee_id}", response_model=List[TaskOut])
-def get_tasks_by_assigned_employee(employee_id: int, db: pymssql.Connection = Depends(get_connection)):
+@router.post("/tasks/bulk", response_model=Dict[str, Any])
+async def bulk_create_tasks(request: Request, atomic: bool = Query(False, description="Reject the whole request if any row is invalid")):
+    """Create many tasks from a JSON array of TaskCreate objects (or NDJSON). Returns a result per row."""
+    items = await read_bulk_rows(request)
+    return await run_db(_bulk_create_tasks, items, atomic)
+
+def _bulk_update_tasks(db: pymssql.Connection, items: List[Any], atomic: bool) -> Dict[str, Any]:
+    rows, errors = validate_rows(items, TaskBulkUpdate)
     try:
-        cursor = db.cursor(as_dict=True) # Create cursor with as_dict=True
-        cursor.execute("SELECT * FROM Task WHERE AssignedTo = %s AND IsActive = 1", (employee_id,))
-        rows = cursor.fetchall()
-        return [
-            TaskOut(
-                TaskId=row['TaskId'],
-                Name=row['Name'],
-                ProjectId=row['ProjectId'],
-                AssignedTo=row['AssignedTo'],
-                DocumentPath=row['DocumentPath'],
-                DocumentUrl=row['DocumentUrl'],
-                Deadline=row['Deadline'],
-                Priority=row['Priority'],
-                Status=row['Status'],
-                CreatedOn=row['CreatedOn'],
-                CreatedBy=row['CreatedBy'],
-                UpdatedOn=row['UpdatedOn'],
-                UpdatedBy=row['UpdatedBy'],
-                DeletedOn=row['DeletedOn'],
-                DeletedBy=row['DeletedBy'],
-                CompanyId=row['CompanyId'],
-                Description=row['Description'],
-                DocumentName=row['DocumentName'],
-                ExptedHours=row['ExptedHours'],
-                IsActive=bool(row['IsActive'])
-            )
-            for row in rows
-        ]
+        cursor = db.cursor()
+
+        # A TaskId may appear once; a second match in UPDATE ... FROM would be ambiguous
+        seen = set()
+        for index, task in list(rows):
+            if task.TaskId in seen:
+                errors[index] = "Duplicate TaskId in request"
+            seen.add(task.TaskId)
+        rows = [(index, task) for index, task in rows if index not in errors]
+
+        def checks_for(task: TaskBulkUpdate):
+            return [("active_task", task.TaskId, 404, "Task not found or is inactive.")] + _update_checks(task)
+        valid = _check_refs(cursor, rows, checks_for, errors)
+
+        # Same rule as PUT /tasks/{task_id}: every field that is not None is set
+        groups: Dict[tuple, list] = {}
+        for index, task in valid:
+            changes = _update_fields(task)
+            if not changes:
+                errors[index] = "No valid fields provided to update."
+                continue
+            groups.setdefault(tuple(changes), []).append((index, task, changes))
+        if atomic:
+            reject_invalid(errors)
+
+        # One set-based UPDATE per distinct field set, joined to the new values by TaskId
+        results = {}
+        previous_assignees = {}
+        for field_names, group in groups.items():
+            params_per_row = len(field_names) + 3
+            set_clause = ", ".join(f"t.{f} = src.{f}" for f in field_names)
+            for batch in batches(group, params_per_row):
+                params = []
+                for index, task, changes in batch:
+                    params += [index, task.TaskId, task.UpdatedBy] + list(changes.values())
+                cursor.execute(f"""
+                    UPDATE t SET {set_clause}, t.UpdatedOn = GETDATE(), t.UpdatedBy = src.UpdatedBy
+                    OUTPUT src.RowIdx, {_INSERTED_TASK_COLUMNS}, DELETED.AssignedTo
+                    FROM Task AS t
+                    INNER JOIN (VALUES {values_placeholders(len(batch), params_per_row)})
+                        AS src (RowIdx, TaskId, UpdatedBy, {", ".join(field_names)})
+                        ON t.TaskId = src.TaskId
+                """, tuple(params))
+                for row in cursor.fetchall():
+                    results[row[0]] = {"index": row[0], "status": "updated", "task": _task_out(row[1:-1])}
+                    previous_assignees[row[0]] = row[-1]
+
+        db.commit()
+        for result in results.values():
+            if not result["task"].IsActive:
+                reference_cache.invalidate("Task", result["task"].TaskId)
+        _track_documents(result["task"] for result in results.values())
+        for index, result in results.items():
+            publish_task("task.updated", result["task"], previous_assignee=previous_assignees[index])
+        return bulk_response(results, errors)
+    except HTTPException:
+        raise
     except pymssql.Error as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-### Tasks by Project Manager
-@router.get("/tasks/by-manager/{manager_id}", response_model=List[TaskOut])
-def get_tasks_by_project_manager(manager_id: int, db: pymssql.Connection = Depends(get_connection)):
+@router.patch("/tasks/bulk", response_model=Dict[str, Any])
+async def bulk_update_tasks(request: Request, atomic: bool = Query(False, description="Reject the whole request if any row is invalid")):
+    """Apply partial TaskUpdate payloads (each with its TaskId) to many tasks. Returns a result per row."""
+    items = await read_bulk_rows(request)
+    return await run_db(_bulk_update_tasks, items, atomic)
+
+def _bulk_reassign_tasks(db: pymssql.Connection, data: TaskBulkReassign) -> Dict[str, Any]:
     try:
-        cursor = db.cursor(as_dict=True) # Create cursor with as_dict=True
-        query = """
-            SELECT t.* FROM Task t
-            INNER JOIN Projects p ON t.ProjectId = p.ProjectId
-            WHERE p.ProjectManager = %s AND t.IsActive = 1
-        """
-        cursor.execute(query, (manager_id,))
+        cursor = db.cursor()
+        require_references(cursor, [user_check(data.UpdatedBy, "UpdatedBy"), employee_check(data.AssignedTo)])
+
+        task_ids = sorted(set(data.TaskIds))
+        updated = []
+        for batch in batches(task_ids, 1):
+            cursor.execute(f"""
+                UPDATE Task SET AssignedTo = %s, UpdatedOn = GETDATE(), UpdatedBy = %s
+                OUTPUT {_INSERTED_TASK_COLUMNS}, DELETED.AssignedTo
+                WHERE IsActive = 1 AND TaskId IN ({", ".join(["%s"] * len(batch))})
+            """, (data.AssignedTo, data.UpdatedBy) + tuple(batch))
+            updated += [(_task_out(row[:-1]), row[-1]) for row in cursor.fetchall()]
+        db.commit()
+        for task, previous_assignee in updated:
+            publish_task("task.updated", task, previous_assignee=previous_assignee)
+        updated = [task for task, _ in updated]
+
+        updated_ids = {task.TaskId for task in updated}
+        return {
+            "updated": sorted(updated, key=lambda task: task.TaskId),
+            "not_found": [task_id for task_id in task_ids if task_id not in updated_ids],
+        }
+    except HTTPException:
+        raise
+    except pymssql.Error as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@router.post("/tasks/bulk/reassign", response_model=Dict[str, Any])
+async def bulk_reassign_tasks(data: TaskBulkReassign):
+    """Point AssignedTo of every active task in TaskIds at one employee (or unassign with null)."""
+    if not data.TaskIds:
+        raise HTTPException(status_code=400, detail="No TaskIds provided")
+    return await run_db(_bulk_reassign_tasks, data)
+
+### List All Tasks
+_ALL_TASKS_QUERY = "SELECT {columns} FROM Task WHERE IsActive = 1{company_filter}"
+
+def _list_tasks(db: pymssql.Connection, query: str, params: tuple, fields: Optional[tuple] = None) -> List[Any]:
+    try:
+        cursor = db.cursor()
+        cursor.execute(query, params)
         rows = cursor.fetchall()
-        return [
-            TaskOut(
-                TaskId=row['TaskId'],
-                Name=row['Name'],
-                ProjectId=row['ProjectId'],
-                AssignedTo=row['AssignedTo'],
-                DocumentPath=row['DocumentPath'],
-                DocumentUrl=row['DocumentUrl'],
-                Deadline=row['Deadline'],
-                Priority=row['Priority'],
-                Status=row['Status'],
-                CreatedOn=row['CreatedOn'],
-                CreatedBy=row['CreatedBy'],
-                UpdatedOn=row['UpdatedOn'],
-                UpdatedBy=row['UpdatedBy'],
-                DeletedOn=row['DeletedOn'],
-                DeletedBy=row['DeletedBy'],
-                CompanyId=row['CompanyId'],
-                Description=row['Description'],
-                DocumentName=row['DocumentName'],
-                ExptedHours=row['ExptedHours'],
-                IsActive=bool(row['IsActive'])
-            )
-            for row in rows
-        ]
+
+        to_task = TASK_COLUMNS.record_mapper(fields)
+        return [to_task(row) for row in rows]
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+async def _task_list(query: str, params: tuple, selected: Optional[tuple]) -> FastJSONResponse:
+    return FastJSONResponse(await run_db(_list_tasks, query, params, selected))
+
+async def _all_tasks(request: Request, company_id: Optional[int], format: str, fields: Optional[str]):
+    selected = TASK_COLUMNS.parse_fields(fields)
+    query, params = company_scoped(_ALL_TASKS_QUERY, "CompanyId", company_id,
+                                   columns=TASK_COLUMNS.select_list(selected))
+    if format != "json":
+        return stream_export(query, params, TASK_COLUMNS.record_mapper(selected), format, "tasks")
+    return await conditional(request, ("Task",), company_id, lambda: _task_list(query, params, selected))
+
+@router.get("/alltasks", response_model=List[TaskOut])
+async def list_tasks(request: Request, format: ExportFormat = Query("json"),
+                     fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    return await _all_tasks(request, None, format, fields)
+
+@router.get("/companies/{company_id}/tasks", response_model=List[TaskOut])
+async def list_company_tasks(request: Request, company_id: int, format: ExportFormat = Query("json"),
+                             fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    return await _all_tasks(request, company_id, format, fields)
+
+### Delta sync: only tasks inserted, updated or deleted since the client's watermark
+@router.get("/tasks/changes", response_model=Dict[str, Any])
+async def get_task_changes(since_version: Optional[str] = Query(None, description=SINCE_HELP),
+                           limit: int = Query(DELTA_DEFAULT_LIMIT, ge=1, le=DELTA_MAX_LIMIT)):
+    return FastJSONResponse(await run_db(fetch_changes, TASK_COLUMNS, since_version, None, limit))
+
+@router.get("/companies/{company_id}/tasks/changes", response_model=Dict[str, Any])
+async def get_company_task_changes(company_id: int, since_version: Optional[str] = Query(None, description=SINCE_HELP),
+                                   limit: int = Query(DELTA_DEFAULT_LIMIT, ge=1, le=DELTA_MAX_LIMIT)):
+    return FastJSONResponse(await run_db(fetch_changes, TASK_COLUMNS, since_version, company_id, limit))
+
+### Tasks by Assigned Employee
+@router.get("/tasks/by-assigned/{employee_id}", response_model=List[TaskOut])
+async def get_tasks_by_assigned_employee(request: Request, employee_id: int,
+                                         fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    selected = TASK_COLUMNS.parse_fields(fields)
+    query = f"SELECT {TASK_COLUMNS.select_list(selected)} FROM Task WHERE AssignedTo = %s AND IsActive = 1"
+    return await conditional(request, ("Task",), None, lambda: _task_list(query, (employee_id,), selected))
+
+### Tasks by Project Manager
+@router.get("/tasks/by-manager/{manager_id}", response_model=List[TaskOut])
+async def get_tasks_by_project_manager(request: Request, manager_id: int,
+                                       fields: Optional[str] = Query(None, description=_FIELDS_HELP)):
+    selected = TASK_COLUMNS.parse_fields(fields)
+    query = f"""
+        SELECT {TASK_COLUMNS.select_list(selected, prefix="t.")} FROM Task t
+        INNER JOIN Projects p ON t.ProjectId = p.ProjectId
+        WHERE p.ProjectManager = %s AND t.IsActive = 1
+    """
+    return await conditional(request, ("Task", "Projects"), None,
+                             lambda: _task_list(query, (manager_id,), selected))
+
 ### Paginated and Filtered Task Listing
-@router.post("/tasks/paginated/filter", response_model=Dict[str, Any])
-def get_filtered_paginated_tasks(pagination: TaskPaginationRequest, db: pymssql.Connection = Depends(get_connection)):
+def _filtered_paginated_tasks(db: pymssql.Connection, pagination: TaskPaginationRequest) -> Dict[str, Any]:
     try:
         page = pagination.page
         PageLimit = pagination.PageLimit
@@ -345,15 +457,9 @@ def get_filtered_paginated_tasks(pagination: TaskPaginationRequest, db: pymssql.
         task_name = pagination.TaskName or ""
         manager_id = pagination.ManagerId
 
-        # Base query for counting
-        count_query_base = """
-            SELECT COUNT(*) FROM Task t
-            INNER JOIN Projects p ON t.ProjectId = p.ProjectId
-            WHERE t.IsActive = 1
-        """
-        # Base query for fetching data
-        fetch_query_base = """
-            SELECT t.* FROM Task t
+        # FROM/WHERE shared by the page and its total
+        from_clause = """
+            FROM Task t
             INNER JOIN Projects p ON t.ProjectId = p.ProjectId
             WHERE t.IsActive = 1
         """
@@ -361,6 +467,9 @@ def get_filtered_paginated_tasks(pagination: TaskPaginationRequest, db: pymssql.
         filters = []
         params = []
 
+        if pagination.CompanyId is not None:
+            filters.append("t.CompanyId = %s") # tenant filter first, served by IX_Task_Company_Active_Deadline
+            params.append(pagination.CompanyId)
         if project_name:
             filters.append("p.Name LIKE %s") # pymssql LIKE placeholder
             params.append(f"%{project_name}%")
@@ -377,76 +486,66 @@ def get_filtered_paginated_tasks(pagination: TaskPaginationRequest, db: pymssql.
             filters.append("p.ProjectManager = %s") # pymssql placeholder
             params.append(manager_id)
 
-        where_clause = ""
         if filters:
-            where_clause = " AND " + " AND ".join(filters)
-
-        with db.cursor(as_dict=True) as cursor: # Create cursor with as_dict=True
-            # Execute count query
-            cursor.execute(count_query_base + where_clause, tuple(params)) # Pass parameters as a tuple
-            total_count_result = cursor.fetchone()
-            total_count = total_count_result[''] if total_count_result else 0 # COUNT(*) result is often an empty string key in dicts
-
-            if total_count == 0:
-                return {
-                    "data": [],
-                    "total": 0,
-                    "page": page,
-                    "PageLimit": PageLimit,
-                    "total_pages": 0
-                }
-
-            # Execute fetch query
-            fetch_query = fetch_query_base + where_clause
-            # SQL Server OFFSET/FETCH NEXT syntax remains the same
-            fetch_query += " ORDER BY t.Deadline ASC OFFSET %s ROWS FETCH NEXT %s ROWS ONLY"
-            
-            # Combine all parameters for the fetch query into one tuple
-            final_params = tuple(params) + (offset, PageLimit)
-            
-            cursor.execute(fetch_query, final_params)
-            rows = cursor.fetchall() # Returns list of dicts
-
-        data = []
-        for row in rows:
-            task_out_item = TaskOut(
-                TaskId=row['TaskId'],
-                Name=row['Name'],
-                ProjectId=row['ProjectId'],
-                AssignedTo=row['AssignedTo'],
-                DocumentPath=row['DocumentPath'],
-                DocumentUrl=row['DocumentUrl'],
-                Deadline=row['Deadline'],
-                Priority=row['Priority'],
-                Status=row['Status'],
-                CreatedOn=row['CreatedOn'],
-                CreatedBy=row['CreatedBy'],
-                UpdatedOn=row['UpdatedOn'],
-                UpdatedBy=row['UpdatedBy'],
-                DeletedOn=row['DeletedOn'],
-                DeletedBy=row['DeletedBy'],
-                CompanyId=row['CompanyId'],
-                Description=row['Description'],
-                DocumentName=row['DocumentName'],
-                ExptedHours=row['ExptedHours'],
-                IsActive=bool(row['IsActive'])
+            from_clause += " AND " + " AND ".join(filters)
+
+        seek_clause = ""
+        seek_params = []
+        if pagination.cursor:
+            # SQL Server sorts NULL Deadlines first in ASC order
+            last_deadline, last_task_id = decode_cursor(pagination.cursor, "tasks", 2)
+            if last_deadline is None:
+                seek_clause = " AND ((t.Deadline IS NULL AND t.TaskId > %s) OR t.Deadline IS NOT NULL)"
+                seek_params = [last_task_id]
+            else:
+                seek_clause = " AND (t.Deadline > %s OR (t.Deadline = %s AND t.TaskId > %s))"
+                seek_params = [last_deadline, last_deadline, last_task_id]
+            offset = 0
+
+        # Deadline and TaskId are the keyset, so they are selected even in a sparse field set
+        selected = TASK_COLUMNS.parse_fields(pagination.fields, required=("Deadline",))
+        with db.cursor() as cursor:
+            rows, total_count, columns = fetch_page(
+                cursor, "tasks", TASK_COLUMNS.select_list(selected, prefix="t."), from_clause, params,
+                "t.Deadline ASC, t.TaskId ASC", offset, PageLimit, seek_clause, seek_params,
+                pagination.include_total, pagination.estimate_total
             )
-            data.append(task_out_item.dict())
+
+        to_task = TASK_COLUMNS.record_mapper(selected)
+        data = [to_task(row) for row in rows]
+        deadline_at, task_id_at = columns.index("Deadline"), columns.index("TaskId")
 
         return {
             "data": data,
             "total": total_count,
             "page": page,
             "PageLimit": PageLimit,
-            "total_pages": (total_count + PageLimit - 1) // PageLimit
+            "total_pages": total_pages(total_count, PageLimit),
+            "next_cursor": next_cursor("tasks", [rows[-1][deadline_at], rows[-1][task_id_at]] if rows else None,
+                                       len(rows), PageLimit)
         }
 
+    except HTTPException:
+        raise
     except pymssql.Error as e: # Catch specific pymssql errors
         # Include more detail in the error message for debugging SQL errors
-        # Note: fetch_query and final_params might not be defined if error occurs early
+        # Note: from_clause and params might not be defined if error occurs early
         error_detail = f"Database error: {str(e)}"
-        if 'fetch_query' in locals() and 'final_params' in locals():
-             error_detail += f". Query might be: {fetch_query} with parameters: {final_params}"
+        if 'from_clause' in locals() and 'params' in locals():
+             error_detail += f". Query might be: {from_clause} with parameters: {params}"
         raise HTTPException(status_code=500, detail=error_detail)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+async def _paginated_task_response(request: Request, pagination: TaskPaginationRequest):
+    async def build():
+        return FastJSONResponse(await run_db(_filtered_paginated_tasks, pagination))
+    return await conditional(request, ("Task", "Projects"), pagination.CompanyId, build, pagination.model_dump_json())
+
+@router.post("/tasks/paginated/filter", response_model=Dict[str, Any])
+async def get_filtered_paginated_tasks(request: Request, pagination: TaskPaginationRequest):
+    return await _paginated_task_response(request, pagination)
+
+@router.post("/companies/{company_id}/tasks/paginated", response_model=Dict[str, Any])
+async def get_company_paginated_tasks(request: Request, company_id: int, pagination: TaskPaginationRequest):
+    return await _paginated_task_response(request, pagination.model_copy(update={"CompanyId": company_id}))
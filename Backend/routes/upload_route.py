@@ -0,0 +1,221 @@
+import hashlib
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from blob_store import blob_store
+from blob_streaming import UPLOAD_CHUNK_SIZE, file_chunks, store_stream, sync_close, too_large, write_chunk
+from tables.auth import Principal, get_optional_user
+from tables.upload import UploadSessionCreate
+
+router = APIRouter()
+
+# Legacy uploads (stored by filename) are still served from here; new ones go to the blob store
+UPLOAD_DIR = "uploads"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+LEGACY_IMAGE_DIR = "uploaded_images"
+os.makedirs(LEGACY_IMAGE_DIR, exist_ok=True)
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(500 * 1024 * 1024)))
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+
+
+def _tenant_limits(raw: str) -> Dict[int, int]:
+    # UPLOAD_TENANT_LIMITS="7:1073741824,12:104857600" -> {company_id: max bytes}
+    limits = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        company_id, _, max_bytes = item.partition(":")
+        limits[int(company_id)] = int(max_bytes)
+    return limits
+
+
+TENANT_LIMITS = _tenant_limits(os.getenv("UPLOAD_TENANT_LIMITS", ""))
+
+
+def upload_limit(principal: Optional[Principal]) -> int:
+    if principal is not None and principal.company_id in TENANT_LIMITS:
+        return TENANT_LIMITS[principal.company_id]
+    return UPLOAD_MAX_BYTES
+
+
+def _safe_name(filename: Optional[str]) -> str:
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if not name or name.startswith("."):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    return name
+
+
+def _truncate_close(fh, size: int):
+    if not fh.closed:
+        fh.truncate(size)
+        fh.close()
+
+
+def _create_empty(path: str):
+    open(path, "wb").close()
+
+
+def _uploaded(filename: str, blob) -> dict:
+    return {"filename": filename, "url": blob.url, "size": blob.size, "sha256": blob.digest}
+
+
+@router.post("/upload")
+async def upload_file(file: UploadFile = File(...), principal: Optional[Principal] = Depends(get_optional_user)):
+    """Single-request upload. Large task documents should use the resumable /uploads/sessions flow."""
+    limit = upload_limit(principal)
+    if file.size is not None and file.size > limit:
+        raise too_large(limit)
+
+    filename = _safe_name(file.filename)
+    blob = await store_stream(file_chunks(file), limit, file.content_type)
+    return _uploaded(filename, blob)
+
+
+# ---------------------------
+# RESUMABLE UPLOADS
+# ---------------------------
+# POST /uploads/sessions declares the file, then the client PUTs raw bytes at ?offset=N.
+# Every chunk written advances the offset, so after a dropped connection the client asks
+# GET /uploads/sessions/{id} where to resume. The SHA-256 is computed as bytes arrive.
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    filename: str
+    size: int
+    content_type: Optional[str]
+    company_id: Optional[int]
+    path: str
+    offset: int = 0
+    expires_at: float = 0.0
+    hasher: object = field(default_factory=hashlib.sha256)
+    busy: bool = False
+
+
+# Process-local: sessions are only touched from the event loop, so no lock is needed
+_sessions: Dict[str, UploadSession] = {}
+
+
+def _sweep_sessions(now: float):
+    for upload_id in [s.upload_id for s in _sessions.values() if s.expires_at <= now and not s.busy]:
+        session = _sessions.pop(upload_id)
+        if os.path.exists(session.path):
+            os.remove(session.path)
+
+
+def _get_session(upload_id: str, principal: Optional[Principal]) -> UploadSession:
+    session = _sessions.get(upload_id)
+    if session is None or session.expires_at <= time.time():
+        raise HTTPException(status_code=404, detail=f"Upload session {upload_id} not found or expired.")
+    if session.company_id is not None and (principal is None or principal.company_id != session.company_id):
+        raise HTTPException(status_code=404, detail=f"Upload session {upload_id} not found or expired.")
+    return session
+
+
+def _session_state(session: UploadSession) -> dict:
+    return {"upload_id": session.upload_id, "filename": session.filename, "size": session.size,
+            "offset": session.offset, "chunk_size": UPLOAD_CHUNK_SIZE}
+
+
+@router.post("/uploads/sessions", status_code=201)
+async def create_upload_session(body: UploadSessionCreate,
+                                principal: Optional[Principal] = Depends(get_optional_user)):
+    limit = upload_limit(principal)
+    if body.size > limit:
+        raise too_large(limit)
+
+    if body.sha256:
+        # Content the store already has completes without sending a byte
+        blob = await run_in_threadpool(blob_store.touch, body.sha256.lower())
+        if blob is not None and blob.size == body.size:
+            return {**_uploaded(_safe_name(body.filename), blob), "complete": True}
+
+    now = time.time()
+    _sweep_sessions(now)
+    upload_id = uuid.uuid4().hex
+    session = UploadSession(
+        upload_id=upload_id,
+        filename=_safe_name(body.filename),
+        size=body.size,
+        content_type=body.content_type,
+        company_id=principal.company_id if principal else None,
+        path=blob_store.temp_path(),
+        expires_at=now + UPLOAD_SESSION_TTL,
+    )
+    await run_in_threadpool(_create_empty, session.path)
+    _sessions[upload_id] = session
+    return _session_state(session)
+
+
+@router.get("/uploads/sessions/{upload_id}")
+async def get_upload_session(upload_id: str, principal: Optional[Principal] = Depends(get_optional_user)):
+    return _session_state(_get_session(upload_id, principal))
+
+
+@router.put("/uploads/sessions/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0),
+                       principal: Optional[Principal] = Depends(get_optional_user)):
+    """Append the raw request body at `offset`, streaming it to disk chunk by chunk."""
+    session = _get_session(upload_id, principal)
+    if session.busy:
+        raise HTTPException(status_code=409, detail="Another chunk is being written to this upload.")
+    if offset != session.offset:
+        raise HTTPException(status_code=409, detail={"message": "Offset mismatch; resume from offset",
+                                                     "offset": session.offset})
+
+    session.busy = True
+    try:
+        await _append_body(session, request)
+    finally:
+        session.busy = False
+
+    if session.offset < session.size:
+        session.expires_at = time.time() + UPLOAD_SESSION_TTL
+        return {**_session_state(session), "complete": False}
+
+    _sessions.pop(upload_id, None)
+    blob = await run_in_threadpool(blob_store.ingest, session.path, session.hasher.hexdigest(),
+                                   session.size, session.content_type)
+    return {**_uploaded(session.filename, blob), "complete": True}
+
+
+async def _append_body(session: UploadSession, request: Request):
+    fh = await run_in_threadpool(open, session.path, "r+b")
+    try:
+        await run_in_threadpool(fh.seek, session.offset)
+        buffer = bytearray()
+        async for data in request.stream():
+            buffer += data
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                await _append_chunk(session, fh, buffer)
+                buffer = bytearray()
+        if buffer:
+            await _append_chunk(session, fh, buffer)
+        await run_in_threadpool(sync_close, fh)
+    except BaseException:
+        # Bytes already on disk (and hashed) still count; the client resumes from session.offset
+        await run_in_threadpool(_truncate_close, fh, session.offset)
+        raise
+
+
+async def _append_chunk(session: UploadSession, fh, chunk: bytearray):
+    if session.offset + len(chunk) > session.size:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds its declared size of {session.size} bytes")
+    await run_in_threadpool(write_chunk, fh, session.hasher, chunk)
+    session.offset += len(chunk)
+
+
+@router.delete("/uploads/sessions/{upload_id}")
+async def abort_upload_session(upload_id: str, principal: Optional[Principal] = Depends(get_optional_user)):
+    session = _get_session(upload_id, principal)
+    if session.busy:
+        raise HTTPException(status_code=409, detail="Another chunk is being written to this upload.")
+    _sessions.pop(upload_id, None)
+    if os.path.exists(session.path):
+        await run_in_threadpool(os.remove, session.path)
+    return {"message": f"Upload {upload_id} aborted."}
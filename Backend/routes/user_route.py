@@ -1,31 +1,39 @@
-from typing import Any, Dict, List
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
 import pymssql # Changed from pyodbc
 from tables.users import User, UserCreate, UserUpdate, UserPaginationRequest
 from db_connection import get_connection
+from reference_cache import reference_cache, require_references
+from db_async import run_db
+from exports import ExportFormat, stream_export
+from tenancy import company_scoped
+from row_mapping import USER_FIELDS
+from fast_json import FastJSONResponse
+from pagination import decode_cursor, fetch_page, next_cursor, total_pages
 from datetime import datetime
-from tables.auth import get_current_user # Assuming this handles authentication and provides user role
+from tables.auth import Principal, get_current_user
+from passwords import hash_password, hashing
+from sessions import revoke_user_sessions
 
 router = APIRouter()
 
-# Helper to validate if a user_id exists in Employee table
-def check_user_exists(user_id: int, cursor: pymssql.Cursor) -> bool: # Changed type hint
-    cursor.execute("SELECT EmpId FROM TaskManager.dbo.Employee WHERE EmpId = %s", (user_id,)) # Changed ? to %s
-    return cursor.fetchone() is not None
+# Reference checks - resolved together (and cached) by require_references()
+def active_role_check(role_id: Optional[int], detail: str):
+    return ("active_role", role_id, 400, detail)
 
 # ✅ Create a new user with user existence validation and authorization
 # Merged logic from both original create_user functions
 @router.post("/users", response_model=User)
 def create_user(user: UserCreate, db: pymssql.Connection = Depends(get_connection), # Changed type hint
-                current_user: Dict[str, Any] = Depends(get_current_user)): # Added auth dependency
+                current_user: Principal = Depends(get_current_user)): # Added auth dependency
     # Authorization check
-    # if current_user["role_id"] != 1: # Assuming 'role_id' is in current_user payload
-    #     raise HTTPException(status_code=403, detail="Not authorized to create users.")
-    # Based on the original code, `current_user["role"]` was used. Adjust as per actual auth payload.
     # Assuming role 1 is 'Admin' based on prior examples.
-    if current_user["role"] not in [1]:
+    if current_user.role not in [1]:
         raise HTTPException(status_code=403, detail="Not authorized to create users. Only administrators can perform this action.")
 
+    # Only the salted scrypt hash is stored
+    password_hash = hashing.run_sync(hash_password, user.password)
+
     try:
         with db.cursor() as cursor:
             # Check if email exists
@@ -33,27 +41,19 @@ def create_user(user: UserCreate, db: pymssql.Connection = Depends(get_connectio
             if cursor.fetchone()[0] > 0:
                 raise HTTPException(status_code=400, detail="Email already exists.")
 
-            # Check if created_by user exists (in Employee table)
-            if not check_user_exists(user.created_by, cursor):
-                raise HTTPException(status_code=400, detail=f"CreatedBy user ID {user.created_by} not found in Employee records.")
-
-            # Check if RoleId exists and is active
-            cursor.execute("SELECT 1 FROM TaskManager.dbo.Role WHERE RoleId = %s AND IsActive = 1", (user.role_id,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=400, detail=f"Role ID {user.role_id} not found or inactive.")
-
-            # Check if CompanyId exists
-            cursor.execute("SELECT 1 FROM TaskManager.dbo.Company WHERE CompanyId = %s", (user.company_id,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=400, detail=f"Company ID {user.company_id} not found.")
-
+            # CreatedBy must be an Employee, the role active and the company present
+            require_references(cursor, [
+                ("employee", user.created_by, 400, f"CreatedBy user ID {user.created_by} not found in Employee records."),
+                active_role_check(user.role_id, f"Role ID {user.role_id} not found or inactive."),
+                ("company", user.company_id, 400, f"Company ID {user.company_id} not found."),
+            ])
 
             cursor.execute(
                 "INSERT INTO TaskManager.dbo.Users "
                 "(Email, Password, IsActive, CreatedBy, RoleId, CompanyId) "
                 "OUTPUT INSERTED.UserId, INSERTED.CreatedOn, INSERTED.CreatedBy " # These are the columns returned by OUTPUT
                 "VALUES (%s, %s, %s, %s, %s, %s)", # Changed ? to %s
-                (user.email, user.password, int(user.is_active), user.created_by, user.role_id, user.company_id)
+                (user.email, password_hash, int(user.is_active), user.created_by, user.role_id, user.company_id)
             )
             inserted_row_data = cursor.fetchone()
             db.commit()
@@ -73,7 +73,6 @@ def create_user(user: UserCreate, db: pymssql.Connection = Depends(get_connectio
     return User(
         user_id=inserted_row_data[0],
         email=user.email, # From input model
-        password=user.password, # From input model
         is_active=user.is_active, # From input model
         role_id=user.role_id, # From input model
         company_id=user.company_id, # From input model
@@ -85,61 +84,59 @@ def create_user(user: UserCreate, db: pymssql.Connection = Depends(get_connectio
         deleted_by=None # Not set on creation
     )
 
-@router.get("/allusers", response_model=List[User])
-def get_users(db: pymssql.Connection = Depends(get_connection)): # Changed type hint
+# Rows start with USER_FIELDS.columns, in that order
+_ALL_USERS_QUERY = """
+    SELECT
+        u.UserId,
+        u.Email,
+        u.IsActive,
+        u.RoleId,
+        u.CompanyId,
+        u.CreatedOn,
+        u.CreatedBy,
+        u.UpdatedOn,
+        u.UpdatedBy,
+        u.DeletedOn,
+        u.DeletedBy,
+        -- Joining on Users table itself for CreatedBy, UpdatedBy, DeletedBy emails
+        c.Email AS CreatedByEmail,
+        up.Email AS UpdatedByEmail,
+        d.Email AS DeletedByEmail
+    FROM TaskManager.dbo.Users u
+    LEFT JOIN TaskManager.dbo.Users c ON u.CreatedBy = c.UserId
+    LEFT JOIN TaskManager.dbo.Users up ON u.UpdatedBy = up.UserId
+    LEFT JOIN TaskManager.dbo.Users d ON u.DeletedBy = d.UserId
+    WHERE u.IsActive = 1{company_filter}
+    ORDER BY u.UserId DESC; -- Added ORDER BY for consistent results
+"""
+
+_user_record = USER_FIELDS.record_mapper()
+
+def _list_users(db: pymssql.Connection, query: str, params: tuple) -> List[Dict[str, Any]]:
     try:
         with db.cursor() as cursor:
-            query = """
-            SELECT
-                u.UserId,
-                u.Email,
-                u.Password,
-                u.IsActive,
-                u.RoleId,
-                u.CompanyId,
-                u.CreatedOn,
-                u.CreatedBy,
-                u.UpdatedOn,
-                u.UpdatedBy,
-                u.DeletedOn,
-                u.DeletedBy,
-                -- Joining on Users table itself for CreatedBy, UpdatedBy, DeletedBy emails
-                c.Email AS CreatedByEmail,
-                up.Email AS UpdatedByEmail,
-                d.Email AS DeletedByEmail
-            FROM TaskManager.dbo.Users u
-            LEFT JOIN TaskManager.dbo.Users c ON u.CreatedBy = c.UserId
-            LEFT JOIN TaskManager.dbo.Users up ON u.UpdatedBy = up.UserId
-            LEFT JOIN TaskManager.dbo.Users d ON u.DeletedBy = d.UserId
-            WHERE u.IsActive = 1
-            ORDER BY u.UserId DESC; -- Added ORDER BY for consistent results
-            """
-            cursor.execute(query)
+            cursor.execute(query, params)
             rows = cursor.fetchall()
-            columns = [col[0] for col in cursor.description] # Get column names
-
-        return [
-            User(
-                user_id=row[columns.index('UserId')],
-                email=row[columns.index('Email')],
-                password=row[columns.index('Password')],
-                is_active=bool(row[columns.index('IsActive')]),
-                role_id=row[columns.index('RoleId')],
-                company_id=row[columns.index('CompanyId')],
-                created_on=row[columns.index('CreatedOn')].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[columns.index('CreatedOn')], datetime) else None,
-                created_by=row[columns.index('CreatedBy')],
-                updated_on=row[columns.index('UpdatedOn')].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[columns.index('UpdatedOn')], datetime) else None,
-                updated_by=row[columns.index('UpdatedBy')],
-                deleted_on=row[columns.index('DeletedOn')].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[columns.index('DeletedOn')], datetime) else None,
-                deleted_by=row[columns.index('DeletedBy')]
-            )
-            for row in rows
-        ]
+
+        return [_user_record(row) for row in rows]
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+async def _all_users(company_id: Optional[int], format: str):
+    query, params = company_scoped(_ALL_USERS_QUERY, "u.CompanyId", company_id)
+    if format != "json":
+        return stream_export(query, params, _user_record, format, "users")
+    return FastJSONResponse(await run_db(_list_users, query, params))
+
+@router.get("/allusers", response_model=List[User])
+async def get_users(format: ExportFormat = Query("json")):
+    return await _all_users(None, format)
+
+@router.get("/companies/{company_id}/users", response_model=List[User])
+async def get_company_users(company_id: int, format: ExportFormat = Query("json")):
+    return await _all_users(company_id, format)
 
 @router.put("/users/{user_id}")
 def update_user(user_id: int, user: UserUpdate, db: pymssql.Connection = Depends(get_connection)): # Changed type hint
@@ -155,18 +152,16 @@ def update_user(user_id: int, user: UserUpdate, db: pymssql.Connection = Depends
                 raise HTTPException(status_code=400, detail=f"User with ID {user_id} is inactive and cannot be updated.")
 
             update_data = user.model_dump(exclude_unset=True)
+            if update_data.get("password") is not None:
+                update_data["password"] = hashing.run_sync(hash_password, update_data["password"])
 
-            # Validate updated_by user if provided
-            if "updated_by" in update_data:
-                cursor.execute("SELECT 1 FROM TaskManager.dbo.Users WHERE UserId = %s AND IsActive = 1", (update_data["updated_by"],)) # Changed ? to %s
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=400, detail=f"UpdatedBy user ID {update_data['updated_by']} not found or inactive.")
-
-            # Validate role_id if provided (must be active)
-            if "role_id" in update_data:
-                cursor.execute("SELECT 1 FROM TaskManager.dbo.Role WHERE RoleId = %s AND IsActive = 1", (update_data["role_id"],)) # Changed ? to %s
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=400, detail=f"Role with ID {update_data['role_id']} not found or inactive.")
+            # Validate updated_by user and role_id if provided (both must be active)
+            require_references(cursor, [
+                ("active_user", update_data.get("updated_by"), 400,
+                 f"UpdatedBy user ID {update_data.get('updated_by')} not found or inactive."),
+                active_role_check(update_data.get("role_id"),
+                                  f"Role with ID {update_data.get('role_id')} not found or inactive."),
+            ])
 
             field_mapping = {
                 "email": "Email",
@@ -198,6 +193,11 @@ def update_user(user_id: int, user: UserUpdate, db: pymssql.Connection = Depends
 
             cursor.execute(query, tuple(values_to_update)) # Ensure values are passed as a tuple
             db.commit()
+            if "is_active" in update_data:
+                reference_cache.invalidate("Users", user_id)
+            # Sessions renew from a snapshot of role/company, so end them when those (or the password) change
+            if update_data.keys() & {"password", "role_id", "company_id", "is_active"}:
+                revoke_user_sessions(user_id)
     except pymssql.Error as e: # Catch pymssql specific errors
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -234,6 +234,9 @@ def delete_employee(emp_id: int, db: pymssql.Connection = Depends(get_connection
             """, (emp_id, emp_id)) # Changed ? to %s
 
             db.commit()
+            reference_cache.invalidate("Employee", emp_id)
+            reference_cache.invalidate("Users", emp_id)
+            revoke_user_sessions(emp_id)
 
     except pymssql.Error as e: # Catch pymssql specific errors
         db.rollback()
@@ -270,74 +273,42 @@ def get_paginated_users(pagination: UserPaginationRequest, db: pymssql.Connectio
 
         where_clause = " AND ".join(filters)
 
+        seek_clause = ""
+        seek_params = []
+        if pagination.cursor:
+            (last_user_id,) = decode_cursor(pagination.cursor, "users", 1)
+            seek_clause = " AND UserId > %s"
+            seek_params = [last_user_id]
+            offset = 0
+
         with db.cursor() as cursor:
-            # Count total filtered users
-            count_query = f"SELECT COUNT(*) FROM TaskManager.dbo.Users WHERE {where_clause}"
-            cursor.execute(count_query, tuple(params)) # Ensure params is a tuple
-            total_count = cursor.fetchone()[0]
-
-            if total_count == 0:
-                return {
-                    "data": [],
-                    "total": 0,
-                    "page": page,
-                    "PageLimit": page_limit,
-                    "total_pages": 0
-                }
-
-            # Fetch paginated filtered users
-            data_query = f"""
-                SELECT
-                    UserId,
-                    Email,
-                    Password,
-                    IsActive,
-                    RoleId,
-                    CompanyId,
-                    CreatedOn,
-                    CreatedBy,
-                    UpdatedOn,
-                    UpdatedBy,
-                    DeletedOn,
-                    DeletedBy
-                FROM TaskManager.dbo.Users
-                WHERE {where_clause}
-                ORDER BY UserId
-                OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
-            """ # Changed ? to %s
-            cursor.execute(data_query, tuple(params + [offset, page_limit])) # Ensure all params are in one tuple
-            rows = cursor.fetchall()
+            rows, total_count, columns = fetch_page(
+                cursor, "users", USER_FIELDS.select_list(),
+                f"FROM TaskManager.dbo.Users WHERE {where_clause}", params, "UserId",
+                offset, page_limit, seek_clause, seek_params,
+                pagination.include_total, pagination.estimate_total
+            )
 
-        # Get column names from cursor description for robust mapping
-        columns = [col[0] for col in cursor.description]
-
-        data = [
-            User(
-                # Use dict(zip(columns, row)) for cleaner mapping to Pydantic model
-                **dict(zip(columns, row))
-            ).dict() # Convert to dict if User is a Pydantic model
-            for row in rows
-        ]
-
-        # Post-process datetime objects for JSON serialization if needed
-        for item in data:
-            if isinstance(item.get("CreatedOn"), datetime):
-                item["CreatedOn"] = item["CreatedOn"].strftime("%Y-%m-%d %H:%M:%S")
-            if isinstance(item.get("UpdatedOn"), datetime):
-                item["UpdatedOn"] = item["UpdatedOn"].strftime("%Y-%m-%d %H:%M:%S")
-            if isinstance(item.get("DeletedOn"), datetime):
-                item["DeletedOn"] = item["DeletedOn"].strftime("%Y-%m-%d %H:%M:%S")
-            item["IsActive"] = bool(item["IsActive"]) # Ensure IsActive is boolean
+        # Same shape as the User rows of /allusers
+        to_user = USER_FIELDS.record_mapper(columns)
+        data = [to_user(row) for row in rows]
 
         return {
             "data": data,
             "total": total_count,
             "page": page,
             "PageLimit": page_limit,
-            "total_pages": (total_count + page_limit - 1) // page_limit
+            "total_pages": total_pages(total_count, page_limit),
+            "next_cursor": next_cursor("users", [rows[-1][0]] if rows else None, len(rows), page_limit)
         }
 
+    except HTTPException:
+        raise
     except pymssql.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@router.post("/companies/{company_id}/users/paginated", response_model=Dict[str, Any])
+def get_company_paginated_users(company_id: int, pagination: UserPaginationRequest, db: pymssql.Connection = Depends(get_connection)):
+    return get_paginated_users(pagination.model_copy(update={"company_id": company_id}), db)
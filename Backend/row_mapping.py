@@ -0,0 +1,216 @@
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from tables.company import Company
+from tables.EmployeeProject import ProjectEmployeeOut
+from tables.employee import EmployeeOut
+from tables.logtime import LogTimeOut
+from tables.project import ProjectOut
+from tables.projectRole import ProjectRoleOut
+from tables.task import TaskOut
+from tables.users import User
+
+
+class ColumnSet:
+    """The columns of one table as exposed by its Out model (DB column names match the model fields).
+
+    Routes build explicit SELECT lists from it (never `SELECT *`) and map the resulting tuple
+    rows with `mapper()` (Out models) or `record_mapper()` (plain dicts for FastJSONResponse),
+    optionally restricted to a client-requested sparse field set.
+    """
+
+    def __init__(self, table: str, model: Type[BaseModel], key: Sequence[str],
+                 converters: Optional[Dict[str, Callable[[Any], Any]]] = None,
+                 columns: Optional[Sequence[str]] = None):
+        self.table = table
+        self.model = model
+        self.columns = list(columns or model.model_fields)   # SELECT order; defaults to model field order
+        self.key = list(key)                      # always selected, so rows stay addressable
+        self.converters = converters or {}
+        self._mappers = {}
+        self._record_mappers = {}
+
+    def parse_fields(self, raw: Optional[str], required: Sequence[str] = ()) -> Optional[Tuple[str, ...]]:
+        """Turn `fields=TaskId,Name,Status` into a column tuple in SELECT order; None means all columns."""
+        if not raw:
+            return None
+        requested = {name.strip() for name in raw.split(",") if name.strip()}
+        unknown = requested - set(self.columns)
+        if unknown:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown field(s) for {self.table}: {', '.join(sorted(unknown))}")
+        requested.update(self.key)
+        requested.update(required)
+        return tuple(c for c in self.columns if c in requested)
+
+    def select_list(self, fields: Optional[Sequence[str]] = None, prefix: str = "") -> str:
+        return ", ".join(f"{prefix}{c}" for c in (fields or self.columns))
+
+    def mapper(self, fields: Optional[Sequence[str]] = None) -> Callable[[Sequence[Any]], Any]:
+        """Tuple row -> Out model (all columns) or plain dict (sparse fields). Built once per field set."""
+        fields = tuple(fields) if fields else None
+        mapper = self._mappers.get(fields)
+        if mapper is None:
+            mapper = self._mappers[fields] = self._build_mapper(fields)
+        return mapper
+
+    def record_mapper(self, fields: Optional[Sequence[str]] = None) -> Callable[[Sequence[Any]], Dict[str, Any]]:
+        """Tuple row -> dict keyed like the Out model would serialize it (model field order for all columns)."""
+        fields = tuple(fields) if fields else None
+        mapper = self._record_mappers.get(fields)
+        if mapper is None:
+            mapper = self._record_mappers[fields] = self._build_record_mapper(fields)
+        return mapper
+
+    def _to_values(self, names: Sequence[str]):
+        converted = [(i, self.converters[name]) for i, name in enumerate(names) if name in self.converters]
+
+        def to_values(row):
+            if not converted:
+                return row
+            values = list(row)
+            for i, convert in converted:
+                values[i] = convert(values[i])
+            return values
+        return to_values
+
+    def _build_mapper(self, fields: Optional[Tuple[str, ...]]):
+        names = fields or tuple(self.columns)
+        to_values = self._to_values(names)
+        construct = self.model.model_construct
+
+        if fields is None:
+            # Every column comes straight from the table, so skip re-validation
+            return lambda row: construct(**dict(zip(names, to_values(row))))
+        return lambda row: dict(zip(names, to_values(row)))
+
+    def _build_record_mapper(self, fields: Optional[Tuple[str, ...]]):
+        if fields is not None:
+            return self._build_mapper(fields)
+        # Rows arrive in SELECT order; emit keys in model field order, as the model would
+        names = tuple(self.columns)
+        to_values = self._to_values(names)
+        keys = tuple(name for name in self.model.model_fields if name in names)
+        reorder = itemgetter(*(names.index(name) for name in keys))
+        return lambda row: dict(zip(keys, reorder(to_values(row))))
+
+
+class FieldMap:
+    """Out models whose field names differ from the DB columns (users, employees, companies).
+
+    `fields` maps each model field to its column. Rows become the dict `model_dump()` would
+    give, for FastJSONResponse and exports, through a mapper compiled once per SELECT column
+    list: one itemgetter call plus converters per row, no per-field name lookups or model
+    construction. Fields whose column is not selected keep the model default.
+    """
+
+    def __init__(self, model: Type[BaseModel], fields: Dict[str, str],
+                 converters: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        self.model = model
+        self.fields = dict(fields)               # model field -> column, in SELECT order
+        self.columns = list(self.fields.values())
+        self.converters = converters or {}       # keyed by model field
+        self._record_mappers = {}
+
+    def select_list(self, prefix: str = "") -> str:
+        return ", ".join(f"{prefix}{c}" for c in self.columns)
+
+    def record_mapper(self, columns: Optional[Sequence[str]] = None) -> Callable[[Sequence[Any]], Dict[str, Any]]:
+        """Tuple row laid out as `columns` (default `self.columns`) -> record dict."""
+        columns = tuple(columns or self.columns)
+        mapper = self._record_mappers.get(columns)
+        if mapper is None:
+            mapper = self._record_mappers[columns] = self._build_record_mapper(columns)
+        return mapper
+
+    def _compile(self, columns: Tuple[str, ...]):
+        # Model field order, so records come out keyed like model_dump()
+        position = {column: i for i, column in enumerate(columns)}
+        names = tuple(name for name in self.model.model_fields
+                      if name in self.fields and self.fields[name] in position)
+        indexes = [position[self.fields[name]] for name in names]
+        getter = itemgetter(*indexes) if len(indexes) > 1 else (lambda row: (row[indexes[0]],))
+        converted = [(i, self.converters[name]) for i, name in enumerate(names) if name in self.converters]
+
+        def to_values(row):
+            values = getter(row)
+            if not converted:
+                return values
+            values = list(values)
+            for i, convert in converted:
+                values[i] = convert(values[i])
+            return values
+        return names, to_values
+
+    def _build_record_mapper(self, columns: Tuple[str, ...]):
+        names, to_values = self._compile(columns)
+        if len(names) == len(self.model.model_fields):
+            return lambda row: dict(zip(names, to_values(row)))
+        defaults = {name: field.get_default(call_default_factory=True)
+                    for name, field in self.model.model_fields.items()}
+
+        def to_record(row):
+            record = defaults.copy()
+            record.update(zip(names, to_values(row)))
+            return record
+        return to_record
+
+
+def _bit(value):
+    return None if value is None else bool(value)
+
+
+def _flag(value):
+    # int-typed IsActive fields have always been filled with bool(IsActive), i.e. 1 or 0
+    return 1 if value else 0
+
+
+def timestamp_text(value):
+    """datetime -> "YYYY-MM-DD HH:MM:SS", the format of the str-typed *_on fields (None otherwise)."""
+    return value.isoformat(" ", "seconds") if isinstance(value, datetime) else None
+
+
+TASK_COLUMNS = ColumnSet("Task", TaskOut, key=["TaskId"], converters={"IsActive": _bit})
+PROJECT_COLUMNS = ColumnSet("Projects", ProjectOut, key=["ProjectId"], converters={"IsActive": _bit}, columns=[
+    "ProjectId", "Name", "StartDate", "EndDate", "ProjectManager", "Priority", "Status", "CreatedOn", "CreatedBy",
+    "UpdatedOn", "UpdatedBy", "IsActive", "DeletedOn", "DeletedBy", "CompanyId", "Description",
+])
+LOGTIME_COLUMNS = ColumnSet("LogTime", LogTimeOut, key=["LogId"], converters={"IsActive": _bit}, columns=[
+    "LogId", "EmpId", "TaskId", "Date", "CreatedOn", "CreatedBy", "UpdatedOn", "UpdatedBy", "IsActive",
+    "DeletedOn", "DeletedBy", "CompanyId", "Description", "MinutesSpent", "HoursSpent",
+])
+PROJECT_EMPLOYEE_COLUMNS = ColumnSet("ProjectEmployee", ProjectEmployeeOut, key=["ProjectEmployeeId"],
+                                     converters={"IsActive": _bit})
+PROJECT_ROLE_COLUMNS = ColumnSet("ProjectRole", ProjectRoleOut, key=["ProjectRoleId"], converters={"IsActive": _bit})
+
+USER_FIELDS = FieldMap(User, {
+    "user_id": "UserId", "email": "Email", "is_active": "IsActive", "role_id": "RoleId",
+    "company_id": "CompanyId", "created_on": "CreatedOn", "created_by": "CreatedBy", "updated_on": "UpdatedOn",
+    "updated_by": "UpdatedBy", "deleted_on": "DeletedOn", "deleted_by": "DeletedBy",
+}, converters={"is_active": _flag, "created_on": timestamp_text, "updated_on": timestamp_text,
+               "deleted_on": timestamp_text})
+EMPLOYEE_FIELDS = FieldMap(EmployeeOut, {
+    "emp_id": "EmpId", "name": "Name", "role_id": "RoleID", "phone": "Phone", "address": "Address",
+    "email": "Email", "description": "Description", "company_id": "CompanyId", "created_by": "CreatedBy",
+    "updated_by": "UpdatedBy", "is_active": "IsActive", "ImageUrl": "ImgUrl", "EmployeeImage": "EmployeeImg",
+    "ImagePath": "ImgPath",
+}, converters={"is_active": bool})
+COMPANY_FIELDS = FieldMap(Company, {
+    "company_id": "CompanyId", "name": "Name", "is_active": "IsActive", "company_description": "CompanyDescription",
+    "company_logo_name": "CompanyLogoName", "company_logo_url": "CompanyLogoUrl",
+    "company_logo_path": "CompanyLogoPath", "contact_no": "ContactNo", "email": "Email", "address": "Address",
+    "created_on": "CreatedOn", "created_by": "CreatedBy", "updated_on": "UpdatedOn", "updated_by": "UpdatedBy",
+    "deleted_on": "DeletedOn", "deleted_by": "DeletedBy",
+}, converters={"is_active": _flag, "created_on": timestamp_text, "updated_on": timestamp_text,
+               "deleted_on": timestamp_text})
+
+COLUMN_SETS = {
+    "task": TASK_COLUMNS,
+    "project": PROJECT_COLUMNS,
+    "logtime": LOGTIME_COLUMNS,
+    "project_employee": PROJECT_EMPLOYEE_COLUMNS,
+}
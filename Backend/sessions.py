@@ -0,0 +1,225 @@
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Set, Tuple
+
+REFRESH_TOKEN_TTL = float(os.getenv("REFRESH_TOKEN_TTL", str(14 * 24 * 3600)))
+
+
+class RefreshError(Exception):
+    """Raised for an unknown, expired, revoked or replayed refresh token."""
+
+
+@dataclass(frozen=True)
+class Session:
+    """One signed-in device. Holds what renewal needs so it never reads the Users table."""
+    session_id: str
+    user_id: int
+    role: int
+    company_id: Optional[int]
+    email: Optional[str]
+    refresh_hash: bytes   # SHA-256 of the current refresh secret; the secret itself is never stored
+    expires_at: float
+
+
+# ---------------------------
+# BACKENDS
+# ---------------------------
+class MemorySessionStore:
+    """Process-local sessions; lost on restart and not shared between workers."""
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self._sessions: Dict[str, Session] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            ids = self._by_user.get(session.user_id)
+            if ids is not None:
+                ids.discard(session_id)
+                if not ids:
+                    del self._by_user[session.user_id]
+
+    def _sweep(self, now: float):
+        # Amortized TTL eviction, piggybacked on writes
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self._sweep_interval
+        for session_id in [s.session_id for s in self._sessions.values() if s.expires_at <= now]:
+            self._drop(session_id)
+
+    def create(self, session: Session):
+        with self._lock:
+            self._sweep(time.time())
+            self._sessions[session.session_id] = session
+            self._by_user.setdefault(session.user_id, set()).add(session.session_id)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session.expires_at <= time.time():
+                self._drop(session_id)
+                return None
+            return session
+
+    def rotate(self, session_id: str, old_hash: bytes, new_hash: bytes, expires_at: float) -> bool:
+        """Swap in the new refresh hash only if the old one is still current."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.refresh_hash != old_hash:
+                return False
+            self._sessions[session_id] = replace(session, refresh_hash=new_hash, expires_at=expires_at)
+            return True
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+
+    def delete_user(self, user_id: int) -> int:
+        with self._lock:
+            ids = list(self._by_user.get(user_id, ()))
+            for session_id in ids:
+                self._drop(session_id)
+            return len(ids)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "users": len(self._by_user)}
+
+
+class SqliteSessionStore:
+    """Sessions in a local SQLite file: survive restarts and are shared by workers on one host."""
+
+    def __init__(self, path: str, sweep_interval: float = 60.0):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS Sessions (
+                    SessionId TEXT PRIMARY KEY, UserId INTEGER NOT NULL, Role INTEGER NOT NULL,
+                    CompanyId INTEGER, Email TEXT, RefreshHash BLOB NOT NULL, ExpiresAt REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS IX_Sessions_UserId ON Sessions (UserId)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS IX_Sessions_ExpiresAt ON Sessions (ExpiresAt)")
+
+    def _sweep(self, now: float):
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self._sweep_interval
+        self._conn.execute("DELETE FROM Sessions WHERE ExpiresAt <= ?", (now,))
+
+    def create(self, session: Session):
+        with self._lock:
+            self._sweep(time.time())
+            self._conn.execute(
+                "INSERT INTO Sessions (SessionId, UserId, Role, CompanyId, Email, RefreshHash, ExpiresAt) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session.session_id, session.user_id, session.role, session.company_id, session.email,
+                 session.refresh_hash, session.expires_at))
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT SessionId, UserId, Role, CompanyId, Email, RefreshHash, ExpiresAt "
+                "FROM Sessions WHERE SessionId = ? AND ExpiresAt > ?", (session_id, time.time())).fetchone()
+        return Session(*row) if row else None
+
+    def rotate(self, session_id: str, old_hash: bytes, new_hash: bytes, expires_at: float) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE Sessions SET RefreshHash = ?, ExpiresAt = ? WHERE SessionId = ? AND RefreshHash = ?",
+                (new_hash, expires_at, session_id, old_hash))
+            return cursor.rowcount == 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM Sessions WHERE SessionId = ?", (session_id,))
+
+    def delete_user(self, user_id: int) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM Sessions WHERE UserId = ?", (user_id,)).rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM Sessions").fetchone()[0]
+        return {"backend": "sqlite", "sessions": count}
+
+
+def _make_store():
+    backend = os.getenv("SESSION_STORE", "memory")
+    if backend == "sqlite":
+        return SqliteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.db"))
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_STORE {backend!r}; expected 'memory' or 'sqlite'")
+    return MemorySessionStore()
+
+
+session_store = _make_store()
+
+
+# ---------------------------
+# REFRESH TOKENS
+# ---------------------------
+# A refresh token is "<session id>.<secret>". Every renewal replaces the secret (rotation);
+# presenting an already-rotated secret means the token leaked, so the session is revoked.
+
+def _digest(secret: str) -> bytes:
+    return hashlib.sha256(secret.encode()).digest()
+
+
+def _split(refresh_token: str) -> Tuple[str, str]:
+    session_id, _, secret = (refresh_token or "").partition(".")
+    if not session_id or not secret:
+        raise RefreshError("Invalid refresh token")
+    return session_id, secret
+
+
+def start_session(user_id: int, role: int, company_id: Optional[int], email: Optional[str]) -> str:
+    """Open a session at login and return its first refresh token."""
+    session_id, secret = secrets.token_urlsafe(16), secrets.token_urlsafe(32)
+    session_store.create(Session(session_id, user_id, role, company_id, email, _digest(secret),
+                                 time.time() + REFRESH_TOKEN_TTL))
+    return f"{session_id}.{secret}"
+
+
+def rotate_session(refresh_token: str) -> Tuple[Session, str]:
+    """Validate a refresh token and swap it for a new one; returns (session, new refresh token)."""
+    session_id, secret = _split(refresh_token)
+    session = session_store.get(session_id)
+    if session is None:
+        raise RefreshError("Refresh token expired or revoked")
+    if not hmac.compare_digest(session.refresh_hash, _digest(secret)):
+        session_store.delete(session_id)
+        raise RefreshError("Refresh token was already used; session revoked")
+
+    new_secret = secrets.token_urlsafe(32)
+    if not session_store.rotate(session_id, session.refresh_hash, _digest(new_secret),
+                                time.time() + REFRESH_TOKEN_TTL):
+        # Lost a race with a concurrent renewal of the same token
+        session_store.delete(session_id)
+        raise RefreshError("Refresh token was already used; session revoked")
+    return session, f"{session_id}.{new_secret}"
+
+
+def end_session(refresh_token: str):
+    session_id, secret = _split(refresh_token)
+    session = session_store.get(session_id)
+    if session is not None and hmac.compare_digest(session.refresh_hash, _digest(secret)):
+        session_store.delete(session_id)
+
+
+def revoke_user_sessions(user_id: int) -> int:
+    return session_store.delete_user(user_id)
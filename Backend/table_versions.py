@@ -0,0 +1,75 @@
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Sequence
+
+import pymssql
+from fastapi import Request
+from fastapi.responses import Response
+
+from db_async import run_db
+from http_cache import not_modified
+
+logger = logging.getLogger(__name__)
+
+# Polled listings may be stored by the browser but must be revalidated every time
+REVALIDATE = "private, no-cache"
+# Until migrations/003_table_versions.sql is applied, skip the stamp query for this long
+_RETRY_AFTER = 300.0
+_unavailable_until = 0.0
+
+
+# ---------------------------
+# VERSION STAMPS
+# ---------------------------
+# MAX(RowVer) of each table a response reads (of one company's rows when the listing is
+# company-scoped) is a single index seek, so an unchanged poll costs one tiny query.
+
+def _stamp_query(tables: Sequence[str], company_id: Optional[int]) -> str:
+    # Every versioned table has a CompanyId (Company's is its own key)
+    where = " WHERE CompanyId = %s" if company_id is not None else ""
+    return "SELECT " + ", ".join(f"(SELECT MAX(RowVer) FROM dbo.{table}{where})" for table in tables)
+
+
+def read_versions(db: pymssql.Connection, tables: Sequence[str], company_id: Optional[int] = None) -> Optional[tuple]:
+    """The tables' current version stamps, or None when they cannot be read."""
+    global _unavailable_until
+    if time.time() < _unavailable_until:
+        return None
+    try:
+        with db.cursor() as cursor:
+            cursor.execute(_stamp_query(tables, company_id),
+                           tuple(company_id for _ in tables) if company_id is not None else ())
+            return tuple(cursor.fetchone())
+    except pymssql.Error as e:
+        db.rollback()
+        _unavailable_until = time.time() + _RETRY_AFTER
+        logger.warning("Table version stamps unavailable, conditional GETs disabled for now: %s", e)
+        return None
+
+
+def version_etag(versions: tuple, *parts: str) -> str:
+    """Weak ETag over the stamps plus everything else that shapes the response (path, filters)."""
+    digest = hashlib.sha1()
+    for value in (*versions, *parts):
+        digest.update(value.hex().encode() if isinstance(value, bytes) else str(value).encode())
+        digest.update(b"\0")
+    return f'W/"{digest.hexdigest()}"'
+
+
+async def conditional(request: Request, tables: Sequence[str], company_id: Optional[int],
+                      build: Callable[[], Awaitable[Response]], *key: str) -> Response:
+    """304 when the client's If-None-Match still matches the tables' versions, else `build()`
+    with an ETag. Stamps are read before the data, so a write landing in between only yields
+    an older ETag for newer data; the next poll then simply refetches."""
+    versions = await run_db(read_versions, tables, company_id)
+    if versions is None:
+        return await build()
+    etag = version_etag(versions, request.url.path, request.url.query, *key)
+    cached = not_modified(request, etag, REVALIDATE)
+    if cached is not None:
+        return cached
+    response = await build()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE
+    return response
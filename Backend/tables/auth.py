@@ -1,23 +1,10 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt  # You must install python-jose
-from typing import Dict
+from pydantic import BaseModel
 
-# Dummy secret and algorithm
-SECRET_KEY = "your-secret-key"
-ALGORITHM = "HS256"
+# Authentication lives in jwt_handler; kept here so existing imports keep working
+from jwt_handler import Principal, get_current_user, get_optional_user, security
 
-security = HTTPBearer()
+__all__ = ["Principal", "RefreshRequest", "get_current_user", "get_optional_user", "security"]
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict:
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload  # Or extract user info
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
 from typing import Optional
+from pagination import PageOptions
 
 class CompanyBase(BaseModel):
     """Base model for Company data"""
@@ -49,6 +50,7 @@ class Company(CompanyBase):
     address: Optional[str] = Field(None, example="123 Tech Street, India")
 
 
-class CompanyPaginationRequest(BaseModel):
+class CompanyPaginationRequest(PageOptions):
     page: int = 1
-    limit: int = 10
\ No newline at end of file
+    limit: int = 10
+    image: Optional[str] = None   # logo variant to link instead of the original (thumb/small/medium)
\ No newline at end of file
@@ -1,6 +1,7 @@
 # employee.py
 from pydantic import BaseModel, Field, EmailStr
 from typing import Optional
+from pagination import PageOptions
 
 
 
@@ -39,10 +40,10 @@ class EmployeeOut(EmployeeBase):
     is_active: bool
 
    
-class EmployeePaginationRequest(BaseModel):
+class EmployeePaginationRequest(PageOptions):
     
     page: int
     page_limit: int
     search: Optional[str] = None
     company_id: int
-    role_id: Optional[int] = None 
\ No newline at end of file
+    role_id: Optional[int] = None
\ No newline at end of file
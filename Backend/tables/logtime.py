@@ -1,6 +1,7 @@
 from typing import Optional
 from datetime import date, datetime
 from pydantic import BaseModel
+from pagination import PageOptions
 
 class LogTimeBase(BaseModel):
     EmpId: int
@@ -32,8 +33,10 @@ class LogTimeOut(LogTimeBase):
     IsActive: bool
     DeletedOn: Optional[datetime] = None
     DeletedBy: Optional[int] = None
-class PaginationRequest(BaseModel):
+class PaginationRequest(PageOptions):
     page: int
     PageLimit: int
     employee_name: Optional[str] = None
-    task_title: Optional[str] = None
\ No newline at end of file
+    task_title: Optional[str] = None
+    company_id: Optional[int] = None
+    fields: Optional[str] = None  # sparse field set, e.g. "LogId,EmpId,Date,HoursSpent"
\ No newline at end of file
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from pagination import PageOptions
 
 class ProjectBase(BaseModel):
     Name: str
@@ -36,10 +37,11 @@ class ProjectOut(ProjectBase):
     UpdatedOn: Optional[datetime] = None
     DeletedOn: Optional[datetime] = None
 
-class ProjectPaginationRequest(BaseModel):
+class ProjectPaginationRequest(PageOptions):
     page: int =1
     PageLimit: int=10
     name: Optional[str] = None
     status: Optional[str] = None
     priority: Optional[str] = None
-    project_manager: Optional[int] = None
\ No newline at end of file
+    project_manager: Optional[int] = None
+    company_id: Optional[int] = None
\ No newline at end of file
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from pagination import PageOptions
 
 class RoleBase(BaseModel):
     role: str
@@ -30,6 +31,7 @@ class Role(RoleBase):
 
     class Config:
         orm_mode = True
-class RolePaginationRequest(BaseModel):
+class RolePaginationRequest(PageOptions):
     page: int = 1
-    PageLimit: int = 10
\ No newline at end of file
+    PageLimit: int = 10
+    company_id: Optional[int] = None
\ No newline at end of file
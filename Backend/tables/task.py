@@ -1,7 +1,8 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
+from pagination import PageOptions
 
 class TaskCreate(BaseModel):
     Name: str
@@ -37,6 +38,16 @@ class TaskUpdate(BaseModel):
     ExptedHours: Optional[Decimal] = None
 
 
+class TaskBulkUpdate(TaskUpdate):
+    TaskId: int
+
+
+class TaskBulkReassign(BaseModel):
+    TaskIds: List[int]
+    AssignedTo: Optional[int] = None  # None unassigns the tasks
+    UpdatedBy: int
+
+
 class TaskOut(BaseModel):
     TaskId: int
     Name: str
@@ -58,13 +69,15 @@ class TaskOut(BaseModel):
     DocumentName: Optional[str]
     IsActive: bool
     ExptedHours: Optional[Decimal] = None
-class TaskPaginationRequest(BaseModel):
+class TaskPaginationRequest(PageOptions):
     page: int
     PageLimit: int
     ProjectName: Optional[str] = None
     AssignedTo: Optional[int] = None
     Priority: Optional[str] = None
     TaskName: Optional[str] = None
-    ManagerId: Optional[int] = None 
+    ManagerId: Optional[int] = None
+    CompanyId: Optional[int] = None
+    fields: Optional[str] = None  # sparse field set, e.g. "TaskId,Name,Status,Deadline"
     
     
\ No newline at end of file
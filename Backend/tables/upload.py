@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class UploadSessionCreate(BaseModel):
+    """Starts a resumable upload; the file is then sent in PUT chunks at increasing offsets"""
+    filename: str = Field(..., example="design-spec.pdf")
+    size: int = Field(..., gt=0, example=524288000)  # total bytes the client will send
+    content_type: Optional[str] = Field(None, example="application/pdf")
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{64}$")  # if already stored, no bytes are sent
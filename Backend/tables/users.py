@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
 from typing import Optional
+from pagination import PageOptions
 
 class UserBase(BaseModel):
     """Base model for User data"""
@@ -11,7 +12,7 @@ class UserBase(BaseModel):
 
 class UserCreate(UserBase):
     """Model for creating a new user"""
-    password: str = Field(..., min_length=8, example="StrongPassword123!")  # ✅ Stores plain text password
+    password: str = Field(..., min_length=8, example="StrongPassword123!")  # ✅ Hashed before it is stored
     created_by: int = Field(..., example=1)
 
 class UserUpdate(BaseModel):
@@ -29,7 +30,6 @@ class UserUpdate(BaseModel):
 class User(UserBase):
     """Response model for a user"""
     user_id: int
-    password: str = Field(..., example="PlainTextPassword")  # ✅ Returns plain text password (not secure!)
     created_on: Optional[str] = Field(None, example="2025-06-02 12:00:00")
     created_by: int = Field(..., example=1)
     updated_on: Optional[str] = Field(None, example="2025-06-02 15:43:52")
@@ -37,7 +37,7 @@ class User(UserBase):
     deleted_on: Optional[str] = Field(None, example="2025-06-02 16:00:00")
     deleted_by: Optional[int] = Field(None, example=3)
 
-class UserPaginationRequest(BaseModel):
+class UserPaginationRequest(PageOptions):
     page: int = 1
     PageLimit: int = 10
     company_id: Optional[int] = None
@@ -0,0 +1,13 @@
+from typing import Any, Optional, Tuple
+
+
+def company_scoped(template: str, column: str, company_id: Optional[int], **slots: str) -> Tuple[str, Tuple[Any, ...]]:
+    """Fill a query's `{company_filter}` slot so one tenant's rows are filtered in SQL.
+
+    The slot sits at the end of the WHERE clause; without a company_id it is left empty.
+    Any other `{slot}` in the template (e.g. `{columns}`) is filled from `slots`.
+    Matching (CompanyId, IsActive, ...) indexes live in migrations/001_tenant_indexes.sql.
+    """
+    if company_id is None:
+        return template.format(company_filter="", **slots), ()
+    return template.format(company_filter=f" AND {column} = %s", **slots), (company_id,)
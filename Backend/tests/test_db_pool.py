@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from db_connection import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, healthy: bool = True):
+        self.healthy = healthy
+        self.closed = False
+
+    def cursor(self):
+        if not self.healthy:
+            raise RuntimeError("connection reset")
+        return self
+
+    def execute(self, *args):
+        pass
+
+    def fetchone(self):
+        return (1,)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_recycling_an_old_connection_keeps_its_slot():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=2, max_age=0.05, timeout=0.2)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    time.sleep(0.06)
+
+    # The idle connection is past max_age: it is replaced, not added to
+    replacement = pool.acquire()
+    assert first.closed and replacement is not first
+    stats = pool.stats()
+    assert stats["live"] == 2 and stats["in_use"] == 2 and stats["recycled"] == 1
+
+    # Both slots are taken, so a third checkout must time out rather than open a connection
+    with pytest.raises(Exception):
+        pool.acquire()
+    pool.release(second)
+    pool.release(replacement)
+    assert pool.stats()["live"] <= pool.max_size
+
+
+def test_failed_health_check_keeps_its_slot():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=1, idle_check=0.0, timeout=0.2)
+    conn = pool.acquire()
+    conn.healthy = False
+    pool.release(conn)
+    time.sleep(0.01)
+
+    replacement = pool.acquire()
+    assert conn.closed and replacement.healthy
+    stats = pool.stats()
+    assert stats["live"] == 1 and stats["failed_health_checks"] == 1 and stats["recycled"] == 1
+    pool.release(replacement)
+
+
+def test_failed_reopen_after_recycle_frees_the_slot_once():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 2:
+            raise RuntimeError("server unavailable")
+        return FakeConnection()
+
+    pool = ConnectionPool(connect=connect, min_size=0, max_size=1, max_age=0.01, timeout=0.2)
+    pool.release(pool.acquire())
+    time.sleep(0.02)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    assert pool.stats()["live"] == 0
+
+    pool.release(pool.acquire())
+    assert pool.stats()["live"] == 1
+
+
+def test_concurrent_checkouts_never_exceed_max_size():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=2, max_age=0.005, timeout=5)
+    in_use, peak, lock = [0], [0], threading.Lock()
+
+    def worker():
+        for _ in range(50):
+            conn = pool.acquire()
+            with lock:
+                in_use[0] += 1
+                peak[0] = max(peak[0], in_use[0])
+            time.sleep(0.001)
+            with lock:
+                in_use[0] -= 1
+            pool.release(conn)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= 2
+    stats = pool.stats()
+    assert stats["live"] <= 2 and stats["in_use"] == 0
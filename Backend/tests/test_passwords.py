@@ -0,0 +1,53 @@
+import pytest
+
+import passwords
+from passwords import hash_password, needs_rehash, verify_password
+
+
+@pytest.fixture(autouse=True)
+def cheap_scrypt(monkeypatch):
+    # Same format and code path, a fraction of the production cost
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 10)
+
+
+def test_hash_round_trip():
+    stored = hash_password("StrongPassword123!")
+    assert stored.startswith(f"scrypt${2 ** 10}$8$1$")
+    assert verify_password("StrongPassword123!", stored)
+    assert not verify_password("strongpassword123!", stored)
+    assert not needs_rehash(stored)
+
+
+def test_hashes_are_salted():
+    assert hash_password("same password") != hash_password("same password")
+
+
+def test_legacy_plaintext_is_accepted_and_flagged_for_rehash():
+    assert verify_password("PlainTextPassword", "PlainTextPassword")
+    assert not verify_password("plaintextpassword", "PlainTextPassword")
+    assert needs_rehash("PlainTextPassword")
+
+
+@pytest.mark.parametrize("stored", [None, ""])
+def test_missing_password_never_verifies(stored):
+    assert not verify_password("", stored)
+    assert not verify_password("anything", stored)
+
+
+def test_malformed_hash_is_treated_as_legacy():
+    stored = "scrypt$not-a-number$8$1$c2FsdA==$aGFzaA=="
+    assert not verify_password("secret", stored)
+    assert needs_rehash(stored)
+
+
+def test_raising_scrypt_n_flags_old_hashes_but_still_verifies_them(monkeypatch):
+    stored = hash_password("StrongPassword123!")
+
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 11)
+    # The stored cost parameters are used to verify, so sign-in keeps working until the upgrade
+    assert verify_password("StrongPassword123!", stored)
+    assert needs_rehash(stored)
+
+    upgraded = hash_password("StrongPassword123!")
+    assert upgraded.startswith(f"scrypt${2 ** 11}$")
+    assert not needs_rehash(upgraded)
@@ -0,0 +1,94 @@
+import pytest
+
+import sessions
+from sessions import MemorySessionStore, RefreshError, SqliteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, monkeypatch):
+    store = MemorySessionStore() if request.param == "memory" else SqliteSessionStore(":memory:")
+    monkeypatch.setattr(sessions, "session_store", store)
+    return store
+
+
+def _session_id(refresh_token: str) -> str:
+    return refresh_token.partition(".")[0]
+
+
+def test_rotation_issues_a_new_token_for_the_same_session(store):
+    token = sessions.start_session(7, 2, 3, "a@example.com")
+
+    session, renewed = sessions.rotate_session(token)
+    assert (session.user_id, session.role, session.company_id, session.email) == (7, 2, 3, "a@example.com")
+    assert renewed != token and _session_id(renewed) == _session_id(token)
+
+    # The renewed token keeps rotating
+    _, again = sessions.rotate_session(renewed)
+    assert again not in (token, renewed)
+
+
+def test_replaying_a_rotated_token_revokes_the_session(store):
+    token = sessions.start_session(7, 2, 3, None)
+    _, renewed = sessions.rotate_session(token)
+
+    with pytest.raises(RefreshError, match="already used"):
+        sessions.rotate_session(token)
+    # The legitimate holder is signed out too
+    assert store.get(_session_id(token)) is None
+    with pytest.raises(RefreshError, match="expired or revoked"):
+        sessions.rotate_session(renewed)
+
+
+def test_losing_a_rotation_race_revokes_the_session(store, monkeypatch):
+    token = sessions.start_session(7, 2, 3, None)
+    rotate = store.rotate
+
+    def racing_rotate(session_id, old_hash, new_hash, expires_at):
+        # A concurrent renewal of the same token lands first
+        assert rotate(session_id, old_hash, b"concurrent", expires_at)
+        return rotate(session_id, old_hash, new_hash, expires_at)
+
+    monkeypatch.setattr(store, "rotate", racing_rotate)
+    with pytest.raises(RefreshError, match="already used"):
+        sessions.rotate_session(token)
+    assert store.get(_session_id(token)) is None
+
+
+def test_expired_session_cannot_be_renewed(store, monkeypatch):
+    monkeypatch.setattr(sessions, "REFRESH_TOKEN_TTL", -1)
+    token = sessions.start_session(7, 2, 3, None)
+
+    with pytest.raises(RefreshError, match="expired or revoked"):
+        sessions.rotate_session(token)
+
+
+@pytest.mark.parametrize("token", ["", "no-secret", ".secret", "session."])
+def test_malformed_tokens_are_rejected(store, token):
+    with pytest.raises(RefreshError, match="Invalid"):
+        sessions.rotate_session(token)
+
+
+def test_end_session_needs_the_current_secret(store):
+    token = sessions.start_session(7, 2, 3, None)
+    session_id = _session_id(token)
+
+    sessions.end_session(f"{session_id}.wrong-secret")
+    assert store.get(session_id) is not None
+
+    sessions.end_session(token)
+    assert store.get(session_id) is None
+    with pytest.raises(RefreshError):
+        sessions.rotate_session(token)
+
+
+def test_revoking_a_user_ends_only_their_sessions(store):
+    phone, laptop = sessions.start_session(7, 2, 3, None), sessions.start_session(7, 2, 3, None)
+    other = sessions.start_session(8, 2, 3, None)
+
+    assert sessions.revoke_user_sessions(7) == 2
+    for token in (phone, laptop):
+        with pytest.raises(RefreshError, match="expired or revoked"):
+            sessions.rotate_session(token)
+    session, _ = sessions.rotate_session(other)
+    assert session.user_id == 8
+    assert sessions.revoke_user_sessions(7) == 0